@@ -2,6 +2,7 @@ from nmigen import Elaboratable, Module, Signal, Array, unsigned, Const
 from nmigen.build import Platform
 from nmigen.cli import main_parser, main_runner
 from src.ldpc_decoder import LDPC_Decoder
+from src.ldpc_rtl_cache import cached_main_runner
 
 if __name__ == "__main__":
     #Instantiate a command line argument parser
@@ -21,4 +22,5 @@ if __name__ == "__main__":
     #Instantiate the LDPC_Decoder Module with the parity check matrix, input codeword size and output data size as parameters
     m.submodules.LDPC_Decoder = LDPC_Decoder = LDPC_Decoder(parityCheckMatrix,6,3)
 
-    main_runner(parser, args, m, ports=[LDPC_Decoder.data_input, LDPC_Decoder.data_output, LDPC_Decoder.start, LDPC_Decoder.done, LDPC_Decoder.success])    
+    #Reuse the cached RTLIL/Verilog while the decoder parameters and the cores are unchanged
+    cached_main_runner(parser, args, m, ports=[LDPC_Decoder.data_input, LDPC_Decoder.data_output, LDPC_Decoder.start, LDPC_Decoder.done, LDPC_Decoder.success], key_design=LDPC_Decoder)    
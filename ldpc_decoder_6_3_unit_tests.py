@@ -1,60 +1,294 @@
+import unittest
 from nmigen import Elaboratable, Module, Signal, Array, unsigned, Const
 from nmigen.build import Platform
 from nmigen.cli import main_parser, main_runner, main
-from nmigen.back.pysim import Simulator, Delay
+from nmigen.back.pysim import Simulator, Delay, Settle
 from nmigen.test import *
-from src.ldpc_decoder import LDPC_Decoder
-import unittest
+from src.ldpc_decoder import LDPC_Decoder, DECODER_MODE_BRUTE_FORCE, DECODER_MODE_SYNDROME_LOOKUP, DECODER_MODE_SYNDROME_ROM
+from src.ldpc_decoder_validator import REDUCTION_STRATEGY_RIPPLE, REDUCTION_STRATEGY_TREE
+from src.ldpc_streaming_decoder import LDPC_Streaming_Decoder
+from src.ldpc_multi_lane_decoder import LDPC_Multi_Lane_Decoder, COMPLETION_IN_ORDER, COMPLETION_TAGGED
+from src.ldpc_decoder_model import LDPC_Decoder_Model
+from src.ldpc_decoder_testbench import simulate_frames, run_test_vectors, generate_test_vectors
 
-def Positive_Test(output, input):
+def Vector_Test(vectors):
     def test(self):
-        with Simulator(self.dut) as sim:
-            def process():
-                yield self.dut.data_input.eq(input)
-                yield Delay(1e-6)
-                yield self.dut.start.eq(1)
-                yield Delay(1e-6)
-                yield self.dut.start.eq(0)
-
-                #Delay for 16 clock cycles
-                for i in range(16):
-                    yield Delay(1e-6)
-                self.assertEqual((yield self.dut.done), 1)
-                self.assertEqual((yield self.dut.success), 1)
-                self.assertEqual((yield self.dut.data_output), output)
-            sim.add_sync_process(process)
-            sim.add_clock(1e-6)
-            sim.run()
+        #Stream every (output, input) vector through a single simulation of the decoder
+        results = run_test_vectors(self.dut, [(input, output) for output, input in vectors])
+        self.assertEqual([result for result in results if not result.passed], [])
     return test
 
 
 class LDPC_Decoder_Test(unittest.TestCase):
+    decoder_mode = DECODER_MODE_BRUTE_FORCE
+    reduction_strategy = REDUCTION_STRATEGY_RIPPLE
+    reduction_pipeline_depth = 0
+    parallelism = None
+    double_buffered = False
+    selection_pipeline_depth = 0
+    max_errors = 1
+    parityCheckMatrix = [[0b111100],
+                         [0b001101],
+                         [0b100110] ]
+
+    #Bits given single bit errors in the generated vectors (None: every correctable bit)
+    error_positions = None
+
     def setUp(self):
-        parityCheckMatrix = [[0b111100],
-                            [0b001101],
-                            [0b100110] ]
-        self.dut = LDPC_Decoder(parityCheckMatrix,6,3)
+        self.dut = LDPC_Decoder(self.parityCheckMatrix,6,3,self.decoder_mode,
+                                self.reduction_strategy,self.reduction_pipeline_depth,self.parallelism,self.double_buffered,
+                                self.selection_pipeline_depth,self.max_errors)
+
+    def test_generated_vectors(self):
+        #Every data word, error free and with a single bit error on each of error_positions, encoded from H
+        results = run_test_vectors(self.dut, generate_test_vectors(self.parityCheckMatrix,6,3,self.error_positions))
+        self.assertEqual([result for result in results if not result.passed], [])
     
     #Zero Bit Errors
-    test_0 = Positive_Test(0b000,0b000000)
-    test_1 = Positive_Test(0b011,0b011001)
-    test_2 = Positive_Test(0b110,0b110010)
-    test_3 = Positive_Test(0b101,0b101011)
-    test_4 = Positive_Test(0b111,0b111100)
-    test_5 = Positive_Test(0b100,0b100101)
-    test_6 = Positive_Test(0b001,0b001110)
-    test_7 = Positive_Test(0b010,0b010111)
-    test_8 = Positive_Test(0b011,0b011001)
+    test_zero_bit_errors = Vector_Test([(0b000,0b000000),
+                                        (0b011,0b011001),
+                                        (0b110,0b110010),
+                                        (0b101,0b101011),
+                                        (0b111,0b111100),
+                                        (0b100,0b100101),
+                                        (0b001,0b001110),
+                                        (0b010,0b010111),
+                                        (0b011,0b011001)])
 
     
     #One Bit Errors
-    test_9 = Positive_Test(0b000,0b000100)
-    test_10 = Positive_Test(0b011,0b011101)
-    test_11 = Positive_Test(0b110,0b110110)
-    test_12 = Positive_Test(0b101,0b101001)
-    test_13 = Positive_Test(0b111,0b111110)
-    test_14 = Positive_Test(0b100,0b100111)
-    test_15 = Positive_Test(0b001,0b001111)
-    test_16 = Positive_Test(0b010,0b010011)
-    test_17 = Positive_Test(0b011,0b011011)
-    
\ No newline at end of file
+    test_one_bit_errors = Vector_Test([(0b000,0b000100),
+                                       (0b011,0b011101),
+                                       (0b110,0b110110),
+                                       (0b101,0b101001),
+                                       (0b111,0b111110),
+                                       (0b100,0b100111),
+                                       (0b001,0b001111),
+                                       (0b010,0b010011),
+                                       (0b011,0b011011)])
+
+    #1 Bit Errors on the data bits
+    test_data_bit_errors = Vector_Test([(0b011,0b111001),
+                                        (0b101,0b100011)])
+
+
+class LDPC_Decoder_Syndrome_Lookup_Test(LDPC_Decoder_Test):
+    decoder_mode = DECODER_MODE_SYNDROME_LOOKUP
+
+
+class LDPC_Decoder_Syndrome_ROM_Test(LDPC_Decoder_Test):
+    decoder_mode = DECODER_MODE_SYNDROME_ROM
+    max_errors = 1
+
+
+class LDPC_Decoder_Tree_Reduction_Test(LDPC_Decoder_Test):
+    reduction_strategy = REDUCTION_STRATEGY_TREE
+
+
+class LDPC_Decoder_Pipelined_Tree_Reduction_Test(LDPC_Decoder_Test):
+    reduction_strategy = REDUCTION_STRATEGY_TREE
+    reduction_pipeline_depth = 2
+
+
+class LDPC_Decoder_Time_Multiplexed_Test(LDPC_Decoder_Test):
+    parallelism = 3
+
+
+class LDPC_Decoder_Pipelined_Selection_Test(LDPC_Decoder_Test):
+    reduction_strategy = REDUCTION_STRATEGY_TREE
+    selection_pipeline_depth = 2
+
+
+class LDPC_Decoder_Double_Buffered_Test(LDPC_Decoder_Test):
+    double_buffered = True
+
+    #Back-to-back frames, the next one loaded while the current one is decoding
+    back_to_back_vectors = [(0b011,0b011001),
+                            (0b110,0b110110),
+                            (0b101,0b101001),
+                            (0b111,0b111100)]
+
+    def test_back_to_back(self):
+        #Present each (output, input) vector as soon as the decoder is ready. The results must come back in order, one
+        #every 4+validator+selection latency clock cycles while the frames need a correction, and sooner for clean
+        #frames, which skip the validators.
+        vectors = self.back_to_back_vectors
+        received = []
+        sim = Simulator(self.dut)
+        def process():
+            sent = 0
+            cycle = 0
+            while len(received) < len(vectors):
+                yield self.dut.start.eq(sent < len(vectors))
+                if sent < len(vectors):
+                    yield self.dut.data_input.eq(vectors[sent][1])
+                yield Settle()
+                if (yield self.dut.start) and (yield self.dut.ready):
+                    sent += 1
+                yield
+                yield Settle()
+                cycle += 1
+                if (yield self.dut.result_valid):
+                    received.append((cycle, (yield self.dut.data_output), (yield self.dut.success)))
+                self.assertLessEqual(cycle, 64*len(vectors))
+        sim.add_clock(1e-6)
+        sim.add_sync_process(process)
+        sim.run()
+        self.assertEqual([(data_output, success) for cycle, data_output, success in received], [(output, 1) for output, input in vectors])
+        model = LDPC_Decoder_Model.from_decoder(self.dut)
+        interval = 4+model.validator_latency()+model.selection_latency()
+        clean = [bit == model.codeword_width for bit in model.decode([input for output, input in vectors])[3]]
+        intervals = [(b[0]-a[0], a_clean, b_clean) for a, b, a_clean, b_clean in zip(received, received[1:], clean, clean[1:])]
+        self.assertEqual([cycles for cycles, a_clean, b_clean in intervals if not (a_clean or b_clean)],
+                         [interval]*sum(1 for cycles, a_clean, b_clean in intervals if not (a_clean or b_clean)))
+        self.assertEqual([cycles for cycles, a_clean, b_clean in intervals if b_clean and cycles >= interval], [])
+
+
+class LDPC_Decoder_Pipelined_Double_Buffered_Test(LDPC_Decoder_Double_Buffered_Test):
+    reduction_strategy = REDUCTION_STRATEGY_TREE
+    reduction_pipeline_depth = 1
+    selection_pipeline_depth = 1
+
+
+class LDPC_Decoder_Model_Test(unittest.TestCase):
+    parityCheckMatrix = LDPC_Decoder_Test.parityCheckMatrix
+
+    def setUp(self):
+        self.model = LDPC_Decoder_Model(self.parityCheckMatrix,6,3)
+
+    def assertMatchesModel(self, inputs, *args):
+        #Run every input through a single simulation and compare output, success, latency and corrected bit against the
+        #NumPy model, and the latency reported by the decoder against the measured one
+        dut = LDPC_Decoder(self.parityCheckMatrix,self.model.codeword_width,self.model.data_output_width,*args)
+        expected = zip(*LDPC_Decoder_Model.from_decoder(dut).decode(list(inputs)))
+        self.assertEqual(simulate_frames(dut, inputs, [dut.corrected_bit, dut.latency]),
+                         [tuple(int(x) for x in frame) + (int(frame[2]),) for frame in expected])
+
+    #Every input word, or a spread of them for the slower brute force designs
+    def test_syndrome_lookup(self):
+        self.assertMatchesModel(range(0,64), DECODER_MODE_SYNDROME_LOOKUP)
+
+    def test_syndrome_rom(self):
+        self.assertMatchesModel(range(0,64), DECODER_MODE_SYNDROME_ROM, REDUCTION_STRATEGY_RIPPLE, 0, None, False, 0, 2)
+
+    def test_brute_force_ripple(self):
+        self.assertMatchesModel(range(0,64,2), DECODER_MODE_BRUTE_FORCE, REDUCTION_STRATEGY_RIPPLE)
+
+    def test_brute_force_tree(self):
+        self.assertMatchesModel(range(0,64,3), DECODER_MODE_BRUTE_FORCE, REDUCTION_STRATEGY_TREE, 2)
+
+    def test_time_multiplexed(self):
+        self.assertMatchesModel(range(0,64,2), DECODER_MODE_BRUTE_FORCE, REDUCTION_STRATEGY_TREE, 1, 3)
+
+    def test_pipelined_selection(self):
+        self.assertMatchesModel(range(1,64,3), DECODER_MODE_BRUTE_FORCE, REDUCTION_STRATEGY_TREE, 1, None, False, 2)
+
+
+class LDPC_Streaming_Decoder_Test(unittest.TestCase):
+    parityCheckMatrix = LDPC_Decoder_Test.parityCheckMatrix
+
+    def setUp(self):
+        self.dut = LDPC_Streaming_Decoder(self.parityCheckMatrix,6,3,tag_width=8)
+
+    #Zero and 1 Bit Errors, pushed back-to-back
+    back_to_back_vectors = [(0b000,0b000000),
+                            (0b011,0b011001),
+                            (0b110,0b110010),
+                            (0b101,0b101011),
+                            (0b111,0b111100),
+                            (0b100,0b100101),
+                            (0b001,0b001110),
+                            (0b010,0b010111),
+                            (0b011,0b011001),
+                            (0b000,0b000100),
+                            (0b011,0b011101),
+                            (0b110,0b110110),
+                            (0b101,0b101001),
+                            (0b111,0b111110),
+                            (0b100,0b100111),
+                            (0b001,0b001111),
+                            (0b010,0b010011),
+                            (0b011,0b011011)]
+
+    def test_back_to_back(self):
+        vectors = self.back_to_back_vectors
+        with Simulator(self.dut) as sim:
+            def process():
+                received = []
+                sent = 0
+                cycle = 0
+                while len(received) < len(vectors):
+                    #Push codewords back-to-back while stalling the output every third clock cycle
+                    yield self.dut.in_valid.eq(sent < len(vectors))
+                    if sent < len(vectors):
+                        yield self.dut.data_input.eq(vectors[sent][1])
+                        yield self.dut.tag_input.eq(sent)
+                    yield self.dut.out_ready.eq(cycle % 3 != 2)
+                    yield Settle()
+                    if (yield self.dut.in_valid) and (yield self.dut.in_ready):
+                        sent += 1
+                    if (yield self.dut.out_valid) and (yield self.dut.out_ready):
+                        received.append(((yield self.dut.tag_output), (yield self.dut.success), (yield self.dut.data_output)))
+                    yield
+                    cycle += 1
+                    self.assertLessEqual(cycle, 2*len(vectors)+self.dut.latency+2)
+                self.assertEqual(received, [(i, 1, vectors[i][0]) for i in range(len(vectors))])
+            sim.add_sync_process(process)
+            sim.add_clock(1e-6)
+            sim.run()
+
+
+class LDPC_Multi_Lane_Decoder_Test(unittest.TestCase):
+    parityCheckMatrix = LDPC_Decoder_Test.parityCheckMatrix
+    completion = COMPLETION_IN_ORDER
+
+    def setUp(self):
+        self.dut = LDPC_Multi_Lane_Decoder(self.parityCheckMatrix,6,3,lanes=3,parallelism=3,
+                                           reduction_strategy=REDUCTION_STRATEGY_TREE,completion=self.completion)
+        self.model = LDPC_Decoder_Model(self.parityCheckMatrix,6,3,DECODER_MODE_BRUTE_FORCE,REDUCTION_STRATEGY_TREE,0,3)
+
+    #Lanes with errors on different bits finish in different rounds
+    beats = [[0b011001,0b011101,0b111001],
+             [0b100111,0b110010,0b001110],
+             [0b111111,0b000100,0b101001]]
+
+    def test_lanes(self):
+        #Decode each beat of codewords (one per lane), stalling the completion port every other clock cycle, and compare
+        #the latency of each lane and the completed results against the NumPy model
+        beats = self.beats
+        sim = Simulator(self.dut)
+        def process():
+            for beat in beats:
+                yield self.dut.data_input.eq(sum(codeword << (lane*self.dut.codeword_width) for lane, codeword in enumerate(beat)))
+                yield self.dut.start.eq(1)
+                yield
+                yield self.dut.start.eq(0)
+                latency = [None]*len(beat)
+                received = []
+                cycle = 0
+                while len(received) < len(beat):
+                    yield self.dut.out_ready.eq(cycle % 2)
+                    yield Settle()
+                    if (yield self.dut.out_valid) and (yield self.dut.out_ready):
+                        received.append(((yield self.dut.out_lane), (yield self.dut.out_data), (yield self.dut.out_success)))
+                    yield
+                    yield Settle()
+                    cycle += 1
+                    lane_done = yield self.dut.lane_done
+                    latency = [cycle if latency[lane] is None and (lane_done >> lane) & 1 else latency[lane] for lane in range(len(beat))]
+                    self.assertLessEqual(cycle, 4*max(self.model.latencies())+2*len(beat))
+                data_output, success, expected_latency, corrected_bit = self.model.decode(beat)
+                self.assertEqual(latency, [int(cycles) for cycles in expected_latency])
+                self.assertEqual(sorted(received), [(lane, int(data_output[lane]), int(success[lane])) for lane in range(len(beat))])
+                if self.completion == COMPLETION_IN_ORDER:
+                    self.assertEqual(received, sorted(received))
+                else:
+                    #Tagged results complete in order of lane latency
+                    self.assertEqual([lane for lane, data, flag in received], sorted(range(len(beat)), key=lambda lane: (latency[lane], lane)))
+        sim.add_sync_process(process)
+        sim.add_clock(1e-6)
+        sim.run()
+
+
+class LDPC_Multi_Lane_Decoder_Tagged_Test(LDPC_Multi_Lane_Decoder_Test):
+    completion = COMPLETION_TAGGED
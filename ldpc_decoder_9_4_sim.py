@@ -3,6 +3,8 @@ from nmigen.build import Platform
 from nmigen.cli import main_parser, main_runner, main
 from nmigen.back.pysim import Simulator, Delay
 from src.ldpc_decoder import LDPC_Decoder
+from src.ldpc_decoder_trace import LDPC_Transaction_Monitor, write_trace
+import sys
 
 def testbench_process():
     #Run simulation for input word '010101111' (0 bit error)
@@ -87,6 +89,18 @@ if __name__ == "__main__":
     #Add a clock to the simulator
     sim.add_clock(1e-6)
 
-    #Run the simulation with all input and output ports from the LDPC_Decoder and write out the results
-    with sim.write_vcd("test_9_4.vcd", "test_9_4.gtkw", traces=[data_input,start] + LDPC_Decoder.ports()):
-       sim.run()
\ No newline at end of file
+    #Add a transaction monitor recording one line per frame of the LDPC Decoder
+    monitor = LDPC_Transaction_Monitor(LDPC_Decoder)
+    monitor.add_to(sim)
+
+    #Run the simulation and write out the per frame log. With --vcd, a waveform of all input and output ports from the
+    #LDPC_Decoder is written as well.
+    if "--vcd" in sys.argv[1:]:
+        with sim.write_vcd("test_9_4.vcd", "test_9_4.gtkw", traces=[data_input,start] + LDPC_Decoder.ports()):
+            sim.run()
+    else:
+        sim.run()
+    write_trace(monitor.records, "test_9_4_trace.csv")
+    for record in monitor.records:
+        print("input {:#x}: data_output {:#x}, success {}, latency {} (start cycle {}, done cycle {})".format(
+            record.input, record.data_output, record.success, record.latency, record.start_cycle, record.done_cycle))
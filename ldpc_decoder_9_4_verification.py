@@ -1,28 +1,15 @@
 from nmigen import Elaboratable, Module, Signal, Array, unsigned, Const
 from nmigen.build import Platform
 from nmigen.cli import main_parser, main_runner
-from nmigen.asserts import Assert, Assume, Cover, Past
 from src.ldpc_decoder import LDPC_Decoder
-
-def verification_statements(m):
-    #Create Local Reference to the LDPC_Decoder
-    LDPC_Decoder = m.submodules.LDPC_Decoder
-    
-    #Ensure that done and output signals are reset when start is toggled.
-    with m.If((LDPC_Decoder.start == 0) & Past(LDPC_Decoder.start)):
-        m.d.sync+=Assert((LDPC_Decoder.done == 0))
-        m.d.sync+=Assert((LDPC_Decoder.data_output == 0))
-
-    return
+from src.ldpc_rtl_cache import cached_main_runner
+from src.ldpc_formal import LDPC_Decoder_Formal, write_generated_sby
 
 if __name__ == "__main__":
     #Instantiate a command line argument parser
     parser = main_parser()
     args = parser.parse_args()
 
-    #Instantiate an nMigen Module
-    m = Module()
-    
     #Instantiate the Parity Check Matrix 'H'
     #https://en.wikipedia.org/wiki/Low-density_parity-check_code
 
@@ -32,7 +19,10 @@ if __name__ == "__main__":
                         [0b100001010],
                         [0b001000101],
                         [0b010110000]]
-    #Instantiate the LDPC_Encoder Module with the parity check matrix, input codeword size and output data size as parameters
-    m.submodules.LDPC_Decoder = LDPC_Decoder = LDPC_Decoder(parityCheckMatrix,9,4)
-    verification_statements(m)
-    main_runner(parser, args, m, ports=[LDPC_Decoder.data_output, LDPC_Decoder.data_output, LDPC_Decoder.start, LDPC_Decoder.done, LDPC_Decoder.success])    
+    #Instantiate the LDPC_Decoder Module with the parity check matrix, input codeword size and output data size as parameters,
+    #inside the harness proving it equivalent to the syndrome reference (see src/ldpc_formal.py)
+    m = LDPC_Decoder_Formal(LDPC_Decoder(parityCheckMatrix,9,4))
+    #Reuse the cached RTLIL while the decoder parameters and the cores are unchanged
+    cached_main_runner(parser, args, m, ports=m.ports())
+    #RTLIL generated into a file gets a SymbiYosys script next to it, at the depth derived from the latency of the decoder
+    write_generated_sby(args, m.depth)
@@ -0,0 +1,188 @@
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import numpy as np
+from src.ldpc_decoder import DECODER_MODE_BRUTE_FORCE, DECODER_MODE_SYNDROME_LOOKUP, DECODER_MODE_SYNDROME_ROM
+from src.ldpc_decoder_model import LDPC_Decoder_Model, LDPC_Encoder_Model, LDPC_Bit_Flipping_Decoder_Model, LDPC_Min_Sum_Decoder_Model
+from src.ldpc_parity_check_matrix import load_alist, EXAMPLE_CODES
+
+#Decoders which can be benchmarked, each backed by its bit-exact NumPy model
+DECODERS = [DECODER_MODE_BRUTE_FORCE, DECODER_MODE_SYNDROME_LOOKUP, DECODER_MODE_SYNDROME_ROM, "bit_flipping", "min_sum"]
+
+CHANNELS = ["bsc", "awgn"]
+
+#models - Per-process cache of (encoder, decoder model), so each worker only builds them once
+models = {}
+
+def build_models(config):
+    key = json.dumps(config, sort_keys=True)
+    if key not in models:
+        H, codeword_width, data_width = config["H"], config["codeword_width"], config["data_width"]
+        encoder = LDPC_Encoder_Model(H, codeword_width, data_width)
+        if config["decoder"] == "bit_flipping":
+            decoder = LDPC_Bit_Flipping_Decoder_Model(H, codeword_width, data_width, max_iterations=config["max_iterations"])
+        elif config["decoder"] == "min_sum":
+            decoder = LDPC_Min_Sum_Decoder_Model(H, codeword_width, data_width, llr_width=config["llr_width"],
+                                                 max_iterations=config["max_iterations"])
+        else:
+            decoder = LDPC_Decoder_Model(H, codeword_width, data_width, config["decoder"], max_errors=config["max_errors"])
+        models[key] = (encoder, decoder)
+    return models[key]
+
+def run_shard(config, point, frames, seed):
+    #Encode, transmit and decode 'frames' random data words at one channel operating point.
+    #Returns (frames, frame errors, bit errors, decoder failures).
+    encoder, decoder = build_models(config)
+    rng = np.random.default_rng(seed)
+    codeword_width, data_width = config["codeword_width"], config["data_width"]
+    data = rng.integers(0, 2, size=(frames, data_width), dtype=np.uint8)
+    codewords = encoder.encode_bits(data)
+
+    if config["channel"] == "bsc":
+        received = codewords ^ (rng.random((frames, codeword_width)) < point).astype(np.uint8)
+        reliability = math.log((1-point)/point) if 0 < point < 1 else 16.0
+        llrs = np.where(received == 1, -reliability, reliability)
+    else:
+        #BPSK over AWGN at an Eb/N0 of 'point' dB
+        sigma = math.sqrt(1.0/(2.0*(data_width/codeword_width)*10**(point/10.0)))
+        symbols = 1.0-2.0*codewords + sigma*rng.standard_normal((frames, codeword_width))
+        received = (symbols < 0).astype(np.uint8)
+        llrs = 2.0*symbols/(sigma*sigma)
+
+    if config["decoder"] == "min_sum":
+        data_output, success = decoder.decode_llrs(decoder.quantize(llrs, config["llr_scale"]))[:2]
+    else:
+        data_output, success = decoder.decode_bits(received)[:2]
+    bit_errors = (data_output != data).sum(axis=1)
+    frame_errors = (bit_errors > 0) | ~success
+    return frames, int(frame_errors.sum()), int(bit_errors.sum()), int((~success).sum())
+
+def wilson_interval(errors, trials, z=1.96):
+    #95% Wilson score confidence interval of an error rate
+    if trials == 0:
+        return 0.0, 1.0
+    rate = errors/trials
+    denominator = 1+z*z/trials
+    centre = (rate+z*z/(2*trials))/denominator
+    spread = z*math.sqrt(rate*(1-rate)/trials+z*z/(4*trials*trials))/denominator
+    return max(0.0, centre-spread), min(1.0, centre+spread)
+
+def run_point(executor, config, point, point_index, args):
+    #Submit shards until the target number of frame errors (or the frame limit) is reached. Shards grow geometrically
+    #while no frame error has been seen. After that, a shard is only submitted while the frame errors still needed
+    #exceed those expected from the shards in flight at the observed FER, and is sized to the rest of that budget. A
+    #point therefore stops close to the target instead of overshooting it by every shard queued ahead.
+    totals = [0, 0, 0, 0]
+    submitted = 0
+    shard = 0
+    pending = {}
+    started = time.time()
+    while True:
+        #Until the first shard is back, only it is in flight (nothing is known about the error rate yet)
+        while (len(pending) < (2*args.workers if totals[0] else 1) and submitted < args.max_frames and
+               totals[1] < args.target_errors):
+            frames = int(min(args.shard_frames, max(1000, submitted), args.max_frames-submitted))
+            if totals[1]:
+                fer = totals[1]/totals[0]
+                budget = args.target_errors-totals[1]-fer*sum(pending.values())
+                if budget <= 0:
+                    break
+                frames = int(min(frames, max(100, math.ceil(budget/(fer*args.workers)))))
+            seed = np.random.SeedSequence(args.seed, spawn_key=(config["index"], point_index, shard))
+            pending[executor.submit(run_shard, config, point, frames, seed)] = frames
+            submitted += frames
+            shard += 1
+        if not pending:
+            break
+        finished = wait(pending, return_when=FIRST_COMPLETED).done
+        for future in finished:
+            del pending[future]
+            totals = [total+count for total, count in zip(totals, future.result())]
+    frames, frame_errors, bit_errors, failures = totals
+    data_bits = frames*config["data_width"]
+    return {
+        "decoder": config["decoder"],
+        "channel": config["channel"],
+        "point": point,
+        "frames": frames,
+        "frame_errors": frame_errors,
+        "bit_errors": bit_errors,
+        "decoder_failures": failures,
+        "fer": frame_errors/frames if frames else 0.0,
+        "fer_ci": wilson_interval(frame_errors, frames),
+        "ber": bit_errors/data_bits if data_bits else 0.0,
+        "ber_ci": wilson_interval(bit_errors, data_bits),
+        "seconds": time.time()-started,
+    }
+
+def main_parser():
+    parser = argparse.ArgumentParser(description="Monte Carlo BER/FER benchmark of the LDPC decoders")
+    code = parser.add_mutually_exclusive_group()
+    code.add_argument("--code", choices=sorted(EXAMPLE_CODES), default="9_4", help="example code (default: %(default)s)")
+    code.add_argument("--alist", metavar="FILE", help="parity check matrix in alist format (requires --data-width)")
+    parser.add_argument("--data-width", type=int, help="data width of the --alist code")
+    parser.add_argument("--decoder", choices=DECODERS, action="append", help="decoder to benchmark (repeatable, default: all)")
+    parser.add_argument("--channel", choices=CHANNELS, default="bsc", help="channel model (default: %(default)s)")
+    parser.add_argument("--points", type=float, nargs="+", default=[0.001, 0.003, 0.01, 0.03, 0.1],
+                        help="BSC crossover probabilities or AWGN Eb/N0 values in dB")
+    parser.add_argument("--target-errors", type=int, default=100, help="frame errors per point before stopping (default: %(default)s)")
+    parser.add_argument("--max-frames", type=float, default=1e7, help="frame limit per point (default: %(default)g)")
+    parser.add_argument("--shard-frames", type=int, default=100000, help="frames per worker task (default: %(default)s)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes (default: %(default)s)")
+    parser.add_argument("--max-iterations", type=int, default=20, help="iterations of the iterative decoders (default: %(default)s)")
+    parser.add_argument("--max-errors", type=int, default=2, help="bits corrected by the syndrome ROM decoder (default: %(default)s)")
+    parser.add_argument("--llr-width", type=int, default=6, help="min-sum input LLR width (default: %(default)s)")
+    parser.add_argument("--llr-scale", type=float, default=2.0, help="min-sum LLR quantization scale (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed (default: %(default)s)")
+    parser.add_argument("--output", metavar="FILE", help="write the results as JSON (.json) or CSV (.csv)")
+    return parser
+
+def write_results(results, path):
+    if path.endswith(".csv"):
+        columns = ["decoder", "channel", "point", "frames", "frame_errors", "bit_errors", "decoder_failures",
+                   "fer", "fer_low", "fer_high", "ber", "ber_low", "ber_high", "seconds"]
+        with open(path, "w") as output:
+            output.write(",".join(columns) + "\n")
+            for result in results:
+                row = dict(result, fer_low=result["fer_ci"][0], fer_high=result["fer_ci"][1],
+                           ber_low=result["ber_ci"][0], ber_high=result["ber_ci"][1])
+                output.write(",".join(str(row[column]) for column in columns) + "\n")
+    else:
+        with open(path, "w") as output:
+            json.dump(results, output, indent=2)
+
+if __name__ == "__main__":
+    parser = main_parser()
+    args = parser.parse_args()
+    args.max_frames = int(args.max_frames)
+
+    if args.alist:
+        if args.data_width is None:
+            parser.error("--alist requires --data-width")
+        sparse = load_alist(args.alist)
+        H, codeword_width, data_width = sparse.to_packed(), sparse.codeword_width, args.data_width
+    else:
+        H, codeword_width, data_width = EXAMPLE_CODES[args.code]
+
+    results = []
+    print("{:>16} {:>10} {:>12} {:>8} {:>10} {:>23} {:>10} {:>23} {:>8}".format(
+        "decoder", "point", "frames", "errors", "FER", "FER 95% CI", "BER", "BER 95% CI", "seconds"))
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        for index, decoder in enumerate(args.decoder or DECODERS):
+            config = {"index": index, "decoder": decoder, "channel": args.channel, "H": H,
+                      "codeword_width": codeword_width, "data_width": data_width,
+                      "max_iterations": args.max_iterations, "max_errors": args.max_errors,
+                      "llr_width": args.llr_width, "llr_scale": args.llr_scale}
+            for point_index, point in enumerate(args.points):
+                result = run_point(executor, config, point, point_index, args)
+                results.append(result)
+                print("{:>16} {:>10g} {:>12} {:>8} {:>10.3e} [{:>9.3e}, {:>9.3e}] {:>10.3e} [{:>9.3e}, {:>9.3e}] {:>8.1f}".format(
+                    decoder, point, result["frames"], result["frame_errors"], result["fer"], *result["fer_ci"],
+                    result["ber"], *result["ber_ci"], result["seconds"]))
+                sys.stdout.flush()
+    if args.output:
+        write_results(results, args.output)
@@ -0,0 +1,98 @@
+import unittest
+from nmigen.back.pysim import Simulator, Settle
+from src.ldpc_decoder import LDPC_Decoder, DECODER_MODE_SYNDROME_LOOKUP, DECODER_MODE_SYNDROME_ROM
+from src.ldpc_decoder_model import LDPC_Decoder_Model, codewords_to_ints
+from src.ldpc_bist import LDPC_BIST
+from src.ldpc_decoder_testbench import run_bist
+
+
+class LDPC_BIST_Test(unittest.TestCase):
+    parityCheckMatrix = [[0b000011100],
+                         [0b110000010],
+                         [0b001100001],
+                         [0b100001010],
+                         [0b001000101],
+                         [0b010110000]]
+
+    def check(self, dut, model, error_weight, cycles=200):
+        #The counters must match the model decoding the reference stimulus of the BIST
+        bist = LDPC_BIST(dut, max_error_weight=2)
+        counters = run_bist(bist, cycles, error_weight)
+        frames = bist.reference_frames(counters["frames"], error_weight)
+        data_output, success = model.decode([codeword for codeword, data in frames])[:2]
+        data_output = codewords_to_ints(data_output)
+        self.assertEqual(counters["cycles"], cycles)
+        self.assertEqual(counters["successes"], int(success.sum()))
+        self.assertEqual(counters["mismatches"], sum(1 for i, (codeword, data) in enumerate(frames) if success[i] and data_output[i] != data))
+        return counters
+
+    def test_brute_force(self):
+        counters = self.check(LDPC_Decoder(self.parityCheckMatrix,9,4), LDPC_Decoder_Model(self.parityCheckMatrix,9,4), 1)
+        double_buffered = self.check(LDPC_Decoder(self.parityCheckMatrix,9,4,double_buffered=True),
+                                     LDPC_Decoder_Model(self.parityCheckMatrix,9,4), 1)
+        #Starting the next frame while the current one decodes raises the sustained throughput
+        self.assertGreater(double_buffered["frames_per_cycle"], counters["frames_per_cycle"])
+
+    def test_double_buffered_mixed_frames(self):
+        #Clean and corrupt frames mixed by changing error_weight while the BIST runs: every result must be counted and
+        #checked against the data of its own frame (the data words do not depend on the error weight)
+        dut = LDPC_Decoder(self.parityCheckMatrix,9,4,double_buffered=True)
+        bist = LDPC_BIST(dut, max_error_weight=1)
+        sent = []
+        results = []
+        counters = {}
+        sim = Simulator(bist)
+        def process():
+            yield bist.enable.eq(1)
+            for cycle in range(0,300):
+                yield bist.error_weight.eq((cycle // 7) % 2)
+                yield Settle()
+                if (yield dut.start) and (yield dut.ready):
+                    sent.append((yield dut.data_input))
+                yield
+                yield Settle()
+                if (yield dut.result_valid):
+                    results.append((yield dut.data_output))
+            yield bist.enable.eq(0)
+            yield
+            for _ in range(0,200):
+                if (yield bist.idle):
+                    break
+                yield
+                yield Settle()
+                if (yield dut.result_valid):
+                    results.append((yield dut.data_output))
+            yield
+            for name in ["frames", "successes", "mismatches"]:
+                counters[name] = (yield getattr(bist, name))
+        sim.add_clock(1e-6)
+        sim.add_sync_process(process)
+        sim.run()
+
+        clean, data = zip(*bist.reference_frames(len(sent), 0))
+        data_output, success = LDPC_Decoder_Model(self.parityCheckMatrix,9,4).decode(sent)[:2]
+        data_output = codewords_to_ints(data_output)
+        #Both clean frames and corrupt frames corrected back to their data were sent
+        self.assertTrue(any(codeword == clean[i] for i, codeword in enumerate(sent)))
+        self.assertTrue(any(success[i] and data_output[i] == data[i] and codeword != clean[i] for i, codeword in enumerate(sent)))
+        self.assertEqual(counters["frames"], len(sent))
+        self.assertEqual(results, [data_output[i] if success[i] else 0 for i in range(0,len(sent))])
+        self.assertEqual(counters["successes"], int(success.sum()))
+        self.assertEqual(counters["mismatches"], sum(1 for i in range(0,len(sent)) if success[i] and data_output[i] != data[i]))
+
+    def test_error_free(self):
+        counters = self.check(LDPC_Decoder(self.parityCheckMatrix,9,4,DECODER_MODE_SYNDROME_LOOKUP),
+                              LDPC_Decoder_Model(self.parityCheckMatrix,9,4,DECODER_MODE_SYNDROME_LOOKUP), 0)
+        self.assertEqual((counters["successes"], counters["mismatches"]), (counters["frames"], 0))
+
+    def test_syndrome_rom_double_errors(self):
+        self.check(LDPC_Decoder(self.parityCheckMatrix,9,4,DECODER_MODE_SYNDROME_ROM,max_errors=2),
+                   LDPC_Decoder_Model(self.parityCheckMatrix,9,4,DECODER_MODE_SYNDROME_ROM,max_errors=2), 2)
+
+    def test_reference_encoder(self):
+        #Error free reference frames are codewords carrying their data in the most significant bits
+        bist = LDPC_BIST(LDPC_Decoder(self.parityCheckMatrix,9,4))
+        frames = bist.reference_frames(32, 0)
+        self.assertEqual([codeword >> 5 for codeword, data in frames], [data for codeword, data in frames])
+        self.assertTrue(all(all(bin(codeword & row[0]).count("1") % 2 == 0 for row in self.parityCheckMatrix) for codeword, data in frames))
+        self.assertGreater(len(set(frames)), 8)
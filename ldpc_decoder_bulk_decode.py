@@ -0,0 +1,175 @@
+import argparse
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from src.ldpc_decoder_model import LDPC_Decoder_Model, LDPC_Bit_Flipping_Decoder_Model, codewords_to_bits, bits_to_codewords
+from src.ldpc_parity_check_matrix import EXAMPLE_CODES
+from ldpc_decoder_generator import DECODERS, build_decoder, load_code, parse_parameter
+
+#Command line bulk decoder of captured traffic. The input file is memory-mapped and streamed through the decoder in
+#fixed-size chunks: the next chunk is read and unpacked, and the previous results written, while the current chunk is
+#decoded, with at most a few chunks in memory whatever the size of the file. Every frame produces an output record of
+#data_width+1 bits: the decoded data (0 on failure) followed by the success flag in bit data_width.
+
+#[FORMAT] - FORMAT_BYTES: Each codeword (output record) in ceil(width/8) bytes, bit 'n' in bit n%8 of byte n//8
+FORMAT_BYTES = "bytes"
+
+#[FORMAT] - FORMAT_BITS: Codewords (output records) packed back-to-back without padding, bit 'n' of frame 'i' in bit
+#           (i*width+n)%8 of byte (i*width+n)//8. The last byte of an output file is padded with zeros.
+FORMAT_BITS = "bits"
+
+FORMATS = [FORMAT_BYTES, FORMAT_BITS]
+
+#[BACKEND] - BACKEND_MODEL: The bit-exact NumPy model of the decoder (LDPC_Decoder_Model)
+BACKEND_MODEL = "model"
+
+#[BACKEND] - BACKEND_COMPILED: The compiled CXXRTL simulation of the generated RTL (LDPC_Decoder_Compiled_Simulator)
+BACKEND_COMPILED = "compiled"
+
+BACKENDS = [BACKEND_MODEL, BACKEND_COMPILED]
+
+def frame_bytes(width, file_format):
+    #Bytes per frame of width 'width' (FORMAT_BYTES), or None when frames are not byte aligned (FORMAT_BITS)
+    if file_format not in FORMATS:
+        raise ValueError("Unknown format '{}', expected one of {}".format(file_format, FORMATS))
+    return (width+7)//8 if file_format == FORMAT_BYTES else None
+
+def frame_count(size, width, file_format):
+    #Number of whole frames in a file of 'size' bytes
+    record = frame_bytes(width, file_format)
+    if record is None:
+        return (8*size)//width
+    if size % record:
+        raise ValueError("A {} byte file does not hold a whole number of {} byte frames".format(size, record))
+    return size//record
+
+def read_frames(mapped, first, count, width, file_format):
+    #Unpack frames [first, first+count) of a memory-mapped uint8 file into a (count, width) array of bits.
+    #In FORMAT_BITS, first*width must be a multiple of 8.
+    record = frame_bytes(width, file_format)
+    if record is None:
+        start = first*width//8
+        bits = np.unpackbits(np.asarray(mapped[start:start+(count*width+7)//8]), bitorder="little")
+        return bits[:count*width].reshape(count, width)
+    chunk = np.asarray(mapped[first*record:(first+count)*record]).reshape(count, record)
+    return np.unpackbits(chunk, axis=1, bitorder="little")[:, :width]
+
+def pack_frames(bits, file_format):
+    #Pack a (count, width) array of bits into the bytes of 'count' frames (see read_frames)
+    record = frame_bytes(bits.shape[1], file_format)
+    if record is None:
+        return np.packbits(bits.reshape(-1), bitorder="little").tobytes()
+    return np.packbits(bits, axis=1, bitorder="little").tobytes()
+
+def build_backend(code, backend=BACKEND_MODEL):
+    #The decode function of a code description (see ldpc_decoder_generator.load_code): it takes a (frames,
+    #codeword_width) array of bits and returns the (frames, data_width) data bits, the success flags and the latency of
+    #each frame (-1 when the compiled simulation times out)
+    if backend not in BACKENDS:
+        raise ValueError("Unknown backend '{}', expected one of {}".format(backend, BACKENDS))
+    dut = build_decoder(code)
+    if backend == BACKEND_MODEL:
+        model = (LDPC_Bit_Flipping_Decoder_Model if code["decoder"] == "bit_flipping" else LDPC_Decoder_Model).from_decoder(dut)
+        def decode(bits):
+            data_output, success, latency = model.decode_bits(bits)[:3]
+            return data_output, success, latency
+        return decode
+    from src.ldpc_decoder_compiled_sim import LDPC_Decoder_Compiled_Simulator
+    simulator = LDPC_Decoder_Compiled_Simulator(dut)
+    def decode(bits):
+        data_output, success, latency = simulator.decode(bits_to_codewords(bits))[:3]
+        success = success & (latency >= 0)
+        return codewords_to_bits(data_output, code["data_width"]) * success[:, None].astype(np.uint8), success, latency
+    return decode
+
+def bulk_decode(decode, input_path, output_path, codeword_width, input_format=FORMAT_BYTES, output_format=None,
+                chunk_frames=65536, write_queue=2):
+    #Decode every frame of 'input_path' with 'decode' (see build_backend) into 'output_path', 'chunk_frames' frames at a
+    #time. Reading runs one chunk ahead and writing up to 'write_queue' chunks behind the decoding, on their own threads.
+    #Returns a report of the frames, successes, latencies, bytes and throughput.
+    output_format = output_format or input_format
+    if chunk_frames < 1:
+        raise ValueError("chunk_frames must be at least 1")
+    #Chunks of a multiple of 8 frames start on a byte boundary in FORMAT_BITS
+    chunk_frames = -(-int(chunk_frames)//8)*8
+    size = os.path.getsize(input_path)
+    frames = frame_count(size, codeword_width, input_format)
+    mapped = np.memmap(input_path, dtype=np.uint8, mode="r") if size else np.zeros(0, dtype=np.uint8)
+    report = {"frames": frames, "successes": 0, "failures": 0, "timeouts": 0, "latency_total": 0, "latency_max": 0,
+              "input_bytes": size, "output_bytes": 0}
+    started = time.time()
+    with open(output_path, "wb") as output, ThreadPoolExecutor(max_workers=1) as reader, \
+         ThreadPoolExecutor(max_workers=1) as writer:
+        def read(first):
+            return read_frames(mapped, first, min(chunk_frames, frames-first), codeword_width, input_format)
+        def write(data_output, success):
+            records = np.concatenate([data_output.astype(np.uint8), success.astype(np.uint8)[:, None]], axis=1)
+            packed = pack_frames(records, output_format)
+            output.write(packed)
+            return len(packed)
+        writes = deque()
+        pending = reader.submit(read, 0) if frames else None
+        for first in range(0,frames,chunk_frames):
+            bits = pending.result()
+            if first+chunk_frames < frames:
+                pending = reader.submit(read, first+chunk_frames)
+            data_output, success, latency = decode(bits)
+            writes.append(writer.submit(write, data_output, success))
+            while len(writes) > write_queue:
+                report["output_bytes"] += writes.popleft().result()
+            report["successes"] += int(np.count_nonzero(success))
+            report["timeouts"] += int(np.count_nonzero(latency < 0))
+            report["latency_total"] += int(latency[latency >= 0].sum())
+            report["latency_max"] = max(report["latency_max"], int(latency.max()))
+        while writes:
+            report["output_bytes"] += writes.popleft().result()
+    seconds = time.time()-started
+    report["failures"] = frames-report["successes"]
+    report["latency_mean"] = report["latency_total"]/max(frames-report["timeouts"], 1)
+    report["seconds"] = seconds
+    report["frames_per_second"] = frames/seconds if seconds > 0 else 0.0
+    report["megabits_per_second"] = 8*size/seconds/1e6 if seconds > 0 else 0.0
+    return report
+
+def main_parser():
+    parser = argparse.ArgumentParser(description="Decode a file of captured LDPC codewords")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--code", choices=sorted(EXAMPLE_CODES), help="example code")
+    source.add_argument("--alist", metavar="FILE", help="parity check matrix in alist format")
+    source.add_argument("--json", metavar="FILE", help="parity check matrix in JSON format (see load_json)")
+    parser.add_argument("--data-width", type=int, help="data width of the --alist/--json code")
+    parser.add_argument("--decoder", choices=DECODERS, help="decoder (default: {})".format(DECODERS[0]))
+    parser.add_argument("--parameter", type=parse_parameter, action="append", default=[], metavar="NAME=VALUE",
+                        help="decoder constructor argument, e.g. decoder_mode parameters such as max_errors=2 (repeatable)")
+    parser.add_argument("--backend", choices=BACKENDS, default=BACKEND_MODEL, help="decoder backend (default: %(default)s)")
+    parser.add_argument("--input-format", choices=FORMATS, default=FORMAT_BYTES, help="input file format (default: %(default)s)")
+    parser.add_argument("--output-format", choices=FORMATS, help="output file format (default: the input format)")
+    parser.add_argument("--chunk-frames", type=int, default=65536, help="frames decoded per chunk (default: %(default)s)")
+    parser.add_argument("--report", metavar="FILE", help="write the throughput report as JSON")
+    parser.add_argument("input", help="file of codewords")
+    parser.add_argument("output", help="file of decoded data and success flags")
+    return parser
+
+if __name__ == "__main__":
+    parser = main_parser()
+    args = parser.parse_args()
+    options = {"code": args.code, "alist": args.alist, "json": args.json, "data_width": args.data_width,
+               "decoder": args.decoder, "parameters": dict(args.parameter)}
+    try:
+        code = load_code({key: value for key, value in options.items() if value is not None})
+        decode = build_backend(code, args.backend)
+        report = bulk_decode(decode, args.input, args.output, code["codeword_width"], args.input_format,
+                             args.output_format, args.chunk_frames)
+    except (OSError, ValueError) as error:
+        parser.error(str(error))
+
+    print("{} frames decoded in {:.2f}s: {:.0f} frames/s, {:.1f} Mbit/s".format(
+        report["frames"], report["seconds"], report["frames_per_second"], report["megabits_per_second"]))
+    print("{} succeeded, {} failed ({} timed out), mean latency {:.2f} clock cycles (max {})".format(
+        report["successes"], report["failures"], report["timeouts"], report["latency_mean"], report["latency_max"]))
+    if args.report:
+        with open(args.report, "w") as report_file:
+            json.dump(report, report_file, indent=2)
@@ -0,0 +1,52 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from src.ldpc_decoder import DECODER_MODE_BRUTE_FORCE
+from src.ldpc_decoder_model import LDPC_Decoder_Model, LDPC_Encoder_Model
+from src.ldpc_decoder_compiled_sim import compiled_simulation_available
+from ldpc_decoder_bulk_decode import bulk_decode, build_backend, read_frames, FORMAT_BYTES, FORMAT_BITS, BACKEND_MODEL, BACKEND_COMPILED
+from ldpc_decoder_generator import load_code
+
+
+class LDPC_Decoder_Bulk_Decode_Test(unittest.TestCase):
+    parityCheckMatrix = [[0b000011100],
+                         [0b110000010],
+                         [0b001100001],
+                         [0b100001010],
+                         [0b001000101],
+                         [0b010110000]]
+    code = {"code": "9_4", "decoder": DECODER_MODE_BRUTE_FORCE}
+
+    def setUp(self):
+        #1000 encoded frames with bit errors, in chunks which do not divide the file
+        rng = np.random.default_rng(0)
+        codewords = LDPC_Encoder_Model(self.parityCheckMatrix,9,4).encode_bits(rng.integers(0, 2, size=(1000, 4), dtype=np.uint8))
+        self.codewords = codewords ^ (rng.random((1000, 9)) < 0.05).astype(np.uint8)
+        data_output, success, latency, corrected_bit = LDPC_Decoder_Model(self.parityCheckMatrix,9,4).decode_bits(self.codewords)
+        self.expected = np.concatenate([data_output, success.astype(np.uint8)[:, None]], axis=1)
+        self.latency = latency
+
+    def decode(self, file_format, backend):
+        with tempfile.TemporaryDirectory() as directory:
+            input_path, output_path = os.path.join(directory, "input"), os.path.join(directory, "output")
+            with open(input_path, "wb") as input_file:
+                input_file.write(np.packbits(self.codewords if file_format == FORMAT_BYTES else self.codewords.reshape(-1),
+                                             axis=-1, bitorder="little").tobytes())
+            report = bulk_decode(build_backend(load_code(self.code), backend), input_path, output_path, 9, file_format,
+                                 chunk_frames=100)
+            records = read_frames(np.fromfile(output_path, dtype=np.uint8), 0, 1000, 5, file_format)
+        return report, records
+
+    def test_formats(self):
+        for file_format in [FORMAT_BYTES, FORMAT_BITS]:
+            report, records = self.decode(file_format, BACKEND_MODEL)
+            self.assertEqual(records.tolist(), self.expected.tolist())
+            self.assertEqual((report["frames"], report["successes"], report["latency_total"]),
+                             (1000, int(self.expected[:, 4].sum()), int(self.latency.sum())))
+
+    @unittest.skipUnless(compiled_simulation_available(), "compiled simulation requires Yosys and a C++ compiler")
+    def test_compiled_backend(self):
+        report, records = self.decode(FORMAT_BITS, BACKEND_COMPILED)
+        self.assertEqual(records.tolist(), self.expected.tolist())
+        self.assertEqual(report["latency_total"], int(self.latency.sum()))
@@ -0,0 +1,70 @@
+import argparse
+import json
+import os
+import tempfile
+import unittest
+from src.ldpc_decoder import LDPC_Decoder, DECODER_MODE_SYNDROME_LOOKUP, DECODER_MODE_SYNDROME_ROM
+from src.ldpc_decoder_rtl import convert_rtlil
+from src.ldpc_formal import LDPC_Decoder_Formal, formal_depth, run_yosys_proof, write_generated_sby
+from ldpc_decoder_generator import load_manifest, build_codes, prove_codes
+
+
+class LDPC_Decoder_Formal_Test(unittest.TestCase):
+    parityCheckMatrix = [[0b000011100],
+                         [0b110000010],
+                         [0b001100001],
+                         [0b100001010],
+                         [0b001000101],
+                         [0b010110000]]
+
+    def prove(self, harness, induction=False):
+        return run_yosys_proof(convert_rtlil(harness, harness.ports(), flatten=True), harness.depth, induction)
+
+    def test_formal_depth(self):
+        #The worst case latency plus the reset, start and result checking cycles
+        self.assertEqual(formal_depth(LDPC_Decoder(self.parityCheckMatrix,9,4)), 19)
+        self.assertEqual(formal_depth(LDPC_Decoder(self.parityCheckMatrix,9,4,DECODER_MODE_SYNDROME_LOOKUP)), 5)
+
+    def test_equivalence(self):
+        #The lookup and ROM decoders match the syndrome reference for every codeword, by BMC and by induction
+        self.assertEqual(self.prove(LDPC_Decoder_Formal(LDPC_Decoder(self.parityCheckMatrix,9,4,DECODER_MODE_SYNDROME_LOOKUP))), "pass")
+        self.assertEqual(self.prove(LDPC_Decoder_Formal(LDPC_Decoder(self.parityCheckMatrix,9,4,DECODER_MODE_SYNDROME_ROM,max_errors=2)), True), "pass")
+
+    def test_induction(self):
+        #The prove task passes on the (6,3) code for the brute force, time-multiplexed and double buffered decoders
+        parityCheckMatrix = [[0b111100],
+                             [0b001101],
+                             [0b100110]]
+        for parameters in [{}, {"parallelism": 3}, {"double_buffered": True}]:
+            with self.subTest(**parameters):
+                self.assertEqual(self.prove(LDPC_Decoder_Formal(LDPC_Decoder(parityCheckMatrix,6,3,**parameters)), True), "pass")
+
+    def test_generated_sby(self):
+        #RTLIL generated into a file gets a SymbiYosys script reading that file, RTLIL written to stdout and Verilog none
+        with tempfile.TemporaryDirectory() as directory:
+            il_path = os.path.join(directory, "decoder.il")
+            with open(il_path, "w") as il_file:
+                args = argparse.Namespace(action="generate", generate_type=None, generate_file=il_file)
+                self.assertEqual(write_generated_sby(args, 7), os.path.join(directory, "decoder.sby"))
+            with open(os.path.join(directory, "decoder.sby")) as sby_file:
+                sby = sby_file.read()
+            self.assertIn("depth 7", sby)
+            self.assertIn("read_ilang decoder.il", sby)
+            for generate_type, generate_file in [("il", None), ("v", il_file)]:
+                args = argparse.Namespace(action="generate", generate_type=generate_type, generate_file=generate_file)
+                self.assertIsNone(write_generated_sby(args, 7))
+
+    def test_latency_violation(self):
+        #A bound one clock cycle below the actual latency is disproved
+        harness = LDPC_Decoder_Formal(LDPC_Decoder(self.parityCheckMatrix,9,4,DECODER_MODE_SYNDROME_LOOKUP))
+        harness.latency -= 1
+        self.assertEqual(self.prove(harness), "fail")
+
+    def test_prove_codes(self):
+        #The generator derives the depth from the latency and runs the formal tasks of the code
+        with tempfile.TemporaryDirectory() as directory:
+            codes = [{"name": "6_3", "code": "6_3", "decoder": DECODER_MODE_SYNDROME_LOOKUP, "artifacts": ["formal"]}]
+            with open(os.path.join(directory, "manifest.json"), "w") as manifest_file:
+                json.dump(codes, manifest_file)
+            results = prove_codes(list(build_codes(load_manifest(os.path.join(directory, "manifest.json")), directory)), ["bmc"])
+            self.assertEqual([(result["status"], result["formal_depth"], result["formal"]) for result in results], [("ok", 5, {"bmc": "pass"})])
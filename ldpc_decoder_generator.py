@@ -0,0 +1,287 @@
+import argparse
+import inspect
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from nmigen import Module
+from nmigen.asserts import Assert, Past
+from src.ldpc_decoder import LDPC_Decoder, DECODER_MODES
+from src.ldpc_bit_flipping_decoder import LDPC_Bit_Flipping_Decoder
+from src.ldpc_decoder_testbench import run_test_vectors, generate_test_vectors, SIMULATION_BACKEND_PYSIM, SIMULATION_BACKENDS
+from src.ldpc_parity_check_matrix import load_alist, load_json, as_sparse, EXAMPLE_CODES
+from src.ldpc_rtl_cache import cached_rtlil, cached_verilog
+from src.ldpc_formal import LDPC_Decoder_Formal, FORMAL_TASKS, formal_sby, run_formal_tasks
+
+#Command line generator of the decoder RTL, simulation and formal artifacts for any code, replacing the per-code
+#ldpc_decoder_6_3_* / ldpc_decoder_9_4_* scripts. A single code is described on the command line, a manifest (JSON)
+#describes many codes which are built in parallel worker processes. Every code is written to <output dir>/<name>/:
+#  il     - top.il, the flattened decoder in RTLIL
+#  v      - top.v, the decoder in Verilog
+#  sim    - test_vectors.csv, the generated test vectors run through the decoder, and sim.vcd (pysim backend only)
+#  formal - formal.il and formal.sby to run it with SymbiYosys: an LDPC_Decoder in the equivalence harness of
+#           src/ldpc_formal.py, with the BMC/induction depth derived from its latency, or the bit-flipping decoder
+#           with the assertions of formal_statements
+#The RTL goes through the RTL cache (see src/ldpc_rtl_cache.py), so codes which have not changed are not elaborated.
+
+#Decoders which can be generated: the LDPC_Decoder modes and the hard-decision bit-flipping decoder
+DECODERS = DECODER_MODES + ["bit_flipping"]
+
+ARTIFACTS = ["il", "v", "sim", "formal"]
+
+#[PARAMETER] - BIT_FLIPPING_FORMAL_DEPTH: Default BMC depth of the bit-flipping decoder, whose latency is not modelled
+BIT_FLIPPING_FORMAL_DEPTH = 100
+
+def build_decoder(code):
+    #Instantiate the decoder of a code description (see load_code)
+    if code["decoder"] == "bit_flipping":
+        return LDPC_Bit_Flipping_Decoder(code["H"], code["codeword_width"], code["data_width"], **code["parameters"])
+    return LDPC_Decoder(code["H"], code["codeword_width"], code["data_width"], code["decoder"], **code["parameters"])
+
+def formal_statements(m, decoder):
+    #The assertions of the ldpc_decoder_*_verification scripts: done and the outputs are reset when start is toggled.
+    #They do not apply to a decoder with several frames in flight, which keeps presenting its last result while the next
+    #frame is decoded.
+    if decoder.max_in_flight > 1:
+        return
+    with m.If((decoder.start == 0) & Past(decoder.start)):
+        m.d.sync += Assert(decoder.done == 0)
+        m.d.sync += Assert(decoder.data_output == 0)
+
+def load_code(description, base_dir="."):
+    #Resolve a code description (a manifest entry, or the command line arguments) into a self contained dict:
+    #  name                        - Output directory name (default: derived from the H source)
+    #  code | alist | json | H     - An example code, an alist file, a JSON file (see load_json) or packed integer rows
+    #  codeword_width, data_width  - Code dimensions (taken from the example code, the H file or a JSON data_width)
+    #  decoder                     - One of DECODERS (default: brute_force)
+    #  parameters                  - Extra constructor arguments of the decoder, e.g. {"parallelism": 4}
+    #  artifacts                   - Subset of ARTIFACTS (default: all)
+    #Relative file names are resolved against 'base_dir' (the directory of the manifest).
+    code = dict(description)
+    data_width = code.get("data_width")
+    if code.get("code") is not None:
+        if code["code"] not in EXAMPLE_CODES:
+            raise ValueError("Unknown example code '{}', expected one of {}".format(code["code"], sorted(EXAMPLE_CODES)))
+        H, codeword_width, data_width = EXAMPLE_CODES[code["code"]]
+        name = code["code"]
+    elif code.get("alist") is not None:
+        H = load_alist(os.path.join(base_dir, code["alist"]))
+        codeword_width = H.codeword_width
+        name = os.path.splitext(os.path.basename(code["alist"]))[0]
+    elif code.get("json") is not None:
+        path = os.path.join(base_dir, code["json"])
+        H = load_json(path)
+        codeword_width = H.codeword_width
+        if data_width is None:
+            with open(path) as json_file:
+                data_width = json.load(json_file).get("data_width")
+        name = os.path.splitext(os.path.basename(code["json"]))[0]
+    elif code.get("H") is not None:
+        codeword_width = code.get("codeword_width")
+        if codeword_width is None:
+            raise ValueError("A parity check matrix given as packed rows needs a codeword_width")
+        H = code["H"]
+        name = "code_{}_{}".format(codeword_width, data_width)
+    else:
+        raise ValueError("A code needs one of 'code', 'alist', 'json' or 'H'")
+    if data_width is None:
+        raise ValueError("The data_width of code '{}' is not given".format(code.get("name", name)))
+    decoder = code.get("decoder") or DECODERS[0]
+    if decoder not in DECODERS:
+        raise ValueError("Unknown decoder '{}', expected one of {}".format(decoder, DECODERS))
+    artifacts = code.get("artifacts") or ARTIFACTS
+    for artifact in artifacts:
+        if artifact not in ARTIFACTS:
+            raise ValueError("Unknown artifact '{}', expected one of {}".format(artifact, ARTIFACTS))
+    return {
+        "name": code.get("name") or name,
+        "H": as_sparse(H, codeword_width).to_packed(),
+        "codeword_width": int(codeword_width),
+        "data_width": int(data_width),
+        "decoder": decoder,
+        "parameters": dict(code.get("parameters") or {}),
+        "artifacts": list(artifacts),
+        "sim_words": int(code.get("sim_words", 16)),
+        "sim_backend": code.get("sim_backend", SIMULATION_BACKEND_PYSIM),
+        "formal_depth": None if code.get("formal_depth") is None else int(code["formal_depth"]),
+    }
+
+def load_manifest(path, defaults=None):
+    #Load a manifest: a JSON list of code descriptions, or an object with a "codes" list and "defaults" applied to
+    #every code. Each entry's own keys take precedence over 'defaults' (from the command line), then the manifest's.
+    with open(path) as manifest_file:
+        manifest = json.load(manifest_file)
+    if isinstance(manifest, list):
+        manifest = {"codes": manifest}
+    defaults = dict(manifest.get("defaults", {}), **(defaults or {}))
+    base_dir = os.path.dirname(os.path.abspath(path))
+    codes = [load_code(dict(defaults, **entry), base_dir) for entry in manifest["codes"]]
+    names = [code["name"] for code in codes]
+    duplicates = sorted(set(name for name in names if names.count(name) > 1))
+    if duplicates:
+        raise ValueError("Duplicate code names in manifest '{}': {}".format(path, duplicates))
+    return codes
+
+def build_code(code, output_dir):
+    #Write the requested artifacts of one code. Returns a summary with the files written and the seconds taken.
+    started = time.time()
+    directory = os.path.join(output_dir, code["name"])
+    os.makedirs(directory, exist_ok=True)
+    result = {"name": code["name"], "decoder": code["decoder"], "codeword_width": code["codeword_width"],
+              "data_width": code["data_width"], "directory": directory, "status": "ok", "files": []}
+    def write(file_name, text):
+        with open(os.path.join(directory, file_name), "w") as output:
+            output.write(text)
+        result["files"].append(os.path.join(directory, file_name))
+    try:
+        if "il" in code["artifacts"]:
+            dut = build_decoder(code)
+            write("top.il", cached_rtlil(dut, dut.ports(), flatten=True))
+        if "v" in code["artifacts"]:
+            dut = build_decoder(code)
+            write("top.v", cached_verilog(dut, dut.ports()))
+        if "sim" in code["artifacts"]:
+            dut = build_decoder(code)
+            vectors = generate_test_vectors(code["H"], code["codeword_width"], code["data_width"],
+                                            data_words=range(0,min(1 << code["data_width"], code["sim_words"])))
+            vcd_file = None
+            if code["sim_backend"] == SIMULATION_BACKEND_PYSIM:
+                vcd_file = open(os.path.join(directory, "sim.vcd"), "w")
+            try:
+                results = run_test_vectors(dut, vectors, backend=code["sim_backend"], vcd_file=vcd_file)
+            finally:
+                if vcd_file is not None:
+                    vcd_file.close()
+                    result["files"].append(vcd_file.name)
+            write("test_vectors.csv", "input,expected,data_output,success,latency,passed\n" + "".join(
+                "{},{},{},{},{},{}\n".format(test.input, "" if test.expected is None else test.expected, test.data_output,
+                                             int(test.success), "" if test.latency is None else test.latency, int(test.passed))
+                for test in results))
+            result["test_vectors"] = len(results)
+            result["failed_test_vectors"] = sum(1 for test in results if not test.passed)
+            if result["failed_test_vectors"]:
+                result["status"] = "failed test vectors"
+        if "formal" in code["artifacts"]:
+            dut = build_decoder(code)
+            if isinstance(dut, LDPC_Decoder):
+                harness = LDPC_Decoder_Formal(dut)
+                write("formal.il", cached_rtlil(harness, harness.ports(), flatten=True))
+                depth = code["formal_depth"] or harness.depth
+            else:
+                m = Module()
+                m.submodules.LDPC_Decoder = dut
+                formal_statements(m, dut)
+                ports = [dut.data_input, dut.data_output, dut.start, dut.done, dut.success]
+                write("formal.il", cached_rtlil(m, ports, flatten=True, key_design=dut,
+                                                key_extra=[inspect.getsource(formal_statements)]))
+                depth = code["formal_depth"] or BIT_FLIPPING_FORMAL_DEPTH
+            write("formal.sby", formal_sby(depth))
+            result["formal_depth"] = depth
+    except Exception as error:
+        result["status"] = "error: {}".format(error)
+    result["seconds"] = time.time()-started
+    return result
+
+def build_codes(codes, output_dir, workers=1):
+    #Build every code, in 'workers' processes when more than one. Yields each summary as it completes.
+    if workers <= 1 or len(codes) <= 1:
+        for code in codes:
+            yield build_code(code, output_dir)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for future in as_completed([executor.submit(build_code, code, output_dir) for code in codes]):
+            yield future.result()
+
+def prove_codes(results, tasks=FORMAL_TASKS, workers=None, timeout=None):
+    #Run the formal tasks of every built code with formal artifacts, all in parallel (see run_formal_tasks). The status of
+    #each task is recorded in the summary of its code under "formal", and a failing task fails the code.
+    jobs = []
+    for result in results:
+        if "formal_depth" in result:
+            jobs += [(result["directory"], task, result["formal_depth"]) for task in tasks]
+    statuses = run_formal_tasks(jobs, workers, timeout)
+    for result in results:
+        if "formal_depth" in result:
+            result["formal"] = {task: status for directory, task, status in statuses if directory == result["directory"]}
+            if result["status"] == "ok" and any(status not in ("pass", "skipped") for status in result["formal"].values()):
+                result["status"] = "formal " + ", ".join("{} {}".format(task, status) for task, status in result["formal"].items())
+    return results
+
+def parse_parameter(text):
+    #NAME=VALUE, the value parsed as JSON when possible (e.g. parallelism=4, double_buffered=true)
+    name, separator, value = text.partition("=")
+    if not separator or not name:
+        raise argparse.ArgumentTypeError("expected NAME=VALUE, got '{}'".format(text))
+    try:
+        return name, json.loads(value)
+    except ValueError:
+        return name, value
+
+def main_parser():
+    parser = argparse.ArgumentParser(description="Generate LDPC decoder RTL, simulation and formal artifacts")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--code", choices=sorted(EXAMPLE_CODES), help="example code")
+    source.add_argument("--alist", metavar="FILE", help="parity check matrix in alist format")
+    source.add_argument("--json", metavar="FILE", help="parity check matrix in JSON format (see load_json)")
+    source.add_argument("--manifest", metavar="FILE", help="JSON manifest of the codes to build")
+    parser.add_argument("--data-width", type=int, help="data width of the --alist/--json code")
+    parser.add_argument("--name", help="output directory name of the code (default: from the H source)")
+    parser.add_argument("--decoder", choices=DECODERS, help="decoder to generate (default: {})".format(DECODERS[0]))
+    parser.add_argument("--parameter", type=parse_parameter, action="append", default=[], metavar="NAME=VALUE",
+                        help="decoder constructor argument, e.g. parallelism=4 (repeatable)")
+    parser.add_argument("--artifacts", choices=ARTIFACTS, nargs="+", help="artifacts to generate (default: all)")
+    parser.add_argument("--sim-words", type=int, help="data words in the simulation test vectors (default: 16)")
+    parser.add_argument("--sim-backend", choices=SIMULATION_BACKENDS, help="simulation backend (default: pysim)")
+    parser.add_argument("--formal-depth", type=int,
+                        help="BMC/induction depth of formal.sby (default: from the decoder latency, {} for bit_flipping)".format(BIT_FLIPPING_FORMAL_DEPTH))
+    parser.add_argument("--prove", action="store_true", help="run the formal tasks of every code after building it")
+    parser.add_argument("--formal-tasks", choices=FORMAL_TASKS, nargs="+", default=FORMAL_TASKS,
+                        help="formal tasks run by --prove (default: all)")
+    parser.add_argument("--formal-jobs", type=int, default=os.cpu_count(),
+                        help="formal tasks run in parallel by --prove (default: %(default)s)")
+    parser.add_argument("--formal-timeout", type=float, help="seconds allowed per formal task")
+    parser.add_argument("--output-dir", default="build", help="output directory (default: %(default)s)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes for a manifest (default: %(default)s)")
+    parser.add_argument("--report", metavar="FILE", help="write the build summaries as JSON")
+    return parser
+
+if __name__ == "__main__":
+    parser = main_parser()
+    args = parser.parse_args()
+
+    #Command line options override the manifest defaults, but not the settings of each manifest entry
+    options = {"data_width": args.data_width, "name": args.name, "decoder": args.decoder,
+               "parameters": dict(args.parameter) or None, "artifacts": args.artifacts, "sim_words": args.sim_words,
+               "sim_backend": args.sim_backend, "formal_depth": args.formal_depth}
+    options = {key: value for key, value in options.items() if value is not None}
+    try:
+        if args.manifest:
+            options.pop("name", None)
+            codes = load_manifest(args.manifest, options)
+        else:
+            codes = [load_code(dict(options, code=args.code, alist=args.alist, json=args.json))]
+    except (OSError, ValueError) as error:
+        parser.error(str(error))
+
+    results = []
+    started = time.time()
+    for result in build_codes(codes, args.output_dir, args.workers):
+        results.append(result)
+        print("{:>24} {:>16} {:>6} {:>6} {:>8.1f}s {}".format(result["name"], result["decoder"], result["codeword_width"],
+                                                            result["data_width"], result["seconds"], result["status"]))
+        sys.stdout.flush()
+    print("{} codes built in {:.1f}s".format(len(results), time.time()-started))
+    if args.prove:
+        started = time.time()
+        prove_codes(results, args.formal_tasks, args.formal_jobs, args.formal_timeout)
+        for result in results:
+            if "formal" in result:
+                print("{:>24} {}".format(result["name"], " ".join("{}:{}".format(task, status)
+                                                                  for task, status in result["formal"].items())))
+        print("Formal tasks run in {:.1f}s".format(time.time()-started))
+    if args.report:
+        with open(args.report, "w") as report:
+            json.dump(sorted(results, key=lambda result: result["name"]), report, indent=2)
+    if any(result["status"] != "ok" for result in results):
+        sys.exit(1)
@@ -0,0 +1,33 @@
+import json
+import os
+import tempfile
+import unittest
+from src.ldpc_decoder import DECODER_MODE_BRUTE_FORCE, DECODER_MODE_SYNDROME_LOOKUP
+from src.ldpc_parity_check_matrix import save_json
+from ldpc_decoder_generator import load_manifest, build_codes
+
+
+class LDPC_Decoder_Generator_Test(unittest.TestCase):
+    parityCheckMatrix = [[0b000011100],
+                         [0b110000010],
+                         [0b001100001],
+                         [0b100001010],
+                         [0b001000101],
+                         [0b010110000]]
+
+    def test_manifest(self):
+        #Two codes built in parallel: an example code and a JSON code whose data_width comes from its file
+        with tempfile.TemporaryDirectory() as directory:
+            save_json(self.parityCheckMatrix,9,os.path.join(directory, "h.json"),data_width=4)
+            with open(os.path.join(directory, "manifest.json"), "w") as manifest_file:
+                json.dump({"defaults": {"decoder": DECODER_MODE_SYNDROME_LOOKUP, "artifacts": ["il", "sim"], "sim_words": 4},
+                           "codes": [{"code": "6_3"}, {"json": "h.json", "name": "9_4_parallel", "decoder": DECODER_MODE_BRUTE_FORCE,
+                                                       "parameters": {"parallelism": 4}}]}, manifest_file)
+            codes = load_manifest(os.path.join(directory, "manifest.json"))
+            self.assertEqual([(code["name"], code["codeword_width"], code["data_width"]) for code in codes], [("6_3",6,3), ("9_4_parallel",9,4)])
+            results = sorted(build_codes(codes, os.path.join(directory, "build"), workers=2), key=lambda result: result["name"])
+            self.assertEqual([result["status"] for result in results], ["ok", "ok"])
+            #Each data word error free and with a single error on each of the 5 correctable bits of the (9,4) code
+            self.assertEqual(results[1]["test_vectors"], 4*6)
+            for name in ["6_3", "9_4_parallel"]:
+                self.assertEqual(sorted(os.listdir(os.path.join(directory, "build", name))), ["sim.vcd", "test_vectors.csv", "top.il"])
@@ -0,0 +1,84 @@
+import gc
+import os
+import tempfile
+import unittest
+import warnings
+from nmigen.hdl.ir import UnusedElaboratable
+from src.ldpc_decoder import LDPC_Decoder, DECODER_MODE_SYNDROME_LOOKUP
+from src.ldpc_rtl_cache import LDPC_RTL_Cache, design_key, cached_rtlil
+
+
+class LDPC_RTL_Cache_Test(unittest.TestCase):
+    parityCheckMatrix = [[0b000011100],
+                         [0b110000010],
+                         [0b001100001],
+                         [0b100001010],
+                         [0b001000101],
+                         [0b010110000]]
+
+    def key(self, *args, **kwargs):
+        dut = LDPC_Decoder(*args, **kwargs)
+        return design_key(dut, dut.ports())
+
+    def test_design_key(self):
+        #Identical designs share a key, any change to H or to a parameter gives a new one
+        key = self.key(self.parityCheckMatrix,9,4)
+        changedMatrix = [row[:] for row in self.parityCheckMatrix]
+        changedMatrix[0][0] ^= 1
+        self.assertEqual(self.key(self.parityCheckMatrix,9,4), key)
+        self.assertNotEqual(self.key(changedMatrix,9,4), key)
+        self.assertNotEqual(self.key(self.parityCheckMatrix,9,4,DECODER_MODE_SYNDROME_LOOKUP), key)
+        self.assertNotEqual(self.key(self.parityCheckMatrix,9,4,selection_pipeline_depth=1), key)
+        self.assertNotEqual(self.key(self.parityCheckMatrix,9,4,performance_counters=True), key)
+
+    def test_cache_hit_skips_elaboration(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = LDPC_RTL_Cache(cache_dir)
+            dut = LDPC_Decoder(self.parityCheckMatrix,9,4,DECODER_MODE_SYNDROME_LOOKUP)
+            il_text = cached_rtlil(dut, dut.ports(), cache=cache)
+            self.assertIn("attribute \\top 1", il_text)
+            #Every RTLIL cache entry is replaced: a design which is not elaborated again returns the replacement
+            for file_name in os.listdir(cache_dir):
+                with open(os.path.join(cache_dir, file_name), "w") as cached_file:
+                    cached_file.write("cached")
+            dut = LDPC_Decoder(self.parityCheckMatrix,9,4,DECODER_MODE_SYNDROME_LOOKUP)
+            self.assertEqual(cached_rtlil(dut, dut.ports(), cache=cache), "cached")
+
+    def test_cache_hit_warnings(self):
+        #The designs of a cache hit are never elaborated, without nMigen warning that they were never used. Other unused
+        #designs still raise the warning.
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = LDPC_RTL_Cache(cache_dir)
+            dut = LDPC_Decoder(self.parityCheckMatrix,9,4,DECODER_MODE_SYNDROME_LOOKUP,performance_counters=True)
+            cached_rtlil(dut, dut.ports(), cache=cache)
+            with warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter("always")
+                dut = LDPC_Decoder(self.parityCheckMatrix,9,4,DECODER_MODE_SYNDROME_LOOKUP,performance_counters=True)
+                cached_rtlil(dut, dut.ports(), cache=cache)
+                unused = LDPC_Decoder(self.parityCheckMatrix,9,4)
+                expected = ["{!r} created but never used".format(unused)]
+                del dut, unused
+                gc.collect()
+            self.assertEqual([str(warning.message) for warning in caught if warning.category is UnusedElaboratable], expected)
+
+    def test_unwritable_cache(self):
+        #A cache directory which cannot be created only means the design is converted without the cache
+        with tempfile.TemporaryDirectory() as cache_dir:
+            blocked = os.path.join(cache_dir, "file")
+            open(blocked, "w").close()
+            cache = LDPC_RTL_Cache(os.path.join(blocked, "cache"))
+            self.assertFalse(cache.put("a", ".il", "x"))
+            dut = LDPC_Decoder(self.parityCheckMatrix,9,4,DECODER_MODE_SYNDROME_LOOKUP)
+            self.assertIn("attribute \\top 1", cached_rtlil(dut, dut.ports(), cache=cache))
+
+    def test_lru_eviction(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = LDPC_RTL_Cache(cache_dir, max_bytes=350)
+            for i, key in enumerate(["a", "b", "c"]):
+                cache.put(key, ".il", "x"*100)
+                os.utime(cache.path(key, ".il"), (i, i))
+            #Reading 'a' makes 'b' the least recently used entry, evicted once 'd' exceeds max_bytes
+            self.assertEqual(cache.get("a", ".il"), "x"*100)
+            cache.put("d", ".il", "x"*100)
+            self.assertEqual(sorted(os.listdir(cache_dir)), ["a.il", "c.il", "d.il"])
+            self.assertIsNone(cache.get("b", ".il"))
@@ -0,0 +1,189 @@
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+from nmigen.hdl.ir import Fragment
+from nmigen.back import rtlil
+from src.ldpc_decoder import LDPC_Decoder, DECODER_MODE_BRUTE_FORCE, DECODER_MODE_SYNDROME_LOOKUP
+from src.ldpc_decoder_validator import REDUCTION_STRATEGY_RIPPLE, REDUCTION_STRATEGY_TREE
+from src.ldpc_bit_flipping_decoder import LDPC_Bit_Flipping_Decoder
+from src.ldpc_min_sum_decoder import LDPC_Min_Sum_Decoder
+from src.ldpc_decoder_rtl import convert_rtlil, run_yosys, signal_names_traced, yosys_available
+from src.ldpc_parity_check_matrix import SparseParityCheckMatrix
+
+#Decoder configurations which can be benchmarked
+DECODERS = {
+    "brute_force": lambda H, n, k: LDPC_Decoder(H, n, k, DECODER_MODE_BRUTE_FORCE, REDUCTION_STRATEGY_RIPPLE),
+    "brute_force_tree": lambda H, n, k: LDPC_Decoder(H, n, k, DECODER_MODE_BRUTE_FORCE, REDUCTION_STRATEGY_TREE),
+    "brute_force_time_multiplexed": lambda H, n, k: LDPC_Decoder(H, n, k, DECODER_MODE_BRUTE_FORCE, REDUCTION_STRATEGY_TREE,
+                                                                 parallelism=min(8, n+1)),
+    "syndrome_lookup": lambda H, n, k: LDPC_Decoder(H, n, k, DECODER_MODE_SYNDROME_LOOKUP),
+    "bit_flipping": lambda H, n, k: LDPC_Bit_Flipping_Decoder(H, n, k),
+    "min_sum": lambda H, n, k: LDPC_Min_Sum_Decoder(H, n, k),
+}
+
+#Columns of the CSV output (the JSON output additionally holds the netlist cell count of every cell type)
+COLUMNS = ["commit", "decoder", "codeword_width", "rows", "nonzeros", "status", "elaboration_seconds", "conversion_seconds",
+           "peak_memory_bytes", "peak_rss_bytes", "submodules", "rtlil_bytes", "synth_seconds", "cells", "flip_flops", "logic_depth"]
+
+def random_regular_code(codeword_width, rows, column_weight, seed):
+    #Random (column_weight, ~row weight) regular parity check matrix: every column has column_weight nonzero entries
+    #and the row weights differ by at most one. Columns are filled one at a time from the rows with the most free
+    #entries, ties broken at random.
+    if not 0 < column_weight <= rows:
+        raise ValueError("column_weight must be between 1 and the number of rows")
+    rng = np.random.default_rng(seed)
+    remaining = np.full(rows, (codeword_width*column_weight)//rows)
+    remaining[rng.permutation(rows)[:(codeword_width*column_weight) % rows]] += 1
+    row_bits = [[] for _ in range(rows)]
+    for n in range(0,codeword_width):
+        chosen = np.lexsort((rng.random(rows), -remaining))[:column_weight]
+        remaining[chosen] -= 1
+        for i in chosen:
+            row_bits[i].append(n)
+    return SparseParityCheckMatrix(codeword_width, row_bits)
+
+def count_fragments(fragment):
+    return sum(1+count_fragments(subfragment) for subfragment, name in fragment.subfragments)
+
+def synthesize(il_text, timeout):
+    #Generic synthesis of the flattened design with Yosys. Returns (seconds, cells, flip-flops, logic depth, cell types)
+    with tempfile.TemporaryDirectory() as work:
+        with open(os.path.join(work, "design.il"), "w") as il_file:
+            il_file.write(il_text)
+        started = time.time()
+        run_yosys("read_rtlil design.il; synth -flatten -top top; tee -q -o stat.json stat -json; "
+                  "tee -q -o ltp.txt ltp -noff", work, timeout)
+        seconds = time.time()-started
+        with open(os.path.join(work, "stat.json")) as stat_file:
+            stat = json.load(stat_file)
+        with open(os.path.join(work, "ltp.txt")) as ltp_file:
+            ltp = ltp_file.read()
+    module = next(iter(stat["modules"].values()))
+    cell_types = {cell_type.lstrip("$"): int(count) for cell_type, count in module.get("num_cells_by_type", {}).items()}
+    flip_flops = sum(count for cell_type, count in cell_types.items() if "DFF" in cell_type.upper())
+    depth = int(ltp.split("length=")[1].split(")")[0]) if "length=" in ltp else None
+    return seconds, int(module["num_cells"]), flip_flops, depth, cell_types
+
+def elaborate_point(point, H):
+    #Elaborate and convert the decoder of a point. Returns (dut, submodules, RTLIL, elaboration and conversion seconds)
+    started = time.time()
+    dut = DECODERS[point["decoder"]](H, point["codeword_width"], point["codeword_width"]-point["rows"])
+    fragment = Fragment.get(dut, None)
+    submodules = count_fragments(fragment)
+    fragment = fragment.prepare(ports=dut.ports())
+    elaboration_seconds = time.time()-started
+    started = time.time()
+    il_text, name_map = rtlil.convert_fragment(fragment)
+    return dut, submodules, il_text, elaboration_seconds, time.time()-started
+
+def measure_point(point, connection):
+    #Run in a fresh process, so that its memory use only covers this design
+    result = dict(point, status="ok")
+    try:
+        H = random_regular_code(point["codeword_width"], point["rows"], point["column_weight"], point["seed"])
+        result["nonzeros"] = sum(len(bits) for bits in H.row_bits)
+        dut, result["submodules"], il_text, result["elaboration_seconds"], result["conversion_seconds"] = elaborate_point(point, H)
+        result["rtlil_bytes"] = len(il_text)
+
+        if point["trace_memory"]:
+            #Elaborate again with tracemalloc, which slows elaboration down too much to share the timed pass
+            tracemalloc.start()
+            elaborate_point(point, H)
+            result["peak_memory_bytes"] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        #ru_maxrss is reported in kilobytes on Linux
+        result["peak_rss_bytes"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss*1024
+
+        if point["synth"]:
+            if not signal_names_traced():
+                #Yosys can not link the hierarchy when port names were not traced (see ldpc_decoder_rtl.py)
+                il_text = convert_rtlil(dut, dut.ports(), flatten=True)
+            (result["synth_seconds"], result["cells"], result["flip_flops"], result["logic_depth"],
+             result["cell_types"]) = synthesize(il_text, point["synth_timeout"])
+    except subprocess.TimeoutExpired:
+        result["status"] = "synth_timeout"
+    except Exception as error:
+        result["status"] = "error: {}".format(error)
+    connection.send(result)
+
+def run_point(point, timeout):
+    #Measure a point in a child process, abandoning it after 'timeout' seconds
+    context = multiprocessing.get_context("spawn")
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=measure_point, args=(point, sender))
+    process.start()
+    result = receiver.recv() if receiver.poll(timeout) else dict(point, status="timeout")
+    process.join(1)
+    if process.is_alive():
+        process.terminate()
+        process.join()
+    return result
+
+def current_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                              universal_newlines=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return ""
+
+def main_parser():
+    parser = argparse.ArgumentParser(description="Elaboration and resource scaling benchmark of the LDPC decoders")
+    parser.add_argument("--decoder", choices=sorted(DECODERS), action="append", help="decoder to benchmark (repeatable, default: all)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[6, 16, 64, 256, 1024, 2048], help="codeword widths to sweep")
+    parser.add_argument("--row-fractions", type=float, nargs="+", default=[0.5],
+                        help="parity check rows as a fraction of the codeword width (default: %(default)s)")
+    parser.add_argument("--column-weight", type=int, default=3, help="nonzero entries per column of H (default: %(default)s)")
+    parser.add_argument("--no-trace-memory", dest="trace_memory", action="store_false",
+                        help="skip the tracemalloc pass measuring the peak Python memory of elaboration")
+    parser.add_argument("--no-synth", dest="synth", action="store_false", help="skip Yosys synthesis (cell counts and logic depth)")
+    parser.add_argument("--timeout", type=float, default=600, help="seconds allowed per point (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed of the generated codes (default: %(default)s)")
+    parser.add_argument("--output", metavar="FILE", help="write the results as JSON (.json) or CSV (.csv)")
+    return parser
+
+def write_results(results, path):
+    if path.endswith(".csv"):
+        with open(path, "w") as output:
+            output.write(",".join(COLUMNS) + "\n")
+            for result in results:
+                output.write(",".join(str(result.get(column, "")) for column in COLUMNS) + "\n")
+    else:
+        with open(path, "w") as output:
+            json.dump(results, output, indent=2)
+
+if __name__ == "__main__":
+    parser = main_parser()
+    args = parser.parse_args()
+    if args.synth and not yosys_available():
+        parser.error("synthesis requires Yosys (or use --no-synth)")
+
+    commit = current_commit()
+    results = []
+    print("{:>28} {:>6} {:>6} {:>14} {:>12} {:>12} {:>12} {:>10} {:>10} {:>8}".format(
+        "decoder", "n", "rows", "status", "elab (s)", "convert (s)", "memory (MB)", "submodules", "cells", "depth"))
+    for decoder in args.decoder or sorted(DECODERS):
+        for codeword_width in args.sizes:
+            for row_fraction in args.row_fractions:
+                rows = max(1, min(codeword_width-1, int(round(codeword_width*row_fraction))))
+                point = {"commit": commit, "decoder": decoder, "codeword_width": codeword_width, "rows": rows,
+                         "column_weight": min(args.column_weight, rows), "seed": args.seed, "synth": args.synth,
+                         "trace_memory": args.trace_memory,
+                         "synth_timeout": args.timeout}
+                result = run_point(point, args.timeout)
+                results.append(result)
+                print("{:>28} {:>6} {:>6} {:>14} {:>12} {:>12} {:>12} {:>10} {:>10} {:>8}".format(
+                    decoder, codeword_width, rows, result["status"][:14],
+                    *["{:.2f}".format(result[key]) if key in result else "-" for key in ["elaboration_seconds", "conversion_seconds"]],
+                    "{:.1f}".format(result["peak_memory_bytes"]/1e6) if "peak_memory_bytes" in result else "-",
+                    *[result.get(key, "-") for key in ["submodules", "cells", "logic_depth"]]))
+                sys.stdout.flush()
+    if args.output:
+        write_results(results, args.output)
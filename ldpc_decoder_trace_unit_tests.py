@@ -0,0 +1,129 @@
+import csv
+import os
+import random
+import tempfile
+import unittest
+from collections import Counter
+import numpy as np
+from nmigen.back.pysim import Simulator, Settle
+from src.ldpc_decoder import LDPC_Decoder
+from src.ldpc_decoder_model import LDPC_Decoder_Model, LDPC_Encoder_Model, codewords_to_ints
+from src.ldpc_decoder_testbench import SIMULATION_BACKEND_CXXRTL
+from src.ldpc_decoder_compiled_sim import compiled_simulation_available
+from src.ldpc_decoder_trace import LDPC_Transaction_Monitor, trace_frames, write_trace, write_failure_waveforms, latency_histogram
+
+
+class LDPC_Decoder_Trace_Test(unittest.TestCase):
+    parityCheckMatrix = [[0b000011100],
+                         [0b110000010],
+                         [0b001100001],
+                         [0b100001010],
+                         [0b001000101],
+                         [0b010110000]]
+
+    def setUp(self):
+        random.seed(3)
+        self.inputs = [random.randrange(0, 1 << 9) for _ in range(0,40)]
+
+    def monitor(self, dut):
+        #Records of a monitor watching frames driven back-to-back, as simulate_frames does
+        sim = Simulator(dut)
+        monitor = LDPC_Transaction_Monitor(dut, [dut.corrected_bit])
+        monitor.add_to(sim)
+        def process():
+            for input in self.inputs:
+                yield dut.data_input.eq(input)
+                yield dut.start.eq(1)
+                yield
+                yield dut.start.eq(0)
+                latency = 0
+                while latency == 0 or not (yield dut.done):
+                    yield
+                    yield Settle()
+                    latency += 1
+            yield
+        sim.add_clock(1e-6)
+        sim.add_sync_process(process)
+        sim.run()
+        self.assertEqual(len(monitor.pending), 0)
+        return monitor.records
+
+    def test_monitor(self):
+        for parameters in [{}, {"parallelism": 2}, {"double_buffered": True}]:
+            records = self.monitor(LDPC_Decoder(self.parityCheckMatrix,9,4,**parameters))
+            expected = trace_frames(LDPC_Decoder(self.parityCheckMatrix,9,4,**parameters), self.inputs)
+            self.assertEqual([record[:6] for record in records], [record[:6] for record in expected])
+            self.assertTrue(all(record.done_cycle-record.start_cycle == record.latency for record in records))
+
+    def test_double_buffered_monitor(self):
+        #Corrected, clean and uncorrectable frames presented as soon as a double buffered decoder is ready, so that
+        #results come back on consecutive clock cycles: every result is paired with its own frame
+        dut = LDPC_Decoder(self.parityCheckMatrix,9,4,double_buffered=True)
+        clean = codewords_to_ints(LDPC_Encoder_Model(self.parityCheckMatrix,9,4).encode([0b0101,0b1010]))
+        frames = [clean[0] ^ 0b10, clean[1], clean[0] ^ 0b1000, clean[1], 0b111111111, clean[0], clean[1]]
+        received = []
+        sim = Simulator(dut)
+        monitor = LDPC_Transaction_Monitor(dut, [dut.latency])
+        monitor.add_to(sim)
+        def process():
+            sent = 0
+            while len(received) < len(frames):
+                yield dut.start.eq(sent < len(frames))
+                if sent < len(frames):
+                    yield dut.data_input.eq(frames[sent])
+                yield Settle()
+                if (yield dut.start) and (yield dut.ready):
+                    sent += 1
+                yield
+                yield Settle()
+                if (yield dut.result_valid):
+                    received.append(((yield dut.data_output), (yield dut.success), (yield dut.latency)))
+            yield
+        sim.add_clock(1e-6)
+        sim.add_sync_process(process)
+        sim.run()
+        self.assertEqual([record.input for record in monitor.records], frames)
+        self.assertEqual([(record.data_output, record.success, record.latency) for record in monitor.records], received)
+        self.assertEqual([record.outputs[0] for record in monitor.records], [record.latency for record in monitor.records])
+
+    def test_trace(self):
+        dut = LDPC_Decoder(self.parityCheckMatrix,9,4)
+        data_output, success, latency, corrected_bit = LDPC_Decoder_Model(self.parityCheckMatrix,9,4).decode(self.inputs)
+        records = trace_frames(dut, self.inputs, [dut.corrected_bit])
+        self.assertEqual([record.latency for record in records], latency.tolist())
+        self.assertEqual([record.start_cycle for record in records[1:]], [record.done_cycle+1 for record in records[:-1]])
+        self.assertEqual(latency_histogram(records), Counter(latency.tolist()))
+        with tempfile.TemporaryDirectory() as directory:
+            write_trace(records, os.path.join(directory, "trace.csv"), output_names=["corrected_bit"])
+            write_trace(records, os.path.join(directory, "trace.npz"), output_names=["corrected_bit"])
+            with open(os.path.join(directory, "trace.csv")) as trace_file:
+                rows = list(csv.DictReader(trace_file))
+            columns = np.load(os.path.join(directory, "trace.npz"))
+            self.assertEqual([int(row["data_output"]) for row in rows], codewords_to_ints(data_output))
+            self.assertEqual([int(row["corrected_bit"]) for row in rows], corrected_bit.tolist())
+            self.assertEqual(codewords_to_ints(columns["input"]), self.inputs)
+            self.assertEqual(columns["success"].tolist(), success.astype(np.uint8).tolist())
+            self.assertEqual(columns["done_cycle"].tolist(), [record.done_cycle for record in records])
+
+    def test_timeouts(self):
+        #Frames which take longer than the timeout leave latency and done_cycle empty, the next frame starting after it
+        records = trace_frames(LDPC_Decoder(self.parityCheckMatrix,9,4), [0b010101111, 0b010111111], timeout=4)
+        self.assertEqual([(record.latency, record.start_cycle, record.done_cycle) for record in records],
+                         [(1, 1, 2), (None, 3, None)])
+        with tempfile.TemporaryDirectory() as directory:
+            write_trace(records, os.path.join(directory, "trace.npz"))
+            self.assertEqual(np.load(os.path.join(directory, "trace.npz"))["latency"].tolist(), [1, -1])
+
+    def test_failure_waveforms(self):
+        dut = LDPC_Decoder(self.parityCheckMatrix,9,4)
+        records = trace_frames(dut, self.inputs)
+        failing = [frame for frame, record in enumerate(records) if not record.success]
+        with tempfile.TemporaryDirectory() as directory:
+            paths = write_failure_waveforms(dut, records, os.path.join(directory, "failure"), context=1, limit=2)
+            self.assertEqual(paths, [os.path.join(directory, "failure_{}.vcd".format(frame)) for frame in failing[:2]])
+            self.assertTrue(all(os.path.getsize(path) > 0 for path in paths))
+
+    @unittest.skipUnless(compiled_simulation_available(), "compiled simulation requires Yosys and a C++ compiler")
+    def test_compiled_backend(self):
+        dut = LDPC_Decoder(self.parityCheckMatrix,9,4,parallelism=2)
+        self.assertEqual(trace_frames(dut, self.inputs, backend=SIMULATION_BACKEND_CXXRTL), trace_frames(dut, self.inputs))
@@ -0,0 +1,210 @@
+from functools import reduce
+from nmigen import Elaboratable, Module, Signal, Array, unsigned, Const, Cat, Mux
+from nmigen.build import Platform
+from nmigen.cli import main_parser, main_runner, main
+from nmigen.back.pysim import Simulator, Delay
+from nmigen.asserts import Assert, Assume, Cover
+from src.ldpc_decoder_model import LDPC_Encoder_Model, codewords_to_ints
+from src.ldpc_syndrome_table import position_width
+
+#[PARAMETER] - LFSR_WIDTH, LFSR_TAPS: Maximal length Fibonacci LFSR of the BIST data source (x^32+x^22+x^2+x+1), the taps
+#              numbering the state bits from 1
+LFSR_WIDTH = 32
+LFSR_TAPS = (32, 22, 2, 1)
+
+def lfsr_step_masks(steps, width=LFSR_WIDTH, taps=LFSR_TAPS):
+    #Unroll 'steps' steps of the LFSR into GF(2) linear functions of the current state, each given as the mask of the
+    #state bits XORed together. Every step shifts the state up by one bit and feeds the XOR of the taps into bit 0, which
+    #is also the output bit of the step. Returns (output_masks, state_masks): the mask of each output bit in order and
+    #the mask of each bit of the state after 'steps' steps.
+    state = [1 << i for i in range(0,width)]
+    outputs = []
+    for step in range(0,steps):
+        feedback = reduce(lambda a, b: a ^ b, [state[tap-1] for tap in taps])
+        outputs.append(feedback)
+        state = [feedback] + state[:-1]
+    return outputs, state
+
+def apply_mask(state, mask):
+    #The XOR of the state bits selected by 'mask'
+    return bin(state & mask).count("1") & 1
+
+class LDPC_BIST(Elaboratable):
+    #Built-in self-test wrapper keeping a decoder saturated with frames, without any external stimulus.
+    #Each frame takes fresh bits from an LFSR (unrolled, so that a whole frame is drawn per clock cycle): data_width data
+    #bits, encoded by a systematic encoder derived from the decoder's parity check matrix, and max_error_weight error
+    #positions, of which the first error_weight are flipped by the error injector (fewer bits when positions coincide).
+    #Frames are prepared one clock cycle ahead and started as soon as the decoder can take them: whenever ready is high
+    #and fewer than the decoder's max_in_flight frames are in flight, or on the clock cycle a result is presented.
+    #A checker compares every result with the transmitted data and counts the frames, successes, mismatches and cycles.
+    #reference_frames reproduces the stimulus, so results can be checked against LDPC_Decoder_Model.
+    def __init__(self, decoder, max_error_weight=2, seed=1, counter_width=32):
+
+        #[PARAMETER] - decoder: The decoder under test (data_input, start, ready, result_valid, data_output and success
+        #              ports, and max_in_flight), elaborated as a submodule of the BIST
+        self.decoder = decoder
+        self.codeword_width = decoder.codeword_width
+        self.data_width = decoder.data_output_width
+
+        #[PARAMETER] - max_error_weight: Largest number of bit errors injected per frame
+        if max_error_weight < 0:
+            raise ValueError("max_error_weight must not be negative")
+        self.max_error_weight = int(max_error_weight)
+
+        #[PARAMETER] - seed: Initial LFSR state (nonzero)
+        if not 0 < seed < (1 << LFSR_WIDTH):
+            raise ValueError("seed must be a nonzero {} bit value".format(LFSR_WIDTH))
+        self.seed = int(seed)
+
+        #[PARAMETER] - counter_width: Width of the checker counters (which saturate)
+        self.counter_width = int(counter_width)
+
+        #[PARAMETER] - position_width: LFSR bits drawn per error position
+        self.position_width = position_width(self.codeword_width)
+
+        #[PARAMETER] - frame_bits: LFSR bits drawn per frame (every error position is drawn whatever the error_weight, so
+        #              the data words do not depend on it)
+        self.frame_bits = self.data_width + self.max_error_weight*self.position_width
+
+        #[PARAMETER] - encoder: Systematic encoder model, its parity matrix giving the parity bits of the hardware encoder
+        self.encoder = LDPC_Encoder_Model(decoder.ParityCheckMatrixPythonArray, self.codeword_width, self.data_width)
+
+        #[INPUT] - enable: Start frames while set (frames in flight are completed and counted after it is cleared)
+        self.enable = Signal(1)
+
+        #[INPUT] - error_weight: Number of bit errors injected into each frame (at most max_error_weight). A change applies
+        #          from the frame after the one already prepared.
+        self.error_weight = Signal(range(self.max_error_weight+1))
+
+        #[INPUT] - clear: Clear every counter
+        self.clear = Signal(1)
+
+        #[OUTPUT] - frames: Results received from the decoder
+        self.frames = Signal(self.counter_width, reset=0)
+
+        #[OUTPUT] - successes: Results reported as successfully decoded
+        self.successes = Signal(self.counter_width, reset=0)
+
+        #[OUTPUT] - mismatches: Results reported as successfully decoded whose data differs from the transmitted data
+        self.mismatches = Signal(self.counter_width, reset=0)
+
+        #[OUTPUT] - cycles: Clock cycles with enable set (frames/cycles is the sustained throughput)
+        self.cycles = Signal(self.counter_width, reset=0)
+
+        #[OUTPUT] - idle: No frame is in flight (every started frame has been counted)
+        self.idle = Signal(1)
+
+    def ports(self):
+        return [self.enable, self.error_weight, self.clear, self.frames, self.successes, self.mismatches, self.cycles, self.idle]
+
+    def reference_frames(self, count, error_weight):
+        #The first 'count' frames generated with a constant error_weight: a list of (codeword, data) pairs
+        output_masks, state_masks = lfsr_step_masks(self.frame_bits)
+        state = self.seed
+        frames = []
+        for _ in range(0,count):
+            bits = [apply_mask(state, mask) for mask in output_masks]
+            data = sum(bit << i for i, bit in enumerate(bits[:self.data_width]))
+            error_mask = 0
+            for j in range(0,min(int(error_weight), self.max_error_weight)):
+                field = bits[self.data_width+j*self.position_width:self.data_width+(j+1)*self.position_width]
+                position = sum(bit << b for b, bit in enumerate(field))
+                error_mask |= 1 << (position-self.codeword_width if position >= self.codeword_width else position)
+            frames.append((codewords_to_ints(self.encoder.encode([data]))[0] ^ error_mask, data))
+            state = sum(apply_mask(state, mask) << i for i, mask in enumerate(state_masks))
+        return frames
+
+    def elaborate(self, platform):
+        #Instantiate the Module
+        m = Module()
+        decoder = self.decoder
+        m.submodules.decoder = decoder
+        max_in_flight = decoder.max_in_flight
+
+        #lfsr - The data source, advanced by frame_bits steps per frame
+        lfsr = Signal(LFSR_WIDTH, reset=self.seed)
+        output_masks, state_masks = lfsr_step_masks(self.frame_bits)
+        lfsr_bits = Signal(self.frame_bits)
+        for i, mask in enumerate(output_masks):
+            m.d.comb += lfsr_bits[i].eq((lfsr & mask).xor())
+
+        #Systematic encoder - The data in the most significant bits, each parity bit the XOR of the data bits of its row
+        #of the parity matrix
+        data = Signal(self.data_width)
+        parity_width = self.codeword_width-self.data_width
+        parity = Signal(parity_width)
+        m.d.comb += data.eq(lfsr_bits[:self.data_width])
+        for j in range(0,parity_width):
+            terms = [data[i] for i in range(0,self.data_width) if self.encoder.parity_matrix[j, i]]
+            m.d.comb += parity[j].eq(reduce(lambda a, b: a ^ b, terms) if terms else 0)
+
+        #Error injector - Flip the bit at each of the first error_weight positions (reduced modulo codeword_width)
+        error_mask = Signal(self.codeword_width)
+        positions = []
+        for j in range(0,self.max_error_weight):
+            field = lfsr_bits[self.data_width+j*self.position_width:self.data_width+(j+1)*self.position_width]
+            position = Signal(self.position_width, name="error_position{}".format(j))
+            m.d.comb += position.eq(Mux(field >= self.codeword_width, field-self.codeword_width, field))
+            positions.append(position)
+        for n in range(0,self.codeword_width):
+            hits = [(self.error_weight > j) & (positions[j] == n) for j in range(0,self.max_error_weight)]
+            m.d.comb += error_mask[n].eq(reduce(lambda a, b: a | b, hits) if hits else 0)
+
+        #frame_codeword/frame_data/frame_valid - The next frame, prepared one clock cycle ahead
+        frame_codeword = Signal(self.codeword_width, reset=0)
+        frame_data = Signal(self.data_width, reset=0)
+        frame_valid = Signal(1, reset=0)
+
+        #finished - The decoder presents a new result on this clock cycle
+        finished = Signal(1)
+        m.d.comb += finished.eq(decoder.result_valid)
+
+        #in_flight - Frames started and not finished yet
+        in_flight = Signal(range(max_in_flight+1), reset=0)
+
+        #issue - Start the prepared frame on this clock cycle
+        issue = Signal(1)
+        m.d.comb += [
+            issue.eq(self.enable & frame_valid & decoder.ready & ((in_flight != max_in_flight) | finished)),
+            decoder.data_input.eq(frame_codeword),
+            decoder.start.eq(issue)
+        ]
+        m.d.sync += in_flight.eq(in_flight + issue - finished)
+        m.d.comb += self.idle.eq(in_flight == 0)
+
+        #Prepare the next frame and advance the LFSR whenever the prepared one is started (or there is none yet while enabled)
+        with m.If(issue | (self.enable & ~frame_valid)):
+            m.d.sync += [
+                frame_codeword.eq(Cat(parity, data) ^ error_mask),
+                frame_data.eq(data),
+                frame_valid.eq(1)
+            ]
+            for i, mask in enumerate(state_masks):
+                m.d.sync += lfsr[i].eq((lfsr & mask).xor())
+
+        #expected - Transmitted data of the frames in flight, in the order they were started (a power of two entries, so
+        #           that the pointers wrap around)
+        depth = 1 << (max_in_flight-1).bit_length()
+        expected = Array([Signal(self.data_width, reset=0, name="expected{}".format(i)) for i in range(0,depth)])
+        write_pointer = Signal(range(depth), reset=0)
+        read_pointer = Signal(range(depth), reset=0)
+        with m.If(issue):
+            m.d.sync += expected[write_pointer].eq(frame_data)
+        if depth > 1:
+            with m.If(issue):
+                m.d.sync += write_pointer.eq(write_pointer+1)
+            with m.If(finished):
+                m.d.sync += read_pointer.eq(read_pointer+1)
+
+        #Checker
+        def counter(register, event):
+            with m.If(self.clear):
+                m.d.sync += register.eq(0)
+            with m.Elif(event & (register != (1 << self.counter_width)-1)):
+                m.d.sync += register.eq(register+1)
+
+        counter(self.frames, finished)
+        counter(self.successes, finished & decoder.success)
+        counter(self.mismatches, finished & decoder.success & (decoder.data_output != expected[read_pointer]))
+        counter(self.cycles, self.enable)
+        return m
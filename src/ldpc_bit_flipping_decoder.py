@@ -0,0 +1,138 @@
+from nmigen import Elaboratable, Module, Signal, Array, unsigned, Const, Cat
+from nmigen.build import Platform
+from nmigen.cli import main_parser, main_runner, main
+from nmigen.back.pysim import Simulator, Delay
+from nmigen.asserts import Assert, Assume, Cover
+from src.ldpc_parity_check_matrix import as_sparse
+
+class LDPC_Bit_Flipping_Decoder(Elaboratable):
+    def __init__(self, ParityCheckMatrix, codeword_width, data_width, max_iterations=20, flip_threshold=None):
+
+        #[PARAMETER] - codeword_width: Width of the input Codeword
+        self.codeword_width = int(codeword_width)
+
+        #[PARAMETER] - ParityCheckMatrixPythonArray: Python Array representing the parity check matrix
+        self.ParityCheckMatrixPythonArray = ParityCheckMatrix
+
+        #[PARAMETER] - ParityCheckMatrixRows: Number of rows in the parity check matrix
+        self.ParityCheckMatrixRows = int(len(ParityCheckMatrix))
+
+        #[PARAMETER] - data_output_width: The length of the output data
+        self.data_output_width = int(data_width)
+
+        #[PARAMETER] - max_iterations: Maximum number of bit-flipping iterations before decoding is abandoned
+        if max_iterations < 1:
+            raise ValueError("max_iterations must be at least 1")
+        self.max_iterations = int(max_iterations)
+
+        #[PARAMETER] - flip_threshold: A bit is flipped when more than flip_threshold of its parity checks fail.
+        #              None selects Gallager's majority rule (more than half of the checks on the bit fail).
+        self.flip_threshold = flip_threshold
+
+        #[PARAMETER] - row_bits: The codeword bits connected to each parity check row (the nonzero entries of each row of H)
+        #[PARAMETER] - bit_checks: The parity check rows connected to each codeword bit (the nonzero entries of each column of H)
+        H = as_sparse(ParityCheckMatrix, self.codeword_width)
+        self.row_bits = H.row_bits
+        self.bit_checks = H.bit_checks
+
+        #[INPUT] - start: The start signal to start the decoding process
+        self.start = Signal(1)
+
+        #[INPUT] - data_input: The codeword to be decoded
+        self.data_input = Signal(self.codeword_width)
+
+        #[OUTPUT] - data_output: The decoded data
+        self.data_output = Signal(self.data_output_width, reset=0)
+
+        #[OUTPUT] - success : Flag indicating whether decoding was successful or not
+        self.success = Signal(1, reset=0)
+
+        #[OUTPUT] - done: The done signal to indicate that the decoding process has stopped.
+        self.done = Signal(1, reset=0)
+
+        #[OUTPUT] - iterations: The number of bit-flipping iterations used to decode the codeword
+        self.iterations = Signal(range(self.max_iterations+1), reset=0)
+
+        #[PARAMETER] - max_in_flight: Number of accepted frames the decoder holds at once (a start while a frame is
+        #              decoding abandons that frame)
+        self.max_in_flight = 1
+
+        #[OUTPUT] - ready: The decoder accepts a codeword on this clock cycle (always high)
+        self.ready = Signal(1, reset=1)
+
+        #[OUTPUT] - result_valid: Single clock cycle strobe marking each new result on data_output/success
+        self.result_valid = Signal(1)
+
+    def ports(self):
+        return [self.data_input, self.start, self.ready, self.data_output, self.done, self.result_valid, self.success,
+                self.iterations]
+
+    def bit_flip_threshold(self, n):
+        #Number of failing parity checks on bit 'n' which must be exceeded for the bit to be flipped
+        if self.flip_threshold is None:
+            return len(self.bit_checks[n])//2
+        return int(self.flip_threshold)
+
+    def elaborate(self, platform):
+        #Instantiate the Module
+        m = Module()
+
+        #codeword - The working copy of the codeword, corrected in place on every iteration
+        codeword = Signal(unsigned(self.codeword_width), reset=0)
+
+        #syndrome - The result of each parity check row (1=Fail, 0=Pass) for the working codeword
+        syndrome = Signal(unsigned(self.ParityCheckMatrixRows))
+        for i in range(0,self.ParityCheckMatrixRows):
+            #Only the nonzero entries of each row are connected
+            m.d.comb += syndrome[i].eq(Cat(*[codeword[n] for n in self.row_bits[i]]).xor() if self.row_bits[i] else 0)
+
+        #flip_mask - The bits whose number of failing parity checks exceeds the flip threshold
+        flip_mask = Signal(unsigned(self.codeword_width))
+        for n in range(0,self.codeword_width):
+            if len(self.bit_checks[n]) == 0:
+                continue
+            failing_checks = sum(syndrome[i] for i in self.bit_checks[n])
+            m.d.comb += flip_mask[n].eq(failing_checks > self.bit_flip_threshold(n))
+
+        #running - Signal to indicate that we are currently running
+        running = Signal(1, reset=0)
+
+        #Reset the relevant registers/wires and load the input codeword into the working codeword
+        with m.If(self.start):
+            m.d.sync += [
+                codeword.eq(self.data_input),
+                self.data_output.eq(0),
+                self.done.eq(0),
+                self.success.eq(0),
+                self.iterations.eq(0),
+                running.eq(1)
+            ]
+        #Stop as soon as every parity check passes
+        with m.Elif(running & (syndrome==0)):
+            m.d.sync += [
+                self.data_output.eq(codeword[self.codeword_width-self.data_output_width:]),
+                self.success.eq(1),
+                self.done.eq(1),
+                running.eq(0)
+            ]
+        #Give up once the iteration budget has been used
+        with m.Elif(running & (self.iterations==self.max_iterations)):
+            m.d.sync += [
+                self.success.eq(0),
+                self.done.eq(1),
+                running.eq(0)
+            ]
+        #Flip every bit which fails too many of its parity checks and try again
+        with m.Elif(running):
+            m.d.sync += [
+                codeword.eq(codeword ^ flip_mask),
+                self.iterations.eq(self.iterations+1)
+            ]
+
+        #done holds each result until the next start, so result_valid strobes its rising edge. ready stays at its reset
+        #value of 1, a start being accepted on every clock cycle.
+        m.d.sync += self.ready.eq(1)
+        done_previous = Signal(1, reset=0)
+        m.d.sync += done_previous.eq(self.done)
+        m.d.comb += self.result_valid.eq(self.done & ~done_previous)
+        return m
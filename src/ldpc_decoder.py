@@ -1,12 +1,83 @@
-from nmigen import Elaboratable, Module, Signal, Array, unsigned, Const
+from nmigen import Elaboratable, Module, Signal, Array, unsigned, Const, Cat, Mux, Memory
 from nmigen.build import Platform
 from nmigen.cli import main_parser, main_runner, main
 from nmigen.back.pysim import Simulator, Delay
 from nmigen.asserts import Assert, Assume, Cover
-from src.ldpc_decoder_validator import LDPC_Decoder_Validator
+from src.ldpc_decoder_validator import LDPC_Decoder_Validator, REDUCTION_STRATEGY_RIPPLE
+from src.ldpc_priority_encoder import LDPC_Priority_Encoder
+from src.ldpc_performance_counters import LDPC_Performance_Counters
+from src.ldpc_parity_check_matrix import as_sparse
+from src.ldpc_syndrome_table import build_error_pattern_table, encode_error_pattern_table, position_width
+
+#[MODE] - DECODER_MODE_BRUTE_FORCE: Validate every single bit-flip candidate in parallel (codeword_width+1 validators)
+DECODER_MODE_BRUTE_FORCE = "brute_force"
+
+#[MODE] - DECODER_MODE_SYNDROME_LOOKUP: Compute the syndrome once and map it to the error bit via a table of H columns
+DECODER_MODE_SYNDROME_LOOKUP = "syndrome_lookup"
+
+#[MODE] - DECODER_MODE_SYNDROME_ROM: Compute the syndrome once and read the error pattern (up to max_errors bits) from a
+#         ROM holding one entry per syndrome (see ldpc_syndrome_table.py)
+DECODER_MODE_SYNDROME_ROM = "syndrome_rom"
+
+DECODER_MODES = [DECODER_MODE_BRUTE_FORCE, DECODER_MODE_SYNDROME_LOOKUP, DECODER_MODE_SYNDROME_ROM]
+
+def build_syndrome_lookup_table(ParityCheckMatrix, codeword_width):
+    #Map the syndrome of every single bit error to the position of the erroneous bit.
+    #A single error on bit 'n' produces a syndrome equal to column 'n' of the parity check matrix,
+    #with parity check row 'i' reported on syndrome bit (rows-1)-i, as in LDPC_Decoder_Validator.
+    #Columns which are all zero or which duplicate an earlier column cannot be corrected and are left out.
+    H = as_sparse(ParityCheckMatrix, codeword_width)
+    rows = len(H)
+    table = {}
+    for n in range(0,H.codeword_width):
+        syndrome = sum(1 << ((rows-1)-i) for i in H.bit_checks[n])
+        if syndrome != 0 and syndrome not in table:
+            table[syndrome] = n
+    return table
+
+def candidate_rounds(codeword_width, parallelism):
+    #Number of rounds needed to validate the codeword_width+1 bit-flip candidates on 'parallelism' validators
+    return -(-(int(codeword_width)+1)//int(parallelism))
+
+def candidate_flip_mask(round, codeword_width, parallelism, validator):
+    #Bits flipped by 'validator' in the round selected by the one-hot 'round' signal.
+    #Candidate 'c' is validated by validator c%parallelism in round c//parallelism. Candidate 0 is the input codeword
+    #itself, candidate c>0 is the input codeword with bit c-1 flipped.
+    return Cat(*[round[(n+1)//parallelism] if (n+1) % parallelism == validator else Const(0, 1)
+                 for n in range(0,codeword_width)])
+
+def candidate_exists(round, codeword_width, parallelism, validator):
+    #The last round has no candidate for the validators beyond candidate codeword_width
+    rounds = candidate_rounds(codeword_width, parallelism)
+    if validator > codeword_width-(rounds-1)*parallelism:
+        return ~round[rounds-1]
+    return Const(1, 1)
+
+def selected_flip_mask(round, codeword_width, parallelism, selected):
+    #Bits flipped by the candidate of the validator selected by the one-hot 'selected' signal (see candidate_flip_mask)
+    return Cat(*[round[(n+1)//parallelism] & selected[(n+1) % parallelism] for n in range(0,codeword_width)])
+
+def zero_syndrome(m, codeword, row_bits):
+    #Combinational check that 'codeword' passes every parity check row (the zero-syndrome fast path): clean codewords are
+    #output straight away instead of going through the bit-flip candidate search
+    passed = Signal(1, name="zero_syndrome")
+    checks = [Cat(*[codeword[n] for n in bits]).xor() for bits in row_bits if bits]
+    m.d.comb += passed.eq(~Cat(*checks).any() if checks else 1)
+    return passed
+
+def delayed_done(m, done, clear, depth):
+    #'done' delayed by 'depth' clock cycles, to line it up with the outputs of a pipelined LDPC_Priority_Encoder.
+    #Every stage is cleared while 'clear' is set, so the done flag of the previous frame can not leak into the next one.
+    for stage in range(0,depth):
+        delayed = Signal(1, reset=0, name="done_delay{}".format(stage))
+        m.d.sync += delayed.eq(done & ~clear)
+        done = delayed
+    return done
 
 class LDPC_Decoder(Elaboratable):
-    def __init__(self, ParityCheckMatrix, codeword_width, data_width):
+    def __init__(self, ParityCheckMatrix, codeword_width, data_width, decoder_mode=DECODER_MODE_BRUTE_FORCE,
+                 reduction_strategy=REDUCTION_STRATEGY_RIPPLE, reduction_pipeline_depth=0, parallelism=None, double_buffered=False,
+                 selection_pipeline_depth=0, max_errors=1, performance_counters=False):
 
         #[PARAMETER] - codeword_width: Width of the input Codeword
         self.codeword_width = int(codeword_width)
@@ -35,16 +106,124 @@ class LDPC_Decoder(Elaboratable):
         #[OUTPUT] - done: The done signal to indicate that the decoding process has stopped.
         self.done = Signal(1, reset=0)
 
+        #[PARAMETER] - decoder_mode: The decoding engine to elaborate (one of DECODER_MODES)
+        if decoder_mode not in DECODER_MODES:
+            raise ValueError("Unknown decoder_mode '{}', expected one of {}".format(decoder_mode, DECODER_MODES))
+        self.decoder_mode = decoder_mode
+
+        #[PARAMETER] - reduction_strategy: XOR reduction used by each LDPC_Decoder_Validator (brute force mode only)
+        self.reduction_strategy = reduction_strategy
+
+        #[PARAMETER] - reduction_pipeline_depth: Register stages inserted in the XOR reduction tree (brute force mode only)
+        self.reduction_pipeline_depth = reduction_pipeline_depth
+
+        #[PARAMETER] - parallelism: Number of validators the codeword_width+1 bit-flip candidates are time-multiplexed over,
+        #              in ceil((codeword_width+1)/parallelism) rounds (brute force mode only).
+        #              None elaborates the fully parallel decoder, with one validator per candidate.
+        if parallelism is not None and not 1 <= parallelism <= self.codeword_width+1:
+            raise ValueError("parallelism must be between 1 and codeword_width+1 ({})".format(self.codeword_width+1))
+        self.parallelism = None if parallelism is None else int(parallelism)
+
+        #[PARAMETER] - double_buffered: Accept the next codeword into an input buffer while the current one is decoding,
+        #              and prepare its bit-flip candidates while the validators are busy (fully parallel brute force only).
+        #              start is then only accepted while ready is high, done pulses for one clock cycle per result (and is
+        #              low for at least one clock cycle between two results) and data_output/success hold each result
+        #              until the following result replaces it.
+        if double_buffered and (self.decoder_mode != DECODER_MODE_BRUTE_FORCE or self.parallelism is not None):
+            raise ValueError("double_buffered requires the fully parallel brute force decoder")
+        self.double_buffered = bool(double_buffered)
+
+        #[PARAMETER] - max_in_flight: Number of accepted frames the decoder holds at once. With 1, a start accepted while
+        #              a frame is decoding abandons that frame (it never produces a result).
+        self.max_in_flight = 3 if self.double_buffered else 1
+
+        #[OUTPUT] - ready: The decoder accepts a codeword on this clock cycle (always high unless double_buffered, where
+        #           it is low while the input buffer is full)
+        self.ready = Signal(1, reset=1)
+
+        #[OUTPUT] - result_valid: Single clock cycle strobe marking each new result on data_output/success, in every mode
+        self.result_valid = Signal(1)
+
+        #[OUTPUT] - idle: No codeword is in the input buffer, the codeword list or the back end (double_buffered only)
+        self.idle = Signal(1)
+
+        #[PARAMETER] - selection_pipeline_depth: Register stages inserted in the LDPC_Priority_Encoder selecting the passing
+        #              bit-flip candidate (brute force mode only). Each stage adds a clock cycle to the latency.
+        if selection_pipeline_depth < 0:
+            raise ValueError("selection_pipeline_depth must not be negative")
+        self.selection_pipeline_depth = int(selection_pipeline_depth)
+
+        #[PARAMETER] - max_errors: Largest number of bit errors corrected, the weight of the error patterns stored in the
+        #              syndrome ROM (syndrome ROM mode only)
+        if max_errors < 1:
+            raise ValueError("max_errors must be at least 1")
+        self.max_errors = int(max_errors)
+
+        #[OUTPUT] - corrected_bit: The codeword bit flipped by the decoder, codeword_width if no bit was flipped
+        #           (the lowest numbered flipped bit in syndrome ROM mode)
+        self.corrected_bit = Signal(range(self.codeword_width+1), reset=self.codeword_width)
+
+        #[OUTPUT] - latency: Clock cycles from the edge sampling start up to the one setting done, valid while done is set
+        #           (as modelled by LDPC_Decoder_Model.decode). Clean codewords skip the bit-flip candidate search (see
+        #           zero_syndrome), the others take the time of the configuration, and in time-multiplexed mode the
+        #           rounds up to the first passing candidate.
+        self.latency = Signal(range(self.rounds()*(self.codeword_width+7+self.selection_pipeline_depth)+1), reset=0)
+
+        #[PARAMETER] - performance_counters: LDPC_Performance_Counters monitoring the decoder (None without instrumentation).
+        #              Its CSR bus ports (performance_counters.csr_address, ...) become ports of the decoder.
+        self.performance_counters = LDPC_Performance_Counters(self) if performance_counters else None
+
     def ports(self):
-        return [self.data_input, self.start, self.data_output, self.done, self.success]
+        ports = [self.data_input, self.start, self.ready, self.data_output, self.done, self.result_valid, self.success,
+                 self.corrected_bit, self.latency]
+        if self.double_buffered:
+            ports.insert(3, self.idle)
+        if self.performance_counters is not None:
+            ports += self.performance_counters.ports()
+        return ports
+
+    def syndrome_lookup_table(self):
+        return build_syndrome_lookup_table(self.ParityCheckMatrixPythonArray, self.codeword_width)
+
+    def error_pattern_table(self):
+        return build_error_pattern_table(self.ParityCheckMatrixPythonArray, self.codeword_width, self.max_errors)
+
+    def rounds(self):
+        #Number of rounds needed to validate every bit-flip candidate (1 for the fully parallel decoder)
+        if self.parallelism is None:
+            return 1
+        return candidate_rounds(self.codeword_width, self.parallelism)
 
     def elaborate(self, platform):
+        m = self.elaborate_decoder(platform)
+
+        #Count the clock cycles of the frame until done is set (the double buffered decoder timestamps its frames instead)
+        if not self.double_buffered:
+            with m.If(self.start):
+                m.d.sync += self.latency.eq(0)
+            with m.Elif(~self.done & (self.latency != (1 << len(self.latency))-1)):
+                m.d.sync += self.latency.eq(self.latency+1)
+        if self.performance_counters is not None:
+            m.submodules.performance_counters = self.performance_counters
+        return m
+
+    def elaborate_decoder(self, platform):
+        if self.decoder_mode == DECODER_MODE_SYNDROME_LOOKUP:
+            return self.elaborate_result_valid(self.elaborate_syndrome_lookup(platform))
+        if self.decoder_mode == DECODER_MODE_SYNDROME_ROM:
+            return self.elaborate_result_valid(self.elaborate_syndrome_rom(platform))
+        if self.parallelism is not None:
+            return self.elaborate_result_valid(self.elaborate_time_multiplexed(platform))
+        if self.double_buffered:
+            return self.elaborate_double_buffered(platform)
+
         #Instantiate the Module
         m = Module()
 
         #Instantiate a decoder/validator for each bit-flip combination of the input codeword
         for i in range(0,self.codeword_width+1):
-            m.submodules["decoder"+str(i)] = LDPC_Decoder_Validator(self.ParityCheckMatrixPythonArray,self.codeword_width)
+            m.submodules["decoder"+str(i)] = LDPC_Decoder_Validator(self.ParityCheckMatrixPythonArray,self.codeword_width,
+                                                                    self.reduction_strategy,self.reduction_pipeline_depth)
 
         #codeword_list - An array containing the input codeword and copies of the input codeword, each with a different bit flipped
         codeword_list = Array([Signal(unsigned(self.codeword_width), reset=0) for _ in range(self.codeword_width+1)])
@@ -56,8 +235,9 @@ class LDPC_Decoder(Elaboratable):
         decoders_done = Signal(1)
         m.d.comb += decoders_done.eq(m.submodules["decoder"+str(self.codeword_width)].done)
 
-        #counter - A timeout counter for catching when the decoder never finishes decoding
-        counter = Signal(self.codeword_width)
+        #input_passed - The input codeword passes every parity check (zero-syndrome fast path)
+        input_passed = zero_syndrome(m, codeword_list[self.codeword_width],
+                                     as_sparse(self.ParityCheckMatrixPythonArray, self.codeword_width).row_bits)
 
         #pipeline_stage - A signal for keeping track of the pipeline stage
         pipeline_stage = Signal(3, reset=0)
@@ -69,7 +249,9 @@ class LDPC_Decoder(Elaboratable):
             m.d.comb +=  m.submodules["decoder"+str(i)].start.eq(start_submodules)
             m.d.sync +=  m.submodules["decoder"+str(i)].data_input.eq(codeword_list[i])
             m.d.comb +=  decoder_output_list[i].eq(m.submodules["decoder"+str(i)].data_output)
-    
+
+        selector, selection_done = self.elaborate_selection(m, decoder_output_list, decoders_done, start_submodules)
+
         #Reset the relevant registers/wires and load the input codeword into a decoder input register
         with m.If(self.start):
             m.d.sync += [
@@ -77,9 +259,17 @@ class LDPC_Decoder(Elaboratable):
                 self.data_output.eq(0),
                 self.done.eq(0),
                 self.success.eq(0),
-                counter.eq(0),
+                self.corrected_bit.eq(self.codeword_width),
                 pipeline_stage.eq(1)
             ]
+        #Output a clean input codeword straight away and STOP, without validating the bit-flip candidates
+        with m.Elif((pipeline_stage==1) & input_passed):
+            m.d.sync += [
+                self.data_output.eq(codeword_list[self.codeword_width][self.codeword_width-self.data_output_width:]),
+                self.done.eq(1),
+                self.success.eq(1),
+                pipeline_stage.eq(0)
+            ]
         #Load the input codeword into the codeword list
         with m.Elif(pipeline_stage==1):
             for i in range(0,self.codeword_width):
@@ -108,16 +298,403 @@ class LDPC_Decoder(Elaboratable):
                     start_submodules.eq(0),
                     pipeline_stage.eq(pipeline_stage+1)
                 ]
-        #Start counting the timeout and validating if any of the submodules was successful in validating the codeword.
-        #Finally, output success or failure along with output data and STOP.
-        with m.Elif(pipeline_stage==5  & (~self.done) & (~self.start)):
-            for i in range(0,self.codeword_width+1):
-                m.d.sync +=  counter.eq(counter+1)
-            with m.If( (decoders_done) & (counter>(self.codeword_width+2))):
+        #As soon as the submodules have validated every candidate, output success with the corrected output data, or
+        #failure if no candidate passed, and STOP.
+        with m.Elif((pipeline_stage==5) & (~self.done) & (~self.start)):
+            with m.If( (selection_done) & selector.valid):
+                corrected = codeword_list[self.codeword_width] ^ selector.onehot[1:]
+                m.d.sync+=[self.data_output.eq(corrected[ self.codeword_width-self.data_output_width:]),
+                            self.corrected_bit.eq(Mux(selector.index==0, self.codeword_width, selector.index-1)),
+                            self.done.eq(1), self.success.eq(1)]
+            with m.Elif(selection_done):
                 m.d.sync+=[ self.done.eq(1), self.success.eq(0)]
-            with m.Elif( (decoders_done)):
-                for i in range(0,self.codeword_width+1):
-                    with m.If(decoder_output_list[i]==0b000):
-                        m.d.sync+=[self.data_output.eq(codeword_list[self.codeword_width][ self.codeword_width-self.data_output_width:]),
-                                    self.done.eq(1), self.success.eq(1)]
-        return m
\ No newline at end of file
+        return self.elaborate_result_valid(m)
+
+    def elaborate_result_valid(self, m):
+        #done holds each result until the next start, so result_valid strobes its rising edge. ready stays at its reset
+        #value of 1, a start being accepted on every clock cycle.
+        m.d.sync += self.ready.eq(1)
+        done_previous = Signal(1, reset=0)
+        m.d.sync += done_previous.eq(self.done)
+        m.d.comb += self.result_valid.eq(self.done & ~done_previous)
+        return m
+
+    def elaborate_selection(self, m, decoder_output_list, decoders_done, start_submodules):
+        #Zero-detect every candidate's parity check results and select the passing candidate with a log-depth
+        #LDPC_Priority_Encoder. The unflipped codeword (candidate codeword_width) takes priority, followed by the
+        #candidates in bit order, so request 0 is the unflipped codeword and request i+1 the codeword with bit i flipped.
+        #Returns the selector and the done signal delayed to line up with its (possibly registered) outputs.
+        m.submodules.selector = selector = LDPC_Priority_Encoder(self.codeword_width+1, self.selection_pipeline_depth)
+        m.d.comb += selector.requests.eq(Cat(~decoder_output_list[self.codeword_width].any(),
+                                             *[~decoder_output_list[i].any() for i in range(0,self.codeword_width)]))
+        return selector, delayed_done(m, decoders_done, start_submodules, selector.pipeline_depth)
+
+    def elaborate_double_buffered(self, platform):
+        #Instantiate the Module
+        m = Module()
+
+        #The decoder of elaborate() split in two: the front end loads and flips the next codeword into the codeword list
+        #while the back end waits for the validators to finish the current one. The validators only sample their input
+        #on the clock cycle after they are started, so the codeword list is free again as soon as the back end has
+        #started them.
+
+        #Instantiate a decoder/validator for each bit-flip combination of the input codeword
+        for i in range(0,self.codeword_width+1):
+            m.submodules["decoder"+str(i)] = LDPC_Decoder_Validator(self.ParityCheckMatrixPythonArray,self.codeword_width,
+                                                                    self.reduction_strategy,self.reduction_pipeline_depth)
+
+        #codeword_list - An array containing the input codeword and copies of the input codeword, each with a different bit flipped
+        codeword_list = Array([Signal(unsigned(self.codeword_width), reset=0) for _ in range(self.codeword_width+1)])
+
+        #decoder_output_list - An array containing the parity check status of each parity check row for an input codeword
+        decoder_output_list = Array([Signal(unsigned(self.ParityCheckMatrixRows), reset=0) for _ in range(self.codeword_width+1)])
+
+        #decoders_done - A signal which lets the top level know when the submodules have finished decoding/validating
+        decoders_done = Signal(1)
+        m.d.comb += decoders_done.eq(m.submodules["decoder"+str(self.codeword_width)].done)
+
+        #input_buffer/input_pending - The accepted codeword waiting for the front end
+        input_buffer = Signal(unsigned(self.codeword_width), reset=0)
+        input_pending = Signal(1, reset=0)
+
+        #front_stage - 0: Waiting for a codeword, 1: Flip the relevant bits, 2: Codeword list ready for the back end
+        front_stage = Signal(2, reset=0)
+
+        #back_stage - 0: Idle, 1: Start the validators, 2: Wait for the validators and output the result
+        back_stage = Signal(2, reset=0)
+
+        #frame_codeword - The input codeword of the frame in the back end (the codeword list already holds the next one)
+        frame_codeword = Signal(unsigned(self.codeword_width), reset=0)
+
+        #list_passed - The codeword in the codeword list passes every parity check (zero-syndrome fast path)
+        list_passed = zero_syndrome(m, codeword_list[self.codeword_width],
+                                    as_sparse(self.ParityCheckMatrixPythonArray, self.codeword_width).row_bits)
+
+        #timestamp/input_time/list_time/frame_time - A free running clock cycle counter, and the clock cycle on which the
+        #codeword in the input buffer, the codeword list and the back end was accepted (its latency is the difference)
+        timestamp = Signal(len(self.latency), reset=0)
+        input_time = Signal(len(self.latency), reset=0)
+        list_time = Signal(len(self.latency), reset=0)
+        frame_time = Signal(len(self.latency), reset=0)
+        m.d.sync += timestamp.eq(timestamp+1)
+
+        #start_submodules - A signal for starting the submodules
+        start_submodules = Signal(1, reset=0)
+
+        for i in range(0,self.codeword_width+1):
+            m.d.comb +=  m.submodules["decoder"+str(i)].start.eq(start_submodules)
+            m.d.sync +=  m.submodules["decoder"+str(i)].data_input.eq(codeword_list[i])
+            m.d.comb +=  decoder_output_list[i].eq(m.submodules["decoder"+str(i)].data_output)
+
+        selector, selection_done = self.elaborate_selection(m, decoder_output_list, decoders_done, start_submodules)
+
+        #Accept a codeword into the input buffer
+        m.d.comb += [
+            self.ready.eq(~input_pending),
+            self.idle.eq(~input_pending & (front_stage==0) & (back_stage==0))
+        ]
+        with m.If(self.start & self.ready):
+            m.d.sync += [
+                input_buffer.eq(self.data_input),
+                input_time.eq(timestamp),
+                input_pending.eq(1)
+            ]
+
+        #Front end - Load the buffered codeword into the codeword list and flip the relevant bits
+        with m.If((front_stage==0) & input_pending):
+            for i in range(0,self.codeword_width+1):
+                m.d.sync += codeword_list[i].eq(input_buffer)
+            m.d.sync += [
+                list_time.eq(input_time),
+                input_pending.eq(0),
+                front_stage.eq(1)
+            ]
+        with m.Elif(front_stage==1):
+            for i in range(0,self.codeword_width):
+                m.d.sync += codeword_list[i][i].eq(~codeword_list[i][i])
+            m.d.sync += front_stage.eq(2)
+
+        #done is a single clock cycle pulse per result
+        m.d.sync += self.done.eq(0)
+        m.d.comb += self.result_valid.eq(self.done)
+
+        #Back end - Output the result of the current frame (if any) and start validating the next one straight away.
+        #A clean codeword is output directly from the codeword list once the back end is idle, without starting the
+        #validators (results stay in order), and never on the clock cycle after another result so that done goes low
+        #between two results.
+        finished = Signal(1)
+        with m.If(back_stage==1):
+            m.d.sync += [
+                start_submodules.eq(0),
+                back_stage.eq(2)
+            ]
+        with m.Elif(back_stage==2):
+            with m.If( (selection_done) & selector.valid):
+                corrected = frame_codeword ^ selector.onehot[1:]
+                m.d.sync += [self.data_output.eq(corrected[ self.codeword_width-self.data_output_width:]),
+                             self.corrected_bit.eq(Mux(selector.index==0, self.codeword_width, selector.index-1)),
+                             self.done.eq(1), self.success.eq(1)]
+                m.d.comb += finished.eq(1)
+            with m.Elif(selection_done):
+                m.d.sync += [self.data_output.eq(0), self.corrected_bit.eq(self.codeword_width), self.done.eq(1), self.success.eq(0)]
+                m.d.comb += finished.eq(1)
+        with m.If(finished):
+            m.d.sync += [
+                self.latency.eq(timestamp-frame_time),
+                back_stage.eq(0)
+            ]
+        with m.If((back_stage==0) & (front_stage==2) & list_passed & ~self.done):
+            m.d.sync += [
+                self.data_output.eq(codeword_list[self.codeword_width][ self.codeword_width-self.data_output_width:]),
+                self.corrected_bit.eq(self.codeword_width),
+                self.done.eq(1),
+                self.success.eq(1),
+                self.latency.eq(timestamp-list_time),
+                front_stage.eq(0)
+            ]
+        with m.Elif(((back_stage==0) | finished) & (front_stage==2) & ~list_passed):
+            m.d.sync += [
+                frame_codeword.eq(codeword_list[self.codeword_width]),
+                frame_time.eq(list_time),
+                start_submodules.eq(1),
+                front_stage.eq(0),
+                back_stage.eq(1)
+            ]
+        return m
+
+    def elaborate_time_multiplexed(self, platform):
+        #Instantiate the Module
+        m = Module()
+
+        #Candidates are assigned to the validators as described in candidate_flip_mask
+        rounds = self.rounds()
+
+        #Instantiate the shared decoders/validators
+        validators = []
+        for j in range(0,self.parallelism):
+            m.submodules["decoder"+str(j)] = validator = LDPC_Decoder_Validator(self.ParityCheckMatrixPythonArray,self.codeword_width,
+                                                                                self.reduction_strategy,self.reduction_pipeline_depth)
+            validators.append(validator)
+
+        #codeword - A register holding the input codeword
+        codeword = Signal(unsigned(self.codeword_width), reset=0)
+
+        #round - One-hot register of the round being validated
+        round = Signal(rounds, reset=0)
+
+        #round_number - The round being validated, as a binary number
+        round_number = Signal(range(rounds), reset=0)
+
+        #pipeline_stage - A signal for keeping track of the pipeline stage
+        pipeline_stage = Signal(3, reset=0)
+
+        #start_submodules - A signal for starting the submodules
+        start_submodules = Signal(1, reset=0)
+
+        #candidate_passed - The validators whose candidate passed every parity check in this round
+        candidate_passed = Signal(self.parallelism)
+
+        #input_passed - The input codeword passes every parity check (zero-syndrome fast path)
+        input_passed = zero_syndrome(m, codeword, as_sparse(self.ParityCheckMatrixPythonArray, self.codeword_width).row_bits)
+
+        for j, validator in enumerate(validators):
+            with m.If(pipeline_stage==1):
+                m.d.sync += validator.data_input.eq(codeword ^ candidate_flip_mask(round, self.codeword_width, self.parallelism, j))
+            m.d.comb += [
+                validator.start.eq(start_submodules),
+                candidate_passed[j].eq((validator.data_output==0) &
+                                       candidate_exists(round, self.codeword_width, self.parallelism, j))
+            ]
+
+        #Select the lowest numbered passing candidate of the round
+        m.submodules.selector = selector = LDPC_Priority_Encoder(self.parallelism, self.selection_pipeline_depth)
+        m.d.comb += selector.requests.eq(candidate_passed)
+        selection_done = delayed_done(m, validators[0].done, start_submodules, selector.pipeline_depth)
+        candidate = Signal(range(rounds*self.parallelism))
+        m.d.comb += candidate.eq(round_number*self.parallelism + selector.index)
+
+        #Reset the relevant registers/wires, load the input codeword and start from the first round
+        with m.If(self.start):
+            m.d.sync += [
+                codeword.eq(self.data_input),
+                self.data_output.eq(0),
+                self.done.eq(0),
+                self.success.eq(0),
+                self.corrected_bit.eq(self.codeword_width),
+                round.eq(1),
+                round_number.eq(0),
+                pipeline_stage.eq(1)
+            ]
+        #Output a clean input codeword straight away and STOP, without validating the bit-flip candidates
+        with m.Elif((pipeline_stage==1) & round[0] & input_passed):
+            m.d.sync += [
+                self.data_output.eq(codeword[self.codeword_width-self.data_output_width:]),
+                self.done.eq(1),
+                self.success.eq(1),
+                pipeline_stage.eq(0)
+            ]
+        #Load this round's candidates into the validators (see candidate_flip_mask)
+        with m.Elif(pipeline_stage==1):
+            m.d.sync += pipeline_stage.eq(2)
+        #Start validating the candidates (Set Start Bit to 1)
+        with m.Elif(pipeline_stage==2):
+            m.d.sync += [
+                start_submodules.eq(1),
+                pipeline_stage.eq(3)
+            ]
+        #Start validating the candidates (Set Start Bit to 0)
+        with m.Elif(pipeline_stage==3):
+            m.d.sync += [
+                start_submodules.eq(0),
+                pipeline_stage.eq(4)
+            ]
+        #Once the validators are done, STOP on the first round with a passing candidate, or after the last round.
+        with m.Elif((pipeline_stage==4) & selection_done):
+            with m.If(selector.valid):
+                corrected = codeword ^ selected_flip_mask(round, self.codeword_width, self.parallelism, selector.onehot)
+                m.d.sync += [
+                    self.data_output.eq(corrected[self.codeword_width-self.data_output_width:]),
+                    self.corrected_bit.eq(Mux(candidate==0, self.codeword_width, candidate-1)),
+                    self.done.eq(1),
+                    self.success.eq(1),
+                    pipeline_stage.eq(0)
+                ]
+            with m.Elif(round[rounds-1]):
+                m.d.sync += [
+                    self.done.eq(1),
+                    self.success.eq(0),
+                    pipeline_stage.eq(0)
+                ]
+            with m.Else():
+                m.d.sync += [
+                    round.eq(round << 1),
+                    round_number.eq(round_number+1),
+                    pipeline_stage.eq(1)
+                ]
+        return m
+
+    def elaborate_syndrome_lookup(self, platform):
+        #Instantiate the Module
+        m = Module()
+
+        #[PARAMETER] - row_bits: The codeword bits connected to each parity check row (only these are elaborated)
+        row_bits = as_sparse(self.ParityCheckMatrixPythonArray, self.codeword_width).row_bits
+
+        #codeword - A register holding the input codeword
+        codeword = Signal(unsigned(self.codeword_width), reset=0)
+
+        #syndrome - The result of each parity check row (1=Fail, 0=Pass), computed once for the input codeword
+        syndrome = Signal(unsigned(self.ParityCheckMatrixRows), reset=0)
+
+        #pipeline_stage - A signal for keeping track of the pipeline stage
+        pipeline_stage = Signal(2, reset=0)
+
+        #Reset the relevant registers/wires and load the input codeword into the codeword register
+        with m.If(self.start):
+            m.d.sync += [
+                codeword.eq(self.data_input),
+                self.data_output.eq(0),
+                self.done.eq(0),
+                self.success.eq(0),
+                self.corrected_bit.eq(self.codeword_width),
+                pipeline_stage.eq(1)
+            ]
+        #Compute the syndrome (H.c) of the input codeword
+        with m.Elif(pipeline_stage==1):
+            for i in range(0,self.ParityCheckMatrixRows):
+                m.d.sync += syndrome[(self.ParityCheckMatrixRows-1)-i].eq(Cat(*[codeword[n] for n in row_bits[i]]).xor() if row_bits[i] else 0)
+            m.d.sync += pipeline_stage.eq(2)
+        #Map the syndrome to the erroneous bit, flip it and output success or failure along with output data and STOP.
+        with m.Elif(pipeline_stage==2):
+            m.d.sync += [
+                self.done.eq(1),
+                pipeline_stage.eq(0)
+            ]
+            with m.Switch(syndrome):
+                with m.Case(0):
+                    m.d.sync += [self.data_output.eq(codeword[self.codeword_width-self.data_output_width:]),
+                                 self.success.eq(1)]
+                for syndrome_value, bit in self.syndrome_lookup_table().items():
+                    with m.Case(syndrome_value):
+                        corrected = codeword ^ Const(1 << bit, unsigned(self.codeword_width))
+                        m.d.sync += [self.data_output.eq(corrected[self.codeword_width-self.data_output_width:]),
+                                     self.corrected_bit.eq(bit),
+                                     self.success.eq(1)]
+                with m.Case():
+                    m.d.sync += self.success.eq(0)
+        return m
+
+    def elaborate_syndrome_rom(self, platform):
+        #Instantiate the Module
+        m = Module()
+
+        #[PARAMETER] - row_bits: The codeword bits connected to each parity check row (only these are elaborated)
+        row_bits = as_sparse(self.ParityCheckMatrixPythonArray, self.codeword_width).row_bits
+
+        #[PARAMETER] - field_width: Width of each error position field of a ROM entry
+        field_width = position_width(self.codeword_width)
+
+        #rom - One entry per syndrome: the correctable flag followed by max_errors error positions (see ldpc_syndrome_table.py)
+        correctable, patterns = self.error_pattern_table()
+        rom = Memory(width=1+self.max_errors*field_width, depth=1 << self.ParityCheckMatrixRows,
+                     init=encode_error_pattern_table(correctable, patterns, self.codeword_width))
+        m.submodules.rom_read = rom_read = rom.read_port(transparent=False)
+
+        #codeword - A register holding the input codeword
+        codeword = Signal(unsigned(self.codeword_width), reset=0)
+
+        #syndrome - The result of each parity check row (1=Fail, 0=Pass), computed once for the input codeword
+        syndrome = Signal(unsigned(self.ParityCheckMatrixRows), reset=0)
+
+        #pipeline_stage - A signal for keeping track of the pipeline stage
+        pipeline_stage = Signal(2, reset=0)
+
+        #positions - The error positions of the ROM entry (codeword_width marks an unused position)
+        positions = [rom_read.data[1+j*field_width:1+(j+1)*field_width] for j in range(0,self.max_errors)]
+
+        #flip - The error pattern of the ROM entry
+        flip = Signal(unsigned(self.codeword_width))
+        for n in range(0,self.codeword_width):
+            m.d.comb += flip[n].eq(Cat(*[position == n for position in positions]).any())
+        m.d.comb += rom_read.addr.eq(syndrome)
+
+        #Reset the relevant registers/wires and load the input codeword into the codeword register
+        with m.If(self.start):
+            m.d.sync += [
+                codeword.eq(self.data_input),
+                self.data_output.eq(0),
+                self.done.eq(0),
+                self.success.eq(0),
+                self.corrected_bit.eq(self.codeword_width),
+                pipeline_stage.eq(1)
+            ]
+        #Compute the syndrome (H.c) of the input codeword
+        with m.Elif(pipeline_stage==1):
+            for i in range(0,self.ParityCheckMatrixRows):
+                m.d.sync += syndrome[(self.ParityCheckMatrixRows-1)-i].eq(Cat(*[codeword[n] for n in row_bits[i]]).xor() if row_bits[i] else 0)
+            m.d.sync += pipeline_stage.eq(2)
+        #Output a clean input codeword straight away and STOP, without waiting for the ROM
+        with m.Elif((pipeline_stage==2) & (syndrome==0)):
+            m.d.sync += [
+                self.data_output.eq(codeword[self.codeword_width-self.data_output_width:]),
+                self.done.eq(1),
+                self.success.eq(1),
+                pipeline_stage.eq(0)
+            ]
+        #Read the syndrome's entry from the ROM
+        with m.Elif(pipeline_stage==2):
+            m.d.sync += pipeline_stage.eq(3)
+        #Flip the erroneous bits and output success or failure along with output data and STOP.
+        with m.Elif(pipeline_stage==3):
+            m.d.sync += [
+                self.done.eq(1),
+                pipeline_stage.eq(0)
+            ]
+            with m.If(rom_read.data[0]):
+                corrected = codeword ^ flip
+                m.d.sync += [self.data_output.eq(corrected[self.codeword_width-self.data_output_width:]),
+                             self.corrected_bit.eq(positions[0]),
+                             self.success.eq(1)]
+            with m.Else():
+                m.d.sync += self.success.eq(0)
+        return m
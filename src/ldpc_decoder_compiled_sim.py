@@ -0,0 +1,191 @@
+#Compiled (CXXRTL) simulation backend for the start/done decoders (LDPC_Decoder, LDPC_Bit_Flipping_Decoder and
+#LDPC_Min_Sum_Decoder), for high volume cycle accurate regression.
+#
+#The decoder is converted to RTLIL, translated to C++ by Yosys' write_cxxrtl backend and compiled together with a small
+#driver into a shared library. The driver runs the same frame protocol as the pysim testbench (drive data_input, pulse
+#start for one clock cycle, wait for done) for a whole batch of frames per call, so frames are passed in and results
+#read back in bulk as NumPy arrays. Builds are cached on disk, keyed on the RTLIL and the driver source.
+#
+#Tools: Yosys is found by find_yosys (see ldpc_decoder_rtl.py) and the C++ compiler is taken from the CXX environment
+#variable (default 'c++').
+import ctypes
+import hashlib
+import os
+import shutil
+import subprocess
+import tempfile
+import numpy as np
+from src.ldpc_decoder_model import codewords_to_bits, bits_to_codewords
+from src.ldpc_decoder_rtl import LDPC_Decoder_Top, find_yosys, run_yosys, yosys_available
+from src.ldpc_rtl_cache import cached_rtlil
+
+#Driver linked with the CXXRTL model of the decoder. Each result row holds the latency (0xFFFFFFFF on a timeout)
+#followed by the 32 bit chunks of every output.
+DRIVER_SOURCE = r"""
+#include <cstdint>
+#include <cstddef>
+#include <cxxrtl/capi/cxxrtl_capi.h>
+
+extern "C" cxxrtl_toplevel cxxrtl_design_create();
+
+static void drive(cxxrtl_object *object, const uint32_t *chunks) {
+    size_t count = (object->width+31)/32;
+    for (size_t i = 0; i < count; i++)
+        object->next[i] = chunks[i];
+}
+
+static void drive_bit(cxxrtl_handle handle, cxxrtl_object *object, uint32_t value) {
+    object->next[0] = value;
+    cxxrtl_step(handle);
+}
+
+static void clock_edge(cxxrtl_handle handle, cxxrtl_object *clk) {
+    drive_bit(handle, clk, 1);
+    drive_bit(handle, clk, 0);
+}
+
+extern "C" cxxrtl_handle ldpc_create() {
+    cxxrtl_handle handle = cxxrtl_create(cxxrtl_design_create());
+    cxxrtl_step(handle);
+    return handle;
+}
+
+extern "C" void ldpc_destroy(cxxrtl_handle handle) {
+    cxxrtl_destroy(handle);
+}
+
+extern "C" int ldpc_run(cxxrtl_handle handle, const char **output_names, size_t output_count,
+                        const uint32_t *inputs, size_t frames, uint32_t *results, uint32_t timeout) {
+    cxxrtl_object *clk = cxxrtl_get(handle, "clk");
+    cxxrtl_object *rst = cxxrtl_get(handle, "rst");
+    cxxrtl_object *data_input = cxxrtl_get(handle, "data_input");
+    cxxrtl_object *start = cxxrtl_get(handle, "start");
+    cxxrtl_object *done = cxxrtl_get(handle, "done");
+    if (!clk || !rst || !data_input || !start || !done)
+        return -1;
+    cxxrtl_object *outputs[64];
+    if (output_count > 64)
+        return -1;
+    for (size_t i = 0; i < output_count; i++)
+        if (!(outputs[i] = cxxrtl_get(handle, output_names[i])))
+            return -1;
+    drive_bit(handle, rst, 0);
+
+    size_t input_chunks = (data_input->width+31)/32;
+    for (size_t frame = 0; frame < frames; frame++) {
+        drive(data_input, &inputs[frame*input_chunks]);
+        drive_bit(handle, start, 1);
+        clock_edge(handle, clk);
+        drive_bit(handle, start, 0);
+
+        //done is only cleared by the clock edge which samples start, so it is not checked before the first cycle
+        uint32_t latency = 0;
+        while (latency == 0 || !(done->curr[0] & 1)) {
+            if (latency == timeout) {
+                latency = 0xFFFFFFFF;
+                break;
+            }
+            clock_edge(handle, clk);
+            latency++;
+        }
+        *results++ = latency;
+        for (size_t i = 0; i < output_count; i++)
+            for (size_t chunk = 0; chunk < (outputs[i]->width+31)/32; chunk++)
+                *results++ = outputs[i]->curr[chunk];
+    }
+    return 0;
+}
+"""
+
+def compiled_simulation_available():
+    #True when Yosys and a C++ compiler can be found
+    return yosys_available() and shutil.which(os.environ.get("CXX", "c++")) is not None
+
+class LDPC_Decoder_Compiled_Simulator:
+    def __init__(self, dut, outputs=(), build_dir=None):
+
+        #[PARAMETER] - dut: The decoder to simulate (any decoder with the start/done interface)
+        self.dut = dut
+
+        #[PARAMETER] - outputs: Extra output signals (e.g. LDPC_Bit_Flipping_Decoder.iterations) sampled with each result
+        self.output_signals = [("data_output", dut.data_output), ("success", dut.success)] + \
+                              [("output_{}".format(i), signal) for i, signal in enumerate(outputs)]
+
+        #[PARAMETER] - build_dir: Directory caching the compiled models (default: a directory under the system temp dir)
+        self.build_dir = build_dir or os.path.join(tempfile.gettempdir(), "ldpc_decoder_cxxrtl")
+
+        top = LDPC_Decoder_Top(dut, [("data_input", dut.data_input), ("start", dut.start)],
+                               [("done", dut.done)] + self.output_signals)
+        il_text = cached_rtlil(top, top.ports())
+
+        key = hashlib.sha256((il_text + DRIVER_SOURCE).encode()).hexdigest()[:16]
+        self.library_path = os.path.join(self.build_dir, key, "ldpc_decoder_cxxrtl.so")
+        if not os.path.exists(self.library_path):
+            self.build(il_text, os.path.dirname(self.library_path))
+
+        self.library = ctypes.CDLL(self.library_path)
+        self.library.ldpc_create.restype = ctypes.c_void_p
+        self.library.ldpc_destroy.argtypes = [ctypes.c_void_p]
+        self.library.ldpc_run.argtypes = [ctypes.c_void_p, ctypes.POINTER(ctypes.c_char_p), ctypes.c_size_t,
+                                          ctypes.c_void_p, ctypes.c_size_t, ctypes.c_void_p, ctypes.c_uint32]
+        self.handle = self.library.ldpc_create()
+        self.output_names = (ctypes.c_char_p * len(self.output_signals))(*[name.encode() for name, signal in self.output_signals])
+
+    def build(self, il_text, directory):
+        #Translate the RTLIL to C++ with write_cxxrtl and compile it with the driver into a shared library
+        yosys, datdir = find_yosys()
+        os.makedirs(directory, exist_ok=True)
+        with tempfile.TemporaryDirectory(dir=directory) as work:
+            with open(os.path.join(work, "design.il"), "w") as il_file:
+                il_file.write(il_text)
+            with open(os.path.join(work, "driver.cc"), "w") as driver_file:
+                driver_file.write(DRIVER_SOURCE)
+            run_yosys("read_rtlil design.il; hierarchy -top top; proc; write_cxxrtl design.cc", work)
+            runtime = os.path.join(datdir, "include", "backends", "cxxrtl", "runtime")
+            subprocess.run([os.environ.get("CXX", "c++"), "-std=c++14", "-O2", "-shared", "-fPIC", "-I", runtime,
+                            "-o", "library.so", "design.cc", "driver.cc", os.path.join(runtime, "cxxrtl", "capi", "cxxrtl_capi.cc")],
+                           cwd=work, check=True)
+            #Publish the library atomically so that concurrent builds of the same design do not see a partial file
+            os.replace(os.path.join(work, "library.so"), os.path.join(directory, "ldpc_decoder_cxxrtl.so"))
+
+    def __del__(self):
+        if getattr(self, "handle", None):
+            self.library.ldpc_destroy(self.handle)
+            self.handle = None
+
+    def run(self, codewords, timeout=4096):
+        #Run packed codewords (see codewords_to_bits) through the simulation, continuing from the previous call.
+        #Returns the latency of each frame (-1 on a timeout) and the (batch, words) uint32 chunks of each output.
+        bits = codewords_to_bits(codewords, len(self.dut.data_input))
+        frames = bits.shape[0]
+        input_chunks = (len(self.dut.data_input)+31)//32
+        inputs = np.zeros((frames, input_chunks*32), dtype=np.uint8)
+        inputs[:, :bits.shape[1]] = bits
+        inputs = np.ascontiguousarray(np.packbits(inputs, axis=1, bitorder="little").view("<u4"))
+
+        output_chunks = [(len(signal)+31)//32 for name, signal in self.output_signals]
+        results = np.zeros((frames, 1+sum(output_chunks)), dtype=np.uint32)
+        if frames and self.library.ldpc_run(self.handle, self.output_names, len(self.output_signals), inputs.ctypes.data,
+                                            frames, results.ctypes.data, int(timeout)) != 0:
+            raise RuntimeError("Compiled model of {} is missing a port".format(type(self.dut).__name__))
+
+        latency = results[:, 0].astype(np.int64)
+        latency[results[:, 0] == 0xFFFFFFFF] = -1
+        outputs = []
+        position = 1
+        for chunks in output_chunks:
+            outputs.append(results[:, position:position+chunks])
+            position += chunks
+        return latency, outputs
+
+    def decode(self, codewords, timeout=4096):
+        #Decode packed codewords, in the same form as LDPC_Decoder_Model.decode.
+        #Returns data_output, success flags, latencies (-1 on a timeout) and then the value of each extra output.
+        latency, outputs = self.run(codewords, timeout)
+        values = []
+        for (name, signal), chunks in zip(self.output_signals, outputs):
+            packed = bits_to_codewords(np.unpackbits(chunks.view(np.uint8), axis=1, bitorder="little")[:, :len(signal)])
+            values.append(packed[:, 0] if len(signal) <= 64 else packed)
+        #Decoders with one success flag per lane (LDPC_Multi_Lane_Decoder) keep the packed flags
+        data_output, success = values[0], values[1].astype(bool) if len(self.dut.success) == 1 else values[1]
+        return (data_output, success, latency) + tuple(values[2:])
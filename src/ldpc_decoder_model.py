@@ -0,0 +1,393 @@
+#Bit-exact NumPy reference models of the decoders (and a systematic encoder) for bulk verification and design-space
+#exploration.
+#
+#Codewords are passed around as packed uint64 bit-planes: a (batch, ceil(width/64)) array where bit 'n' of a codeword is
+#bit n%64 of word n//64 (the same bit numbering as the packed parity check matrix rows and the data_input port).
+#A 1-D uint64 array or a list of Python integers is also accepted for convenience.
+import numpy as np
+from src.ldpc_decoder import DECODER_MODE_BRUTE_FORCE, DECODER_MODE_SYNDROME_LOOKUP, DECODER_MODE_SYNDROME_ROM, DECODER_MODES
+from src.ldpc_decoder_validator import REDUCTION_STRATEGY_RIPPLE, REDUCTION_STRATEGY_TREE, REDUCTION_STRATEGIES
+from src.ldpc_min_sum_decoder import MIN_SUM_NORMALIZED, build_layers
+from src.ldpc_parity_check_matrix import as_sparse
+from src.ldpc_syndrome_table import build_error_pattern_table
+
+def codewords_to_bits(codewords, width):
+    #Convert packed codewords (2-D/1-D uint64 array or list of integers) into a (batch, width) uint8 array of bits
+    if not isinstance(codewords, np.ndarray):
+        codewords = list(codewords)
+        words = (int(width)+63)//64
+        packed = np.zeros((len(codewords), words), dtype=np.uint64)
+        for w in range(0,words):
+            packed[:, w] = [(int(c) >> (64*w)) & 0xFFFFFFFFFFFFFFFF for c in codewords]
+        codewords = packed
+    codewords = np.ascontiguousarray(codewords, dtype=np.uint64)
+    if codewords.ndim == 1:
+        codewords = codewords[:, None]
+    bits = np.unpackbits(codewords.astype("<u8").view(np.uint8), axis=1, bitorder="little")
+    return bits[:, :int(width)]
+
+def bits_to_codewords(bits):
+    #Convert a (batch, width) array of bits into packed (batch, ceil(width/64)) uint64 codewords
+    bits = np.asarray(bits, dtype=np.uint8)
+    words = (bits.shape[1]+63)//64
+    padded = np.zeros((bits.shape[0], words*64), dtype=np.uint8)
+    padded[:, :bits.shape[1]] = bits
+    return np.packbits(padded, axis=1, bitorder="little").view("<u8").astype(np.uint64)
+
+def codewords_to_ints(codewords):
+    #Convert packed (batch, words) uint64 codewords into a list of Python integers
+    codewords = np.asarray(codewords, dtype=np.uint64)
+    if codewords.ndim == 1:
+        return [int(c) for c in codewords]
+    return [sum(int(word) << (64*w) for w, word in enumerate(row)) for row in codewords]
+
+class LDPC_Decoder_Model:
+    def __init__(self, ParityCheckMatrix, codeword_width, data_width, decoder_mode=DECODER_MODE_BRUTE_FORCE,
+                 reduction_strategy=REDUCTION_STRATEGY_RIPPLE, reduction_pipeline_depth=0, parallelism=None,
+                 selection_pipeline_depth=0, max_errors=1, batch_size=4096):
+
+        #[PARAMETER] - codeword_width: Width of the input Codeword
+        self.codeword_width = int(codeword_width)
+
+        #[PARAMETER] - data_output_width: The length of the output data
+        self.data_output_width = int(data_width)
+
+        #[PARAMETER] - decoder_mode, reduction_strategy, reduction_pipeline_depth, parallelism, selection_pipeline_depth,
+        #              max_errors: As for LDPC_Decoder
+        if decoder_mode not in DECODER_MODES:
+            raise ValueError("Unknown decoder_mode '{}', expected one of {}".format(decoder_mode, DECODER_MODES))
+        if reduction_strategy not in REDUCTION_STRATEGIES:
+            raise ValueError("Unknown reduction_strategy '{}', expected one of {}".format(reduction_strategy, REDUCTION_STRATEGIES))
+        self.decoder_mode = decoder_mode
+        self.reduction_strategy = reduction_strategy
+        self.reduction_pipeline_depth = int(reduction_pipeline_depth)
+        if parallelism is not None and not 1 <= parallelism <= self.codeword_width+1:
+            raise ValueError("parallelism must be between 1 and codeword_width+1 ({})".format(self.codeword_width+1))
+        self.parallelism = None if parallelism is None else int(parallelism)
+        self.selection_pipeline_depth = int(selection_pipeline_depth)
+        self.max_errors = int(max_errors)
+
+        #[PARAMETER] - batch_size: Number of codewords decoded per matrix product (bounds the working memory)
+        self.batch_size = int(batch_size)
+
+        #[PARAMETER] - H: Dense (rows, codeword_width) float32 copy of the parity check matrix, used for GF(2) matrix products
+        sparse = as_sparse(ParityCheckMatrix, self.codeword_width)
+        self.sparse = sparse
+        self.H = np.zeros((len(sparse), self.codeword_width), dtype=np.float32)
+        for i, bits in enumerate(sparse.row_bits):
+            self.H[i, bits] = 1
+
+        #[PARAMETER] - column_weights: Number of parity checks on each codeword bit
+        self.column_weights = self.H.sum(axis=0)
+
+        #[PARAMETER] - error_patterns: (correctable, patterns) syndrome table of the syndrome ROM mode
+        self.error_patterns = None
+        if self.decoder_mode == DECODER_MODE_SYNDROME_ROM:
+            self.error_patterns = build_error_pattern_table(ParityCheckMatrix, self.codeword_width, self.max_errors)
+
+    @classmethod
+    def from_decoder(cls, decoder, **kwargs):
+        #Build the model matching the parameters of an LDPC_Decoder instance
+        return cls(decoder.ParityCheckMatrixPythonArray, decoder.codeword_width, decoder.data_output_width,
+                   decoder.decoder_mode, decoder.reduction_strategy, decoder.reduction_pipeline_depth,
+                   decoder.parallelism, decoder.selection_pipeline_depth, decoder.max_errors, **kwargs)
+
+    def validator_latency(self):
+        #Clock cycles each LDPC_Decoder_Validator spends in its reduction stage
+        if self.reduction_strategy == REDUCTION_STRATEGY_TREE:
+            tree_levels = max([len(bits)-1 for bits in self.sparse.row_bits] + [0]).bit_length()
+            return min(self.reduction_pipeline_depth, tree_levels)
+        return self.codeword_width
+
+    def selection_latency(self):
+        #Clock cycles added by the register stages of the LDPC_Priority_Encoder selecting the passing candidate
+        requests = self.codeword_width+1 if self.parallelism is None else self.parallelism
+        return min(self.selection_pipeline_depth, (requests-1).bit_length())
+
+    def rounds(self):
+        #Number of rounds needed to validate every bit-flip candidate (1 for the fully parallel decoder)
+        if self.parallelism is None:
+            return 1
+        return -(-(self.codeword_width+1)//self.parallelism)
+
+    def round_latency(self):
+        #Clock cycles of each round of the time-multiplexed decoder: load, start pulse, validator reset/row select stages,
+        #the reduction, the candidate selection and the output register
+        return 6+self.validator_latency()+self.selection_latency()
+
+    def zero_syndrome_latency(self):
+        #Latency in clock cycles of a codeword which passes every parity check. The brute force decoders check the input
+        #register and output the codeword on the edge after the one which samples 'start', the syndrome modes first
+        #register the syndrome.
+        if self.decoder_mode == DECODER_MODE_BRUTE_FORCE:
+            return 1
+        return 2
+
+    def latencies(self):
+        #(success, failure) latency in clock cycles of a codeword with a nonzero syndrome: the number of rising edges
+        #after the one which samples 'start' up to and including the one which sets 'done'.
+        #The time-multiplexed decoder succeeds after a variable number of rounds (see decode_bits): its success latency
+        #is that of the first round.
+        if self.decoder_mode == DECODER_MODE_SYNDROME_LOOKUP:
+            return 2, 2
+        if self.decoder_mode == DECODER_MODE_SYNDROME_ROM:
+            return 3, 3
+        if self.parallelism is not None:
+            return self.round_latency(), self.rounds()*self.round_latency()
+        #Brute force: 5 pipeline stages, the validator reset/row select stages, the reduction, the candidate selection and the
+        #output register. Failures are reported as soon as the candidates are validated, like successes.
+        decoders_done = 7+self.validator_latency()+self.selection_latency()
+        return decoders_done, decoders_done
+
+    def syndromes(self, bits):
+        #GF(2) matrix product H.c for a (batch, codeword_width) array of bits, one row of parity check results per codeword
+        return np.fmod(bits.astype(np.float32) @ self.H.T, 2).astype(np.uint8)
+
+    def decode_bits(self, bits):
+        #Decode a (batch, codeword_width) array of bits.
+        #Returns the (batch, data_width) output bits, the success flags, the latency (clock cycles) and the corrected bit
+        #(codeword_width if no bit was flipped) of each codeword.
+        bits = np.asarray(bits, dtype=np.uint8)
+        data_output = np.zeros((bits.shape[0], self.data_output_width), dtype=np.uint8)
+        success = np.zeros(bits.shape[0], dtype=bool)
+        latency = np.zeros(bits.shape[0], dtype=np.int64)
+        corrected_bit = np.full(bits.shape[0], self.codeword_width, dtype=np.int64)
+        success_latency, failure_latency = self.latencies()
+        for start in range(0,bits.shape[0],self.batch_size):
+            chunk = bits[start:start+self.batch_size]
+            syndrome = self.syndromes(chunk)
+            if self.decoder_mode == DECODER_MODE_SYNDROME_ROM:
+                self.decode_rom(chunk, syndrome, data_output[start:start+self.batch_size], success[start:start+self.batch_size],
+                                corrected_bit[start:start+self.batch_size])
+                latency[start:start+self.batch_size] = np.where(~syndrome.any(axis=1), self.zero_syndrome_latency(), success_latency)
+                continue
+            zero_syndrome = ~syndrome.any(axis=1)
+
+            #A single error on bit 'n' leaves a syndrome equal to column 'n' of H: the Hamming distance is zero
+            syndrome_weight = syndrome.sum(axis=1, dtype=np.float32)
+            distance = syndrome_weight[:, None] + self.column_weights[None, :] - 2*(syndrome.astype(np.float32) @ self.H)
+            column_match = (distance == 0) & (self.column_weights > 0)[None, :]
+            any_match = column_match.any(axis=1)
+
+            chunk_success = zero_syndrome | any_match
+
+            #The lookup table keeps the lowest numbered bit for duplicate columns, and the brute force candidate selection
+            #prefers the unflipped codeword, then the lowest numbered bit
+            corrected = chunk.copy()
+            flip = np.flatnonzero(any_match & ~zero_syndrome & chunk_success)
+            flip_bit = np.argmax(column_match[flip], axis=1)
+            corrected[flip, flip_bit] ^= 1
+            corrected_bit[start+flip] = flip_bit
+            data_output[start:start+self.batch_size] = np.where(chunk_success[:, None],
+                                                                corrected[:, self.codeword_width-self.data_output_width:], 0)
+            success[start:start+self.batch_size] = chunk_success
+            if self.parallelism is not None and self.decoder_mode == DECODER_MODE_BRUTE_FORCE:
+                #Candidate 0 is the unflipped codeword and candidate c>0 flips bit c-1: the decoder stops after the
+                #round holding the first passing candidate
+                first_candidate = np.where(zero_syndrome, 0, 1+np.argmax(column_match, axis=1))
+                latency[start:start+self.batch_size] = np.where(chunk_success, (first_candidate//self.parallelism+1)*success_latency,
+                                                                failure_latency)
+            else:
+                latency[start:start+self.batch_size] = np.where(chunk_success, success_latency, failure_latency)
+            latency[start:start+self.batch_size][zero_syndrome] = self.zero_syndrome_latency()
+        return data_output, success, latency, corrected_bit
+
+    def decode_rom(self, chunk, syndrome, data_output, success, corrected_bit):
+        #Syndrome ROM mode: look the error pattern of each syndrome up in the table, filling in the output arrays
+        correctable, patterns = self.error_patterns
+        rows = syndrome.shape[1]
+        address = (syndrome.astype(np.int64) << np.arange(rows-1, -1, -1, dtype=np.int64)[None, :]).sum(axis=1)
+        corrected = chunk.copy()
+        #The unused positions (codeword_width) index a padding column which is dropped again
+        flips = np.zeros((chunk.shape[0], self.codeword_width+1), dtype=np.uint8)
+        np.put_along_axis(flips, patterns[address].astype(np.int64), 1, axis=1)
+        corrected ^= flips[:, :self.codeword_width]
+        success[:] = correctable[address]
+        data_output[:] = np.where(success[:, None], corrected[:, self.codeword_width-self.data_output_width:], 0)
+        corrected_bit[:] = np.where(success, patterns[address, 0], self.codeword_width)
+
+    def decode(self, codewords):
+        #Decode packed codewords (see codewords_to_bits).
+        #Returns data_output (1-D uint64 if data_width <= 64, else packed (batch, words)), success flags, latencies and
+        #corrected bits.
+        data_output, success, latency, corrected_bit = self.decode_bits(codewords_to_bits(codewords, self.codeword_width))
+        packed = bits_to_codewords(data_output)
+        if self.data_output_width <= 64:
+            packed = packed[:, 0]
+        return packed, success, latency, corrected_bit
+
+class LDPC_Encoder_Model:
+    def __init__(self, ParityCheckMatrix, codeword_width, data_width):
+
+        #[PARAMETER] - codeword_width: Width of the output Codeword
+        self.codeword_width = int(codeword_width)
+
+        #[PARAMETER] - data_width: Width of the data, carried unchanged in the most significant bits of the codeword
+        self.data_width = int(data_width)
+        parity_width = self.codeword_width-self.data_width
+
+        #Solve H_p.p = H_d.d over GF(2) by Gaussian elimination on [H_p | H_d], where H_p holds the parity bit
+        #columns (0 to parity_width-1) and H_d the data bit columns of H
+        sparse = as_sparse(ParityCheckMatrix, self.codeword_width)
+        H = np.zeros((len(sparse), self.codeword_width), dtype=np.uint8)
+        for i, bits in enumerate(sparse.row_bits):
+            H[i, bits] = 1
+        pivot_row = 0
+        for column in range(0,parity_width):
+            candidates = np.flatnonzero(H[pivot_row:, column]) + pivot_row
+            if len(candidates) == 0:
+                raise ValueError("Parity bit {} is not determined by the parity check matrix: H is not systematic".format(column))
+            H[[pivot_row, candidates[0]]] = H[[candidates[0], pivot_row]]
+            others = np.flatnonzero(H[:, column])
+            others = others[others != pivot_row]
+            H[others] ^= H[pivot_row]
+            pivot_row += 1
+
+        #[PARAMETER] - parity_matrix: (parity_width, data_width) matrix giving each parity bit from the data bits (p = A.d)
+        self.parity_matrix = H[:parity_width, parity_width:].astype(np.float32)
+
+    def encode_bits(self, data_bits):
+        #Encode a (batch, data_width) array of bits into a (batch, codeword_width) array of bits
+        data_bits = np.asarray(data_bits, dtype=np.uint8)
+        parity_bits = np.fmod(data_bits.astype(np.float32) @ self.parity_matrix.T, 2).astype(np.uint8)
+        return np.concatenate([parity_bits, data_bits], axis=1)
+
+    def encode(self, data):
+        #Encode packed data words (see codewords_to_bits) into packed codewords
+        return bits_to_codewords(self.encode_bits(codewords_to_bits(data, self.data_width)))
+
+class LDPC_Bit_Flipping_Decoder_Model:
+    def __init__(self, ParityCheckMatrix, codeword_width, data_width, max_iterations=20, flip_threshold=None):
+
+        #[PARAMETER] - codeword_width, data_output_width, max_iterations, flip_threshold: As for LDPC_Bit_Flipping_Decoder
+        self.codeword_width = int(codeword_width)
+        self.data_output_width = int(data_width)
+        self.max_iterations = int(max_iterations)
+        sparse = as_sparse(ParityCheckMatrix, self.codeword_width)
+        self.H = np.zeros((len(sparse), self.codeword_width), dtype=np.float32)
+        for i, bits in enumerate(sparse.row_bits):
+            self.H[i, bits] = 1
+        column_weights = self.H.sum(axis=0)
+
+        #[PARAMETER] - thresholds: Number of failing parity checks on each bit which must be exceeded for it to flip
+        if flip_threshold is None:
+            self.thresholds = np.floor_divide(column_weights, 2)
+        else:
+            self.thresholds = np.full(self.codeword_width, float(flip_threshold), dtype=np.float32)
+        self.thresholds[column_weights == 0] = np.inf
+
+    @classmethod
+    def from_decoder(cls, decoder):
+        #Build the model matching the parameters of an LDPC_Bit_Flipping_Decoder instance
+        return cls(decoder.ParityCheckMatrixPythonArray, decoder.codeword_width, decoder.data_output_width,
+                   decoder.max_iterations, decoder.flip_threshold)
+
+    def decode_bits(self, bits):
+        #Decode a (batch, codeword_width) array of bits.
+        #Returns the output bits, the success flags, the latency (clock cycles) and the iterations used by each codeword.
+        codeword = np.array(bits, dtype=np.uint8)
+        success = np.zeros(codeword.shape[0], dtype=bool)
+        iterations = np.full(codeword.shape[0], self.max_iterations, dtype=np.int64)
+        active = np.arange(codeword.shape[0])
+        for iteration in range(0,self.max_iterations+1):
+            syndrome = np.fmod(codeword[active].astype(np.float32) @ self.H.T, 2)
+            converged = ~syndrome.any(axis=1)
+            success[active[converged]] = True
+            iterations[active[converged]] = iteration
+            active, syndrome = active[~converged], syndrome[~converged]
+            if iteration == self.max_iterations or len(active) == 0:
+                break
+            codeword[active] ^= ((syndrome @ self.H) > self.thresholds[None, :]).astype(np.uint8)
+        #Successful codewords output their data bits, failed codewords output zero
+        data_output = np.where(success[:, None], codeword[:, self.codeword_width-self.data_output_width:], 0).astype(np.uint8)
+        return data_output, success, iterations+1, iterations
+
+class LDPC_QC_Bit_Flipping_Decoder_Model(LDPC_Bit_Flipping_Decoder_Model):
+    #Model of LDPC_QC_Bit_Flipping_Decoder: bit-flipping on the expanded matrix, with the latency of the circulant schedule
+    def __init__(self, ParityCheckMatrix, codeword_width, data_width, max_iterations=20, flip_threshold=None):
+        super().__init__(ParityCheckMatrix, codeword_width, data_width, max_iterations, flip_threshold)
+
+        #[PARAMETER] - circulants: Number of nonzero circulants, each taking one clock cycle per phase
+        self.circulants = len(ParityCheckMatrix.circulants)
+
+    def decode_bits(self, bits):
+        #As LDPC_Bit_Flipping_Decoder_Model.decode_bits. Every iteration runs the syndrome and flip phases, and the final
+        #syndrome phase decides, through the two stage schedule/memory read pipeline.
+        data_output, success, latency, iterations = super().decode_bits(bits)
+        return data_output, success, self.circulants+2+2*self.circulants*iterations, iterations
+
+class LDPC_Min_Sum_Decoder_Model:
+    def __init__(self, ParityCheckMatrix, codeword_width, data_width, llr_width=6, max_iterations=10,
+                 check_node_units=1, min_sum_variant=MIN_SUM_NORMALIZED, normalization_shift=2, offset=1):
+
+        #[PARAMETER] - As for LDPC_Min_Sum_Decoder
+        self.codeword_width = int(codeword_width)
+        self.data_output_width = int(data_width)
+        self.llr_width = int(llr_width)
+        self.posterior_width = self.llr_width+2
+        self.max_iterations = int(max_iterations)
+        self.min_sum_variant = min_sum_variant
+        self.normalization_shift = int(normalization_shift)
+        self.offset = int(offset)
+        self.row_bits = as_sparse(ParityCheckMatrix, self.codeword_width).row_bits
+        self.layers = build_layers(ParityCheckMatrix, self.codeword_width, check_node_units)
+
+    @classmethod
+    def from_decoder(cls, decoder):
+        #Build the model matching the parameters of an LDPC_Min_Sum_Decoder instance
+        return cls(decoder.ParityCheckMatrixPythonArray, decoder.codeword_width, decoder.data_output_width,
+                   decoder.llr_width, decoder.max_iterations, decoder.check_node_units, decoder.min_sum_variant,
+                   decoder.normalization_shift, decoder.offset)
+
+    def quantize(self, llrs, scale=1.0):
+        #Round and saturate real valued LLRs (positive = 0 more likely) to the llr_width input of the decoder
+        maximum = (1 << (self.llr_width-1))-1
+        return np.clip(np.rint(np.asarray(llrs)*scale), -maximum, maximum).astype(np.int64)
+
+    def decode_llrs(self, llrs):
+        #Decode a (batch, codeword_width) array of integer LLRs.
+        #Returns the output bits, the success flags, the latency (clock cycles) and the iterations used by each codeword.
+        message_maximum = (1 << (self.llr_width-1))-1
+        posterior_maximum = (1 << (self.posterior_width-1))-1
+        posterior = np.array(llrs, dtype=np.int64)
+        batch = posterior.shape[0]
+        check_messages = [np.zeros((batch, len(bits)), dtype=np.int64) for bits in self.row_bits]
+        success = np.zeros(batch, dtype=bool)
+        iterations = np.full(batch, self.max_iterations, dtype=np.int64)
+        active = np.arange(batch)
+        for iteration in range(0,self.max_iterations+1):
+            hard_decision = (posterior[active] < 0).astype(np.int64)
+            converged = np.ones(len(active), dtype=bool)
+            for bits in self.row_bits:
+                converged &= (hard_decision[:, bits].sum(axis=1) % 2) == 0
+            success[active[converged]] = True
+            iterations[active[converged]] = iteration
+            active = active[~converged]
+            if iteration == self.max_iterations or len(active) == 0:
+                break
+            for rows in self.layers:
+                for i in rows:
+                    bits = self.row_bits[i]
+                    #The posterior update uses the unsaturated bit-to-check messages, the check node the saturated ones
+                    unsaturated_messages = posterior[np.ix_(active, bits)] - check_messages[i][active]
+                    bit_messages = np.clip(unsaturated_messages, -message_maximum, message_maximum)
+                    magnitudes = np.abs(bit_messages)
+                    #Smallest and second smallest magnitude (ties keep the first position, as the hardware scan does)
+                    minimum_index = np.argmin(magnitudes, axis=1)
+                    minimum_1 = magnitudes[np.arange(len(active)), minimum_index]
+                    others = magnitudes.copy()
+                    others[np.arange(len(active)), minimum_index] = message_maximum
+                    minimum_2 = others.min(axis=1) if len(bits) > 1 else np.full(len(active), message_maximum)
+                    magnitude = np.where(np.arange(len(bits))[None, :] == minimum_index[:, None], minimum_2[:, None], minimum_1[:, None])
+                    if self.min_sum_variant == MIN_SUM_NORMALIZED:
+                        magnitude = magnitude - (magnitude >> self.normalization_shift)
+                    else:
+                        magnitude = np.maximum(magnitude - self.offset, 0)
+                    signs = bit_messages < 0
+                    sign_product = signs.sum(axis=1) % 2 == 1
+                    new_messages = np.where(signs ^ sign_product[:, None], -magnitude, magnitude)
+                    posterior[np.ix_(active, bits)] = np.clip(unsaturated_messages + new_messages, -posterior_maximum, posterior_maximum)
+                    check_messages[i][active] = new_messages
+        hard_decision = (posterior < 0).astype(np.uint8)
+        data_output = hard_decision[:, self.codeword_width-self.data_output_width:]
+        return data_output, success, 1+iterations*len(self.layers), iterations
@@ -0,0 +1,82 @@
+#RTL generation helpers shared by the compiled simulation backend, the benchmarks and the generators.
+#
+#nMigen names signals after the variables they are assigned to by inspecting the bytecode of the caller, which is not
+#supported on every Python version. Untraced submodule ports are emitted as '$1', '$2', ..., which recent Yosys versions
+#read as positional connections, so in that case designs are flattened into a single RTLIL module before they are
+#passed to Yosys.
+import os
+import shutil
+import subprocess
+from nmigen import Elaboratable, Module, Signal
+from nmigen.hdl.ir import Fragment, Instance
+from nmigen.back import rtlil
+
+class LDPC_Decoder_Top(Elaboratable):
+    #Top level wrapper giving the ports of a design fixed names, independent of the names traced for its signals
+    def __init__(self, dut, inputs, outputs):
+
+        #[PARAMETER] - dut: The wrapped design
+        self.dut = dut
+
+        #[PARAMETER] - inputs, outputs: (name, signal) pairs of the dut ports to bring out as top level ports
+        self.inputs = [(Signal(len(signal), name=name), signal) for name, signal in inputs]
+        self.outputs = [(Signal(len(signal), name=name), signal) for name, signal in outputs]
+
+    def ports(self):
+        return [port for port, signal in self.inputs + self.outputs]
+
+    def elaborate(self, platform):
+        m = Module()
+        m.submodules.dut = self.dut
+        m.d.comb += [signal.eq(port) for port, signal in self.inputs]
+        m.d.comb += [port.eq(signal) for port, signal in self.outputs]
+        return m
+
+def flatten_fragment(fragment):
+    #Mark every subfragment (apart from instances, such as memory ports) to be flattened into its parent
+    for subfragment, name in fragment.subfragments:
+        if not isinstance(subfragment, Instance):
+            subfragment.flatten = True
+            flatten_fragment(subfragment)
+
+def signal_names_traced():
+    #True when nMigen can trace signal names on this Python version
+    probe = Signal()
+    return probe.name == "probe"
+
+def convert_rtlil(elaboratable, ports, name="top", platform=None, flatten=None):
+    #Elaborate a design and convert it into RTLIL, flattened into a single module if 'flatten' is set (by default,
+    #only when signal names can not be traced)
+    fragment = Fragment.get(elaboratable, platform)
+    if flatten or (flatten is None and not signal_names_traced()):
+        flatten_fragment(fragment)
+    il_text, name_map = rtlil.convert_fragment(fragment.prepare(ports=ports), name)
+    return il_text
+
+def find_yosys():
+    #Yosys command line and the directory holding its share data (e.g. the CXXRTL runtime headers).
+    #The YOSYS environment variable or a native yosys is preferred, falling back to the yowasp-yosys package.
+    if os.environ.get("YOSYS") or shutil.which("yosys"):
+        yosys = os.environ.get("YOSYS") or "yosys"
+        config = os.path.join(os.path.dirname(shutil.which(yosys) or yosys), "yosys-config")
+        datdir = subprocess.run([config if os.path.exists(config) else "yosys-config", "--datdir"],
+                                check=True, stdout=subprocess.PIPE, universal_newlines=True).stdout.strip()
+        return [yosys], datdir
+    try:
+        import yowasp_yosys
+    except ImportError:
+        raise RuntimeError("Yosys not found: set YOSYS, install yosys or pip install yowasp-yosys")
+    return ["yowasp-yosys"], os.path.join(os.path.dirname(yowasp_yosys.__file__), "share")
+
+def yosys_available():
+    #True when a Yosys installation can be found
+    try:
+        find_yosys()
+    except (RuntimeError, OSError, subprocess.CalledProcessError):
+        return False
+    return True
+
+def run_yosys(script, cwd, timeout=None):
+    #Run a Yosys script quietly in 'cwd'
+    yosys, datdir = find_yosys()
+    subprocess.run(yosys + ["-q", "-p", script], cwd=cwd, check=True, timeout=timeout)
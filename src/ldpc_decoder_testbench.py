@@ -0,0 +1,206 @@
+#Batched simulation test driver for the start/done decoders (LDPC_Decoder, LDPC_Bit_Flipping_Decoder and
+#LDPC_Min_Sum_Decoder) and automatic test vector generation from the parity check matrix.
+#
+#The decoder is elaborated once and every input is streamed through a single simulation, one frame after another:
+#data_input is driven and start is pulsed for one clock cycle, then the driver waits for done and samples the outputs.
+#The simulation runs on nMigen's Python simulator (pysim) or, for high volume regression, on a compiled CXXRTL model
+#of the generated RTL (see ldpc_decoder_compiled_sim.py), with cycle accurate identical results.
+#LDPC_QC_Bit_Flipping_Decoder is driven the same way, with the codeword written into and read back from its codeword
+#memory one Z bit word at a time around each frame (pysim only).
+from collections import Counter, namedtuple
+from itertools import islice
+from nmigen.back.pysim import Simulator, Settle
+from src.ldpc_decoder_model import LDPC_Encoder_Model, codewords_to_ints
+from src.ldpc_decoder_compiled_sim import LDPC_Decoder_Compiled_Simulator
+from src.ldpc_qc_bit_flipping_decoder import LDPC_QC_Bit_Flipping_Decoder
+from src.ldpc_parity_check_matrix import as_sparse
+
+#Simulation backends
+SIMULATION_BACKEND_PYSIM = "pysim"
+SIMULATION_BACKEND_CXXRTL = "cxxrtl"
+SIMULATION_BACKENDS = [SIMULATION_BACKEND_PYSIM, SIMULATION_BACKEND_CXXRTL]
+
+#TestVectorResult - The outcome of one test vector. 'expected' is the expected data_output, or None when decoding is
+#                   expected to fail. 'latency' is the number of clock cycles from start to done (None on a timeout) and
+#                   'outputs' holds the sampled values of any extra outputs requested from run_test_vectors.
+TestVectorResult = namedtuple("TestVectorResult", ["input", "expected", "data_output", "success", "latency", "outputs", "passed"])
+
+def simulate_frames(dut, inputs, outputs=(), timeout=4096, backend=SIMULATION_BACKEND_PYSIM, vcd_file=None):
+    #Run every input through a single simulation of 'dut'.
+    #Returns one (data_output, success, latency, *outputs) tuple per input, with a latency of None if done did not
+    #rise within 'timeout' clock cycles. 'vcd_file' writes a waveform of the ports of 'dut' (pysim only).
+    if backend not in SIMULATION_BACKENDS:
+        raise ValueError("Unknown simulation backend '{}', expected one of {}".format(backend, SIMULATION_BACKENDS))
+    if vcd_file is not None and backend != SIMULATION_BACKEND_PYSIM:
+        raise ValueError("Waveforms are only written by the '{}' backend".format(SIMULATION_BACKEND_PYSIM))
+    if isinstance(dut, LDPC_QC_Bit_Flipping_Decoder):
+        if backend != SIMULATION_BACKEND_PYSIM:
+            raise ValueError("LDPC_QC_Bit_Flipping_Decoder is only simulated with the '{}' backend".format(SIMULATION_BACKEND_PYSIM))
+        if vcd_file is not None:
+            raise ValueError("Waveforms are not written for LDPC_QC_Bit_Flipping_Decoder")
+        return simulate_qc_frames(dut, inputs, outputs, timeout)
+    if backend == SIMULATION_BACKEND_CXXRTL:
+        return simulate_frames_compiled(dut, inputs, outputs, timeout)
+    simulated = []
+    sim = Simulator(dut)
+    def process():
+        for input in inputs:
+            yield dut.data_input.eq(input)
+            yield dut.start.eq(1)
+            yield
+            yield dut.start.eq(0)
+            latency = 0
+            #done is only cleared by the clock edge which samples start, so it is not checked before the first cycle
+            while latency == 0 or not (yield dut.done):
+                if latency == timeout:
+                    latency = None
+                    break
+                yield
+                yield Settle()
+                latency += 1
+            frame = [(yield dut.data_output), (yield dut.success), latency]
+            for output in outputs:
+                frame.append((yield output))
+            simulated.append(tuple(frame))
+    sim.add_clock(1e-6)
+    sim.add_sync_process(process)
+    if vcd_file is not None:
+        with sim.write_vcd(vcd_file, traces=dut.ports()):
+            sim.run()
+    else:
+        sim.run()
+    return simulated
+
+def simulate_qc_frames(dut, inputs, outputs=(), timeout=4096):
+    #simulate_frames for LDPC_QC_Bit_Flipping_Decoder: each codeword is written into the codeword memory before start
+    #and, if decoding succeeded, read back once done. Failed frames report a data_output of zero, as the other decoders.
+    H = dut.ParityCheckMatrixPythonArray
+    simulated = []
+    sim = Simulator(dut)
+    def process():
+        for input in inputs:
+            yield dut.data_input_valid.eq(1)
+            for address, word in enumerate(H.to_blocks(input)):
+                yield dut.data_input_address.eq(address)
+                yield dut.data_input.eq(word)
+                yield
+            yield dut.data_input_valid.eq(0)
+            yield dut.start.eq(1)
+            yield
+            yield dut.start.eq(0)
+            latency = 0
+            while latency == 0 or not (yield dut.done):
+                if latency == timeout:
+                    latency = None
+                    break
+                yield
+                yield Settle()
+                latency += 1
+            success = yield dut.success
+            frame = [0, success, latency]
+            for output in outputs:
+                frame.append((yield output))
+            if success:
+                words = []
+                for address in range(0,H.base_columns):
+                    yield dut.data_output_address.eq(address)
+                    yield
+                    yield Settle()
+                    words.append((yield dut.data_output))
+                frame[0] = H.from_blocks(words) >> (dut.codeword_width-dut.data_output_width)
+            simulated.append(tuple(frame))
+    sim.add_clock(1e-6)
+    sim.add_sync_process(process)
+    sim.run()
+    return simulated
+
+def simulate_frames_compiled(dut, inputs, outputs=(), timeout=4096, batch_size=65536):
+    #simulate_frames on the compiled CXXRTL model, passing the inputs to it in batches
+    sim = LDPC_Decoder_Compiled_Simulator(dut, outputs)
+    simulated = []
+    inputs = iter(inputs)
+    while True:
+        batch = [int(input) for input in islice(inputs, batch_size)]
+        if not batch:
+            return simulated
+        data_output, success, latency, *extra = sim.decode(batch, timeout)
+        columns = [codewords_to_ints(data_output), [int(flag) for flag in success],
+                   [None if cycles < 0 else int(cycles) for cycles in latency]] + [codewords_to_ints(values) for values in extra]
+        simulated += list(zip(*columns))
+
+def run_test_vectors(dut, vectors, outputs=(), timeout=4096, backend=SIMULATION_BACKEND_PYSIM, vcd_file=None):
+    #Run an iterable of (input, expected data_output) pairs through a single simulation of 'dut' and return a
+    #TestVectorResult for each of them. A vector passes when decoding succeeds with the expected output, or fails when
+    #the expected output is None.
+    vectors = list(vectors)
+    simulated = simulate_frames(dut, [input for input, expected in vectors], outputs, timeout, backend, vcd_file)
+    results = []
+    for (input, expected), (data_output, success, latency, *sampled) in zip(vectors, simulated):
+        if expected is None:
+            passed = latency is not None and not success
+        else:
+            passed = latency is not None and bool(success) and data_output == expected
+        results.append(TestVectorResult(input, expected, data_output, success, latency, tuple(sampled), passed))
+    return results
+
+def run_bist(bist, cycles, error_weight=0, timeout=4096):
+    #Run an LDPC_BIST for 'cycles' enabled clock cycles on pysim, then let the frames in flight finish (for at most
+    #'timeout' clock cycles). Returns its counters as a dict, with the sustained throughput in frames_per_cycle.
+    counters = {}
+    sim = Simulator(bist)
+    def process():
+        yield bist.error_weight.eq(error_weight)
+        yield bist.enable.eq(1)
+        for _ in range(0,cycles):
+            yield
+        yield bist.enable.eq(0)
+        yield
+        for _ in range(0,timeout):
+            if (yield bist.idle):
+                break
+            yield
+        yield
+        for name in ["frames", "successes", "mismatches", "cycles"]:
+            counters[name] = (yield getattr(bist, name))
+    sim.add_clock(1e-6)
+    sim.add_sync_process(process)
+    sim.run()
+    counters["frames_per_cycle"] = counters["frames"]/counters["cycles"] if counters["cycles"] else 0.0
+    return counters
+
+def correctable_bits(ParityCheckMatrix, codeword_width):
+    #The codeword bits whose single bit errors can be located from the syndrome: their column of H is nonzero and
+    #differs from every other column
+    H = as_sparse(ParityCheckMatrix, codeword_width)
+    columns = [tuple(checks) for checks in H.bit_checks]
+    counts = Counter(columns)
+    return [n for n in range(0,H.codeword_width) if columns[n] and counts[columns[n]] == 1]
+
+def generate_test_vectors(ParityCheckMatrix, codeword_width, data_width, error_positions=None, data_words=None, batch_size=4096):
+    #Yield (input codeword, expected data_output) pairs for every data word, error free and then with a single bit
+    #error on each of 'error_positions'.
+    #error_positions - Codeword bits to flip (default: every correctable bit, see correctable_bits). Bits which are not
+    #                  correctable are skipped, as no decoder can be expected to locate them.
+    #data_words      - Iterable of data words to encode (default: all 2**data_width of them)
+    correctable = set(correctable_bits(ParityCheckMatrix, codeword_width))
+    if error_positions is None:
+        error_positions = correctable
+    error_positions = sorted(n for n in error_positions if n in correctable)
+    if data_words is None:
+        data_words = range(0,1 << int(data_width))
+
+    encoder = LDPC_Encoder_Model(ParityCheckMatrix, codeword_width, data_width)
+    def encode(batch):
+        codewords = codewords_to_ints(encoder.encode(batch))
+        for data, codeword in zip(batch, codewords):
+            yield codeword, data
+            for n in error_positions:
+                yield codeword ^ (1 << n), data
+    batch = []
+    for data in data_words:
+        batch.append(int(data))
+        if len(batch) == batch_size:
+            yield from encode(batch)
+            batch = []
+    if batch:
+        yield from encode(batch)
@@ -0,0 +1,160 @@
+#Transaction-level tracing of the start/done decoders: one compact record per frame (input, data_output, success,
+#latency and the clock cycles of start and done) instead of a waveform of every signal on every clock cycle.
+#
+#LDPC_Transaction_Monitor is a passive pysim process watching the ports of a decoder driven by any testbench (such as
+#the *_sim.py scripts). trace_frames records the frames of simulate_frames from their latencies alone, at no extra
+#simulation cost, so the latency distribution of millions of frames can be profiled on the compiled CXXRTL backend.
+#Traces are written as CSV or as columnar NumPy (.npz) logs, and write_failure_waveforms replays only the frames around
+#each failing frame on pysim to write a short VCD window of it.
+import csv
+import os
+from collections import Counter, deque, namedtuple
+import numpy as np
+from nmigen.back.pysim import Settle, Passive
+from src.ldpc_decoder_model import codewords_to_bits, bits_to_codewords
+from src.ldpc_decoder_testbench import simulate_frames, SIMULATION_BACKEND_PYSIM
+
+#FrameRecord - One frame of a trace. 'start_cycle' is the clock edge which sampled start (the first edge of the
+#              simulation being 1) and 'done_cycle' the edge which presented the result, 'latency' clock cycles later.
+#              'latency' and 'done_cycle' are None on a timeout. 'outputs' holds the sampled values of any extra outputs.
+FrameRecord = namedtuple("FrameRecord", ["input", "data_output", "success", "latency", "start_cycle", "done_cycle", "outputs"])
+
+#[FORMAT] - TRACE_FORMAT_CSV: One line per frame, with a header naming the columns (timeouts leave latency and
+#           done_cycle empty)
+TRACE_FORMAT_CSV = "csv"
+
+#[FORMAT] - TRACE_FORMAT_NPZ: One NumPy array per column (input, data_output and extra outputs as packed
+#           (frames, words) uint64 codewords, -1 for the latency and done_cycle of a timeout), compressed
+TRACE_FORMAT_NPZ = "npz"
+
+TRACE_FORMATS = [TRACE_FORMAT_CSV, TRACE_FORMAT_NPZ]
+
+class LDPC_Transaction_Monitor:
+    #Passive monitor of the start/ready/result_valid interface of a decoder in a pysim simulation: add_to(sim) and run
+    #the testbench as usual. The data_input sampled with an accepted start (start and ready) opens a frame, and each
+    #result_valid strobe (on a later clock cycle) closes the oldest open frame with the data_output, success and extra
+    #outputs presented, so several frames may be in flight in a double buffered decoder. A decoder with one frame in
+    #flight restarts on start, so a frame still open then is recorded as a timeout. Frames still open when the
+    #simulation ends are left in 'pending'.
+    def __init__(self, dut, outputs=()):
+
+        #[PARAMETER] - dut: The monitored decoder (data_input, start, ready, result_valid, data_output and success ports)
+        self.dut = dut
+
+        #[PARAMETER] - outputs: Extra signals sampled with the result of each frame
+        self.outputs = list(outputs)
+
+        #[OUTPUT] - records: A FrameRecord per finished frame, in the order they finished
+        self.records = []
+
+        #[OUTPUT] - pending: (input, start_cycle) of the frames started and not finished yet
+        self.pending = deque()
+
+        #[OUTPUT] - cycle: Clock edges seen so far
+        self.cycle = 0
+
+    def add_to(self, sim):
+        #Add the monitor process to a Simulator of a design containing the decoder
+        sim.add_sync_process(self.process)
+
+    def process(self):
+        dut = self.dut
+        restarts = dut.max_in_flight == 1
+        yield Passive()
+        while True:
+            yield
+            self.cycle += 1
+            #start, ready and data_input as sampled by this clock edge, then the outputs it updated
+            started = (yield dut.start) and (yield dut.ready)
+            input = yield dut.data_input
+            yield Settle()
+            if (yield dut.result_valid) and self.pending:
+                input_finished, start_cycle = self.pending.popleft()
+                outputs = []
+                for output in self.outputs:
+                    outputs.append((yield output))
+                self.records.append(FrameRecord(input_finished, (yield dut.data_output), (yield dut.success),
+                                                self.cycle-start_cycle, start_cycle, self.cycle, tuple(outputs)))
+            if started:
+                while restarts and self.pending:
+                    input_abandoned, start_cycle = self.pending.popleft()
+                    self.records.append(FrameRecord(input_abandoned, 0, 0, None, start_cycle, None,
+                                                    tuple(0 for output in self.outputs)))
+                self.pending.append((input, self.cycle))
+
+def trace_frames(dut, inputs, outputs=(), timeout=4096, backend=SIMULATION_BACKEND_PYSIM):
+    #Run every input through simulate_frames and return a FrameRecord per frame. The driver starts each frame on the
+    #clock edge after the previous result (or timeout), so the clock cycles follow from the latencies.
+    inputs = list(inputs)
+    records = []
+    cycle = 1
+    for input, (data_output, success, latency, *sampled) in zip(inputs, simulate_frames(dut, inputs, outputs, timeout, backend)):
+        done_cycle = None if latency is None else cycle+latency
+        records.append(FrameRecord(input, data_output, success, latency, cycle, done_cycle, tuple(sampled)))
+        cycle += (timeout if latency is None else latency)+1
+    return records
+
+def latency_histogram(records):
+    #Counter of the latencies of a trace (None counting the timeouts)
+    return Counter(record.latency for record in records)
+
+def failed_frame(record):
+    #Default failure criterion of write_failure_waveforms: a timeout or a frame which could not be decoded
+    return record.latency is None or not record.success
+
+def pack_column(values):
+    #Pack a column of integers into (frames, words) uint64 codewords, with at least one word
+    width = max([int(value).bit_length() for value in values] + [1])
+    return bits_to_codewords(codewords_to_bits(values, width))
+
+def write_trace(records, path, trace_format=None, output_names=()):
+    #Write a trace to 'path' in 'trace_format' (default: from the extension of 'path', CSV unless it is .npz).
+    #'output_names' names the columns of the extra outputs of the records.
+    if trace_format is None:
+        trace_format = TRACE_FORMAT_NPZ if path.endswith(".npz") else TRACE_FORMAT_CSV
+    if trace_format not in TRACE_FORMATS:
+        raise ValueError("Unknown trace format '{}', expected one of {}".format(trace_format, TRACE_FORMATS))
+    output_names = list(output_names)
+    if records and len(records[0].outputs) != len(output_names):
+        raise ValueError("The records hold {} extra outputs, {} names given".format(len(records[0].outputs), len(output_names)))
+    if trace_format == TRACE_FORMAT_CSV:
+        with open(path, "w", newline="") as trace_file:
+            writer = csv.writer(trace_file)
+            writer.writerow(["frame", "input", "data_output", "success", "latency", "start_cycle", "done_cycle"] + output_names)
+            for frame, record in enumerate(records):
+                writer.writerow([frame, record.input, record.data_output, record.success,
+                                 "" if record.latency is None else record.latency, record.start_cycle,
+                                 "" if record.done_cycle is None else record.done_cycle] + list(record.outputs))
+        return
+    columns = {
+        "input": pack_column([record.input for record in records]),
+        "data_output": pack_column([record.data_output for record in records]),
+        "success": np.array([record.success for record in records], dtype=np.uint8),
+        "latency": np.array([-1 if record.latency is None else record.latency for record in records], dtype=np.int64),
+        "start_cycle": np.array([record.start_cycle for record in records], dtype=np.int64),
+        "done_cycle": np.array([-1 if record.done_cycle is None else record.done_cycle for record in records], dtype=np.int64)
+    }
+    for i, name in enumerate(output_names):
+        columns[name] = pack_column([record.outputs[i] for record in records])
+    np.savez_compressed(path, **columns)
+
+def write_failure_waveforms(dut, records, prefix, context=2, limit=8, failed=failed_frame, timeout=4096):
+    #Write a VCD window around each failing frame of a trace of 'dut' (at most 'limit' of them): the frame is replayed
+    #on pysim after the 'context' frames preceding it into '<prefix>_<frame>.vcd'. The clock cycles of a window start
+    #again from 1, at the start of its first frame. Returns the paths written.
+    if context < 0:
+        raise ValueError("context must not be negative")
+    paths = []
+    for frame, record in enumerate(records):
+        if len(paths) == limit:
+            break
+        if not failed(record):
+            continue
+        path = "{}_{}.vcd".format(prefix, frame)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        window = [previous.input for previous in records[max(frame-context, 0):frame+1]]
+        simulate_frames(dut, window, timeout=timeout, vcd_file=path)
+        paths.append(path)
+    return paths
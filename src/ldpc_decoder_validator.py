@@ -1,11 +1,20 @@
-from nmigen import Elaboratable, Module, Signal, Array, unsigned, Const
+from nmigen import Elaboratable, Module, Signal, Array, unsigned, Const, Cat
 from nmigen.build import Platform
 from nmigen.cli import main_parser, main_runner, main
 from nmigen.back.pysim import Simulator, Delay
 from nmigen.asserts import Assert, Assume, Cover
+from src.ldpc_parity_check_matrix import as_sparse
+
+#[STRATEGY] - REDUCTION_STRATEGY_RIPPLE: XOR chain which settles over codeword_width cycles
+REDUCTION_STRATEGY_RIPPLE = "ripple"
+
+#[STRATEGY] - REDUCTION_STRATEGY_TREE: Balanced XOR tree of ceil(log2(row weight)) levels over the nonzero row entries
+REDUCTION_STRATEGY_TREE = "tree"
+
+REDUCTION_STRATEGIES = [REDUCTION_STRATEGY_RIPPLE, REDUCTION_STRATEGY_TREE]
 
 class LDPC_Decoder_Validator(Elaboratable):
-    def __init__(self, ParityCheckMatrix, codeword_width):
+    def __init__(self, ParityCheckMatrix, codeword_width, reduction_strategy=REDUCTION_STRATEGY_RIPPLE, pipeline_depth=0):
 
         #[PARAMETER] - codeword_width: Width of the output Codeword
         self.codeword_width = int(codeword_width)
@@ -13,8 +22,9 @@ class LDPC_Decoder_Validator(Elaboratable):
         #[PARAMETER] - data_output_matrix_rows: Rows of the Generator Matrix
         self.data_output_matrix_rows = int(len(ParityCheckMatrix))
 
-        #[CONSTANT] - parity_check_matrix: A parity check matrix constant
-        self.parity_check_matrix =  Array([Const(ParityCheckMatrix[_][0],unsigned(self.codeword_width)) for _ in range(self.data_output_matrix_rows)])
+        #[PARAMETER] - row_bits: The codeword bits connected to each parity check row (the only bits wired into the row's
+        #              working register and XOR reduction)
+        self.row_bits = as_sparse(ParityCheckMatrix, self.codeword_width).row_bits
 
         #[INPUT] - start: The start signal to start the decoding process(codeword)
         self.start = Signal(1)
@@ -28,8 +38,19 @@ class LDPC_Decoder_Validator(Elaboratable):
         #[OUTPUT] - done: The done signal to indicate that the decoding process has stopped.
         self.done = Signal(1, reset=0)
 
-    
- 
+        #[PARAMETER] - reduction_strategy: How the selected parity check row bits are XOR-reduced (one of REDUCTION_STRATEGIES)
+        if reduction_strategy not in REDUCTION_STRATEGIES:
+            raise ValueError("Unknown reduction_strategy '{}', expected one of {}".format(reduction_strategy, REDUCTION_STRATEGIES))
+        self.reduction_strategy = reduction_strategy
+
+        #[PARAMETER] - tree_levels: Number of XOR levels in the balanced reduction tree of the densest row
+        self.tree_levels = max([len(bits)-1 for bits in self.row_bits] + [0]).bit_length()
+
+        #[PARAMETER] - pipeline_depth: Number of register stages inserted between the XOR tree levels (tree strategy only)
+        if pipeline_depth < 0:
+            raise ValueError("pipeline_depth must not be negative")
+        self.pipeline_depth = min(int(pipeline_depth), self.tree_levels)
+
     def ports(self):
         return [self.data_input, self.data_output, self.start, self.done]
 
@@ -37,20 +58,24 @@ class LDPC_Decoder_Validator(Elaboratable):
         #Instantiate the Module
         m = Module()
 
-        #[ARRAY[SIGNAL]] - stage_1_working_matrix - An array of signals which represents the parity matrix used to validate the input codeword
-        stage_1_working_matrix = Array([Signal(unsigned(self.codeword_width), reset=0) for _ in range(self.data_output_matrix_rows)])
+        #[ARRAY[SIGNAL]] - stage_1_working_matrix - The input codeword bits connected to each parity check row, in row_bits order
+        stage_1_working_matrix = Array([Signal(unsigned(max(len(bits), 1)), reset=0) for bits in self.row_bits])
 
         #[ARRAY[SIGNAL]] - stage_2_adder_buffer - An array of signals which are used to calculate whether there are an even number of 1s in each parity check row
-        stage_2_adder_buffer = Array([Signal(unsigned(self.codeword_width), reset=0, name="stage_2_adder_buffer") for _ in range(self.data_output_matrix_rows)])
+        stage_2_adder_buffer = Array([Signal(unsigned(max(len(bits), 1)), reset=0, name="stage_2_adder_buffer") for bits in self.row_bits])
 
         #[SIGNAL] - stage_2_counter - Counts the worst case scenario for the even 1s calculation
-        stage_2_counter = Signal(self.codeword_width)
+        stage_2_counter = Signal(range(max(self.codeword_width, self.pipeline_depth)+1))
 
         #[SIGNAL] - pipeline_stage - Signal to indicate whether we are in pipeline stage 0 or 1
         pipeline_stage = Signal(1)
         #[SIGNAL] - running - Signal to indicate that we are currently running
         running = Signal(1, reset=0)
 
+        #[SIGNAL] - active - Running and not restarted on this clock cycle (start takes priority over the pipeline stages)
+        active = Signal(1)
+        m.d.comb += active.eq(running & ~self.start)
+
         #if start bit is asserted, reset the system
         with m.If(self.start):
             for i in range(0,self.data_output_matrix_rows):
@@ -64,27 +89,32 @@ class LDPC_Decoder_Validator(Elaboratable):
                     pipeline_stage.eq(0),
                 ]
         #First Pipeline Stage (0)
-        #Data_input ANDed with each row of the parity check matrix
-        with m.If(running & (pipeline_stage==0)):
-            for i in range(0,self.data_output_matrix_rows):
+        #Select the data_input bits connected to each row of the parity check matrix (the nonzero entries of the row)
+        with m.If(active & (pipeline_stage==0)):
+            for i, bits in enumerate(self.row_bits):
                 m.d.sync += [
-                stage_1_working_matrix[i].eq(self.data_input & self.parity_check_matrix[i])
+                stage_1_working_matrix[i].eq(Cat(*[self.data_input[n] for n in bits]) if bits else 0)
                 ]
             m.d.sync += [
                 pipeline_stage.eq(1)
             ]
         
+        if self.reduction_strategy == REDUCTION_STRATEGY_TREE:
+            self.elaborate_tree_reduction(m, stage_1_working_matrix, stage_2_counter, pipeline_stage, running, active)
+            return m
+
         #Second Pipeline Stage (1)
-        #Accumulate the ANDed data to calculate if there are an even number of 1s.
-        with m.If(running & (pipeline_stage==1)):
+        #Accumulate the selected bits to calculate if there are an even number of 1s. The chain of each row is only as long
+        #as the row weight, but the result is taken after codeword_width cycles whatever the row weight.
+        with m.If(active & (pipeline_stage==1)):
             m.d.sync += [
                 stage_2_counter.eq(stage_2_counter+1)
             ]
-            for i in range(0,self.data_output_matrix_rows):
-                for n in range(1,self.codeword_width):
-                    if(n==1):
+            for i, bits in enumerate(self.row_bits):
+                for n in range(0,len(bits)):
+                    if(n==0):
                         m.d.sync += [
-                        stage_2_adder_buffer[i][n].eq(stage_1_working_matrix[i][n]^stage_1_working_matrix[i][n-1])
+                        stage_2_adder_buffer[i][n].eq(stage_1_working_matrix[i][n])
                         ]
                     else:
                         m.d.sync += [
@@ -92,12 +122,40 @@ class LDPC_Decoder_Validator(Elaboratable):
                         ]
         #Output the result of each parity check row comparison (1=Fail, 0=Pass)
             with m.If(stage_2_counter==(self.codeword_width)):
-                for i in range(0,self.data_output_matrix_rows):
+                for i, bits in enumerate(self.row_bits):
                     m.d.sync += [
-                            self.data_output[(self.data_output_matrix_rows-1)-i].eq( stage_2_adder_buffer[i][self.codeword_width-1]),
+                            self.data_output[(self.data_output_matrix_rows-1)-i].eq( stage_2_adder_buffer[i][max(len(bits), 1)-1]),
                             running.eq(0),
                             self.done.eq(1)
                         ]
 
         return m
-        
\ No newline at end of file
+
+    def elaborate_tree_reduction(self, m, stage_1_working_matrix, stage_2_counter, pipeline_stage, running, active):
+        #Second Pipeline Stage (1)
+        #Reduce the selected bits with a balanced XOR tree, registering the tree after the levels chosen below.
+        #register_levels - Tree levels followed by a register, spread evenly over the tree
+        register_levels = set((self.tree_levels*stage)//self.pipeline_depth for stage in range(1,self.pipeline_depth+1))
+
+        for i in range(0,self.data_output_matrix_rows):
+            #tree_level - The values being reduced at the current level of the tree
+            tree_level = [stage_1_working_matrix[i][n] for n in range(0,len(self.row_bits[i]))] or [Const(0, 1)]
+            for level in range(1,self.tree_levels+1):
+                tree_level = [tree_level[n]^tree_level[n+1] if n+1 < len(tree_level) else tree_level[n]
+                              for n in range(0,len(tree_level),2)]
+                if level in register_levels:
+                    tree_register = Signal(len(tree_level), name="stage_2_tree_row{}_level{}".format(i, level))
+                    with m.If(active & (pipeline_stage==1)):
+                        m.d.sync += tree_register.eq(Cat(*tree_level))
+                    tree_level = [tree_register[n] for n in range(0,len(tree_level))]
+
+            #Output the result of each parity check row comparison (1=Fail, 0=Pass) once the tree registers have filled
+            with m.If(active & (pipeline_stage==1) & (stage_2_counter==self.pipeline_depth)):
+                m.d.sync += [
+                    self.data_output[(self.data_output_matrix_rows-1)-i].eq(tree_level[0]),
+                    running.eq(0),
+                    self.done.eq(1)
+                ]
+
+        with m.If(active & (pipeline_stage==1)):
+            m.d.sync += stage_2_counter.eq(stage_2_counter+1)
@@ -0,0 +1,278 @@
+#Formal verification flow of LDPC_Decoder: a combinational syndrome reference, the harness proving each decoder
+#configuration equivalent to it, the BMC/k-induction depth derived from the decoder latency, and a parallel runner of
+#the SymbiYosys tasks (falling back on the SAT solver of Yosys when SymbiYosys is not installed).
+#
+#LDPC_Decoder_Formal drives the decoder with unconstrained codewords, one frame at a time, and asserts that every frame
+#finishes within the worst case latency of the configuration (LDPC_Decoder_Model.latencies) with the data_output,
+#success and corrected_bit of LDPC_Syndrome_Reference, which decodes the same codeword combinationally from its
+#syndrome. The reference is independent of the decoding engine (validators, priority encoder, lookup tables, ROM), so
+#the proof covers every mode, reduction strategy, pipeline depth and degree of time-multiplexing.
+import os
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from nmigen import Elaboratable, Module, Signal, Array, unsigned, Const, Cat, Mux
+from nmigen.asserts import Assert, Assume, Cover, Past
+from src.ldpc_decoder import DECODER_MODE_SYNDROME_ROM
+from src.ldpc_decoder_model import LDPC_Decoder_Model
+from src.ldpc_decoder_rtl import run_yosys
+from src.ldpc_parity_check_matrix import as_sparse
+from src.ldpc_syndrome_table import build_error_pattern_table
+
+#SymbiYosys tasks: bounded model check, unbounded proof by k-induction and cover traces
+FORMAL_TASKS = ["bmc", "prove", "cover"]
+
+FORMAL_SBY = """[tasks]
+bmc
+prove
+cover
+
+[options]
+bmc: mode bmc
+prove: mode prove
+cover: mode cover
+multiclock off
+depth {depth}
+
+[engines]
+smtbmc {solver}
+
+[script]
+read_ilang {il_file}
+prep -top top
+
+[files]
+{il_file}
+"""
+
+def worst_case_latency(decoder):
+    #Largest number of clock cycles from the edge sampling start to the one setting done (see LDPC_Decoder_Model.latencies)
+    model = LDPC_Decoder_Model.from_decoder(decoder)
+    return max(model.latencies() + (model.zero_syndrome_latency(),))
+
+def formal_depth(decoder):
+    #BMC depth (and induction length) covering a whole frame: the reset cycle, the start cycle, the worst case latency
+    #and the cycle checking the result
+    return worst_case_latency(decoder)+3
+
+def formal_sby(depth, il_file="formal.il", solver="boolector"):
+    #SymbiYosys script running FORMAL_TASKS on 'il_file'
+    return FORMAL_SBY.format(depth=depth, il_file=il_file, solver=solver)
+
+def write_generated_sby(args, depth):
+    #Write the SymbiYosys script of the RTLIL file written by the 'generate' action of a verification script, next to it
+    #(file.il -> file.sby reading file.il) at 'depth'. Returns its path, or None when no RTLIL file was written: other
+    #actions, Verilog, or RTLIL written to stdout (run with the tracked ldpc_decoder.sby, which reads toplevel.il).
+    if args.action != "generate" or not args.generate_file:
+        return None
+    il_path = args.generate_file.name
+    stem, extension = os.path.splitext(il_path)
+    if (args.generate_type or {".il": "il"}.get(extension)) != "il":
+        return None
+    sby_path = stem + ".sby"
+    with open(sby_path, "w") as sby_file:
+        sby_file.write(formal_sby(depth, il_file=os.path.basename(il_path)))
+    return sby_path
+
+class LDPC_Syndrome_Reference(Elaboratable):
+    #Combinational reference decoder: the syndrome of the codeword selects the error pattern directly. A zero syndrome
+    #passes the codeword unchanged and a syndrome equal to column 'n' of H flips bit 'n' (the lowest such bit when
+    #columns are repeated), as the brute force and syndrome lookup decoders do. In syndrome ROM mode the minimum weight
+    #error patterns of up to max_errors bits are decoded (see ldpc_syndrome_table.py).
+    def __init__(self, decoder):
+
+        #[PARAMETER] - decoder: The LDPC_Decoder whose configuration is referenced
+        self.H = as_sparse(decoder.ParityCheckMatrixPythonArray, decoder.codeword_width)
+        self.codeword_width = decoder.codeword_width
+        self.data_output_width = decoder.data_output_width
+        self.table_mode = decoder.decoder_mode == DECODER_MODE_SYNDROME_ROM and decoder.max_errors > 1
+        self.max_errors = decoder.max_errors
+
+        #[INPUT] - codeword: The codeword to decode
+        self.codeword = Signal(self.codeword_width)
+
+        #[OUTPUT] - data_output, success, corrected_bit: As for LDPC_Decoder (data_output is 0 on failure)
+        self.data_output = Signal(self.data_output_width)
+        self.success = Signal(1)
+        self.corrected_bit = Signal(range(self.codeword_width+1))
+
+    def ports(self):
+        return [self.codeword, self.data_output, self.success, self.corrected_bit]
+
+    def elaborate(self, platform):
+        #Instantiate the Module
+        m = Module()
+        rows = len(self.H)
+
+        #syndrome - Parity check row 'i' on bit (rows-1)-i, as in LDPC_Decoder_Validator
+        syndrome = Signal(max(rows, 1))
+        for i, bits in enumerate(self.H.row_bits):
+            m.d.comb += syndrome[(rows-1)-i].eq(Cat(*[self.codeword[n] for n in bits]).xor() if bits else 0)
+
+        def correct(flipped):
+            corrected = self.codeword ^ Const(sum(1 << n for n in flipped), unsigned(self.codeword_width))
+            return [self.data_output.eq(corrected[self.codeword_width-self.data_output_width:]),
+                    self.corrected_bit.eq(min(flipped) if flipped else self.codeword_width),
+                    self.success.eq(1)]
+
+        m.d.comb += [self.data_output.eq(0), self.success.eq(0), self.corrected_bit.eq(self.codeword_width)]
+        if self.table_mode:
+            correctable, patterns = build_error_pattern_table(self.H, self.codeword_width, self.max_errors)
+            with m.Switch(syndrome):
+                for value in range(0,len(correctable)):
+                    if correctable[value]:
+                        with m.Case(value):
+                            m.d.comb += correct([int(n) for n in patterns[value] if n != self.codeword_width])
+        else:
+            with m.If(syndrome == 0):
+                m.d.comb += correct([])
+            for n in range(0,self.codeword_width):
+                column = sum(1 << ((rows-1)-i) for i in self.H.bit_checks[n])
+                if column != 0:
+                    with m.Elif(syndrome == column):
+                        m.d.comb += correct([n])
+        return m
+
+class LDPC_Decoder_Formal(Elaboratable):
+    #Formal harness of an LDPC_Decoder. The solver chooses the codewords and when to start each frame. Starts are assumed
+    #only while no frame is in flight and ready is high, so each result_valid strobe belongs to the last codeword started.
+    #Asserted for every frame:
+    #  - done and data_output are reset on the clock cycle after start (unless the decoder holds several frames in
+    #    flight, e.g. double buffered, where they hold the last result)
+    #  - the result is presented within worst_case_latency clock cycles
+    #  - data_output, success and corrected_bit equal those of LDPC_Syndrome_Reference for the codeword
+    #  - the latency output reports the clock cycles actually taken
+    #A double buffered decoder is also asserted idle while no frame is in flight. This strengthens the k-induction step,
+    #which otherwise starts from states holding a result of a codeword the harness never started.
+    def __init__(self, decoder):
+
+        #[PARAMETER] - decoder: The LDPC_Decoder under verification (elaborated as a submodule of the harness)
+        self.decoder = decoder
+
+        #[PARAMETER] - reference: The combinational reference decoder
+        self.reference = LDPC_Syndrome_Reference(decoder)
+
+        #[PARAMETER] - latency: Worst case latency of the decoder configuration
+        self.latency = worst_case_latency(decoder)
+
+        #[PARAMETER] - depth: BMC depth and induction length of the proof (see formal_depth)
+        self.depth = formal_depth(decoder)
+
+    def ports(self):
+        return [self.decoder.data_input, self.decoder.start, self.decoder.data_output, self.decoder.done, self.decoder.success]
+
+    def elaborate(self, platform):
+        #Instantiate the Module
+        m = Module()
+        decoder = self.decoder
+        m.submodules.LDPC_Decoder = decoder
+        m.submodules.reference = reference = self.reference
+
+        #busy/frame/cycles - A frame is in flight, its codeword and the clock cycles since the edge which sampled start
+        busy = Signal(1, reset=0)
+        frame = Signal(decoder.codeword_width, reset=0)
+        cycles = Signal(range(self.latency+2), reset=0)
+        m.d.comb += reference.codeword.eq(frame)
+
+        #finished - The result of the frame is presented on this clock cycle
+        finished = Signal(1)
+        m.d.comb += finished.eq(busy & decoder.result_valid)
+
+        #Environment - One frame at a time, started while ready is high
+        m.d.comb += [
+            Assume(~(decoder.start & busy)),
+            Assume(~decoder.start | decoder.ready)
+        ]
+
+        with m.If(decoder.start):
+            m.d.sync += [
+                busy.eq(1),
+                frame.eq(decoder.data_input),
+                cycles.eq(0)
+            ]
+        with m.Elif(finished):
+            m.d.sync += busy.eq(0)
+        with m.Elif(busy & (cycles != self.latency+1)):
+            m.d.sync += cycles.eq(cycles+1)
+
+        #done and data_output are reset when start is toggled
+        if decoder.max_in_flight == 1:
+            with m.If((decoder.start == 0) & Past(decoder.start)):
+                m.d.comb += [
+                    Assert(decoder.done == 0),
+                    Assert(decoder.data_output == 0)
+                ]
+
+        #No codeword is left in a double buffered decoder between frames
+        if decoder.max_in_flight > 1:
+            m.d.comb += Assert(busy | decoder.idle)
+
+        #Every frame finishes within the worst case latency (done is set by the edge 'latency' edges after the one which
+        #sampled start, when cycles reaches latency)
+        m.d.comb += Assert(~busy | (cycles <= self.latency))
+
+        #The result matches the reference
+        with m.If(finished):
+            m.d.comb += [
+                Assert(decoder.data_output == reference.data_output),
+                Assert(decoder.success == reference.success),
+                Assert(decoder.corrected_bit == reference.corrected_bit),
+                Assert(decoder.latency == cycles)
+            ]
+            m.d.comb += [
+                Cover(decoder.success & (decoder.corrected_bit != decoder.codeword_width)),
+                Cover(~decoder.success)
+            ]
+        return m
+
+def find_sby():
+    #Path of the SymbiYosys executable (SBY environment variable or 'sby' on the PATH), None if not found
+    return shutil.which(os.environ.get("SBY", "sby"))
+
+def run_yosys_proof(il_text, depth, induction=False, timeout=None):
+    #Check the assertions of a flattened formal RTLIL ('top' module) with the SAT solver built into Yosys, when
+    #SymbiYosys is not available: a BMC of 'depth' clock cycles from the reset state, or with 'induction' a temporal
+    #induction proof of up to 'depth' steps. Covers are not checked. Returns "pass", "fail" or "timeout".
+    command = "sat -tempinduct -maxsteps {}" if induction else "sat -seq {}"
+    script = ("read_rtlil formal.il; prep -top top; memory_map; opt -fast; delete t:$cover; " +
+              command.format(depth) + " -prove-asserts -set-assumes -set-init-zero -verify")
+    with tempfile.TemporaryDirectory() as work:
+        with open(os.path.join(work, "formal.il"), "w") as il_file:
+            il_file.write(il_text)
+        try:
+            run_yosys(script, work, timeout)
+        except subprocess.TimeoutExpired:
+            return "timeout"
+        except subprocess.CalledProcessError:
+            return "fail"
+    return "pass"
+
+def run_formal_tasks(jobs, workers=None, timeout=None, sby=None):
+    #Run independent formal tasks in parallel. 'jobs' is a list of (directory holding formal.il and formal.sby, task,
+    #depth) triples. Each task runs 'sby -f formal.sby <task>' (log in formal_<task>.log) when SymbiYosys is found,
+    #otherwise run_yosys_proof checks the bmc and prove tasks (cover tasks are "skipped"). Returns a list of
+    #(directory, task, status) with status "pass", "fail", "timeout", "error" or "skipped", in the order of 'jobs'.
+    sby = sby or find_sby()
+    for directory, task, depth in jobs:
+        if task not in FORMAL_TASKS:
+            raise ValueError("Unknown formal task '{}', expected one of {}".format(task, FORMAL_TASKS))
+    def run(job):
+        directory, task, depth = job
+        if sby is None:
+            if task == "cover":
+                return directory, task, "skipped"
+            with open(os.path.join(directory, "formal.il")) as il_file:
+                return directory, task, run_yosys_proof(il_file.read(), depth, task == "prove", timeout)
+        try:
+            completed = subprocess.run([sby, "-f", "formal.sby", task], cwd=directory, stdout=subprocess.PIPE,
+                                       stderr=subprocess.STDOUT, universal_newlines=True, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            return directory, task, "timeout"
+        with open(os.path.join(directory, "formal_{}.log".format(task)), "w") as log:
+            log.write(completed.stdout)
+        if completed.returncode == 0:
+            return directory, task, "pass"
+        return directory, task, "fail" if "DONE (FAIL" in completed.stdout else "error"
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        return list(executor.map(run, jobs))
@@ -0,0 +1,253 @@
+from nmigen import Elaboratable, Module, Signal, Array, unsigned, signed, Const, Cat, Mux, Repl
+from nmigen.build import Platform
+from nmigen.cli import main_parser, main_runner, main
+from nmigen.back.pysim import Simulator, Delay
+from nmigen.asserts import Assert, Assume, Cover
+from src.ldpc_parity_check_matrix import as_sparse
+
+#[VARIANT] - MIN_SUM_NORMALIZED: Check node magnitudes are scaled by (1 - 2^-normalization_shift)
+MIN_SUM_NORMALIZED = "normalized"
+
+#[VARIANT] - MIN_SUM_OFFSET: Check node magnitudes are reduced by a constant offset (floored at zero)
+MIN_SUM_OFFSET = "offset"
+
+MIN_SUM_VARIANTS = [MIN_SUM_NORMALIZED, MIN_SUM_OFFSET]
+
+def build_layers(ParityCheckMatrix, codeword_width, check_node_units):
+    #Pack the parity check rows into layers of at most check_node_units rows.
+    #Rows in the same layer never share a codeword bit, so their posterior LLR updates never collide.
+    row_bits = [set(bits) for bits in as_sparse(ParityCheckMatrix, codeword_width).row_bits]
+    rows = len(row_bits)
+    layers = []
+    for i in range(0,rows):
+        for layer in layers:
+            if len(layer) < check_node_units and all(row_bits[i].isdisjoint(row_bits[r]) for r in layer):
+                layer.append(i)
+                break
+        else:
+            layers.append([i])
+    return layers
+
+class LDPC_Min_Sum_Decoder(Elaboratable):
+    def __init__(self, ParityCheckMatrix, codeword_width, data_width, llr_width=6, max_iterations=10,
+                 check_node_units=1, min_sum_variant=MIN_SUM_NORMALIZED, normalization_shift=2, offset=1):
+
+        #[PARAMETER] - codeword_width: Width of the input Codeword
+        self.codeword_width = int(codeword_width)
+
+        #[PARAMETER] - ParityCheckMatrixPythonArray: Python Array representing the parity check matrix
+        self.ParityCheckMatrixPythonArray = ParityCheckMatrix
+
+        #[PARAMETER] - ParityCheckMatrixRows: Number of rows in the parity check matrix
+        self.ParityCheckMatrixRows = int(len(ParityCheckMatrix))
+
+        #[PARAMETER] - data_output_width: The length of the output data
+        self.data_output_width = int(data_width)
+
+        #[PARAMETER] - llr_width: Width of each quantized input LLR and of each check-to-bit message (two's complement)
+        if llr_width < 2:
+            raise ValueError("llr_width must be at least 2")
+        self.llr_width = int(llr_width)
+
+        #[PARAMETER] - posterior_width: Width of each posterior LLR, with headroom for accumulated messages
+        self.posterior_width = self.llr_width+2
+
+        #[PARAMETER] - max_iterations: Maximum number of iterations (passes over every layer) before decoding is abandoned
+        if max_iterations < 1:
+            raise ValueError("max_iterations must be at least 1")
+        self.max_iterations = int(max_iterations)
+
+        #[PARAMETER] - check_node_units: Number of check node units processing parity check rows in parallel
+        if check_node_units < 1:
+            raise ValueError("check_node_units must be at least 1")
+        self.check_node_units = int(check_node_units)
+
+        #[PARAMETER] - min_sum_variant: Correction applied to the check node magnitudes (one of MIN_SUM_VARIANTS)
+        if min_sum_variant not in MIN_SUM_VARIANTS:
+            raise ValueError("Unknown min_sum_variant '{}', expected one of {}".format(min_sum_variant, MIN_SUM_VARIANTS))
+        self.min_sum_variant = min_sum_variant
+
+        #[PARAMETER] - normalization_shift: The normalized variant scales magnitudes by (1 - 2^-normalization_shift)
+        self.normalization_shift = int(normalization_shift)
+
+        #[PARAMETER] - offset: The offset variant subtracts this from every magnitude
+        self.offset = int(offset)
+
+        #[PARAMETER] - row_bits: The codeword bits connected to each parity check row (the nonzero entries of each row of H)
+        self.row_bits = as_sparse(ParityCheckMatrix, self.codeword_width).row_bits
+
+        #[PARAMETER] - layers: The parity check rows processed together on each clock cycle of an iteration
+        self.layers = build_layers(ParityCheckMatrix, self.codeword_width, self.check_node_units)
+
+        #[INPUT] - start: The start signal to start the decoding process
+        self.start = Signal(1)
+
+        #[INPUT] - data_input: The LLR of every codeword bit, bit 'n' at [n*llr_width:(n+1)*llr_width] (positive = 0 more likely)
+        self.data_input = Signal(self.codeword_width*self.llr_width)
+
+        #[OUTPUT] - data_output: The decoded data
+        self.data_output = Signal(self.data_output_width, reset=0)
+
+        #[OUTPUT] - success : Flag indicating whether decoding was successful or not
+        self.success = Signal(1, reset=0)
+
+        #[OUTPUT] - done: The done signal to indicate that the decoding process has stopped.
+        self.done = Signal(1, reset=0)
+
+        #[OUTPUT] - iterations: The number of iterations used to decode the codeword
+        self.iterations = Signal(range(self.max_iterations+1), reset=0)
+
+        #[PARAMETER] - max_in_flight: Number of accepted frames the decoder holds at once (a start while a frame is
+        #              decoding abandons that frame)
+        self.max_in_flight = 1
+
+        #[OUTPUT] - ready: The decoder accepts a codeword on this clock cycle (always high)
+        self.ready = Signal(1, reset=1)
+
+        #[OUTPUT] - result_valid: Single clock cycle strobe marking each new result on data_output/success
+        self.result_valid = Signal(1)
+
+    def ports(self):
+        return [self.data_input, self.start, self.ready, self.data_output, self.done, self.result_valid, self.success,
+                self.iterations]
+
+    def saturate(self, value, width):
+        #Clip a signed value to the range of a 'width' bit two's complement number
+        maximum = (1 << (width-1))-1
+        return Mux(value > maximum, maximum, Mux(value < -maximum, -maximum, value))
+
+    def correct_magnitude(self, magnitude):
+        #Apply the normalized or offset min-sum correction to a check node magnitude
+        if self.min_sum_variant == MIN_SUM_NORMALIZED:
+            return magnitude - (magnitude >> self.normalization_shift)
+        return Mux(magnitude > self.offset, magnitude - self.offset, 0)
+
+    def elaborate(self, platform):
+        #Instantiate the Module
+        m = Module()
+
+        message_maximum = (1 << (self.llr_width-1))-1
+        row_degree = max(len(bits) for bits in self.row_bits)
+
+        #posterior - The posterior LLR of every codeword bit
+        posterior = [Signal(signed(self.posterior_width), reset=0, name="posterior_{}".format(n)) for n in range(self.codeword_width)]
+
+        #check_messages - The last check-to-bit message sent by every parity check row to each of its bits
+        check_messages = [[Signal(signed(self.llr_width), reset=0, name="check_message_{}_{}".format(i, n)) for n in self.row_bits[i]]
+                          for i in range(self.ParityCheckMatrixRows)]
+
+        #hard_decision - The codeword given by the sign of each posterior LLR
+        hard_decision = Signal(unsigned(self.codeword_width))
+        m.d.comb += hard_decision.eq(Cat(*[posterior[n] < 0 for n in range(self.codeword_width)]))
+
+        #syndrome - The result of each parity check row (1=Fail, 0=Pass) for the hard decision
+        syndrome = Signal(unsigned(self.ParityCheckMatrixRows))
+        for i in range(0,self.ParityCheckMatrixRows):
+            m.d.comb += syndrome[i].eq(Cat(*[hard_decision[n] for n in self.row_bits[i]]).xor() if self.row_bits[i] else 0)
+
+        #layer - The layer being processed on this clock cycle
+        layer = Signal(range(len(self.layers)+1), reset=0)
+
+        #running - Signal to indicate that we are currently running
+        running = Signal(1, reset=0)
+
+        #Check node units - Each unit computes the min-sum update for one parity check row per clock cycle.
+        #Unused inputs keep their reset value (the largest positive message) so they never become the minimum.
+        cnu_bit_messages = []
+        cnu_check_messages = []
+        for k in range(0,self.check_node_units):
+            #bit_messages - The bit-to-check messages (posterior minus the row's previous check message), saturated
+            bit_messages = [Signal(signed(self.llr_width), reset=message_maximum, name="cnu{}_bit_message_{}".format(k, s)) for s in range(row_degree)]
+            magnitudes = [Mux(q < 0, -q, q)[:self.llr_width-1] for q in bit_messages]
+            signs = [q < 0 for q in bit_messages]
+
+            #Find the smallest and second smallest magnitude and the position of the smallest
+            minimum_1 = Signal(unsigned(self.llr_width-1), name="cnu{}_minimum_1".format(k))
+            minimum_2 = Signal(unsigned(self.llr_width-1), name="cnu{}_minimum_2".format(k))
+            minimum_index = Signal(range(row_degree+1), name="cnu{}_minimum_index".format(k))
+            running_minimum_1, running_minimum_2, running_index = Const(message_maximum), Const(message_maximum), Const(0)
+            for s in range(row_degree):
+                smaller = magnitudes[s] < running_minimum_1
+                running_minimum_2 = Mux(smaller, running_minimum_1, Mux(magnitudes[s] < running_minimum_2, magnitudes[s], running_minimum_2))
+                running_minimum_1 = Mux(smaller, magnitudes[s], running_minimum_1)
+                running_index = Mux(smaller, s, running_index)
+            m.d.comb += [
+                minimum_1.eq(running_minimum_1),
+                minimum_2.eq(running_minimum_2),
+                minimum_index.eq(running_index)
+            ]
+            sign_product = Cat(*signs).xor()
+
+            #check_messages - The new check-to-bit message for each input
+            new_check_messages = []
+            for s in range(row_degree):
+                magnitude = Signal(unsigned(self.llr_width-1), name="cnu{}_magnitude_{}".format(k, s))
+                m.d.comb += magnitude.eq(self.correct_magnitude(Mux(minimum_index == s, minimum_2, minimum_1)))
+                check_message = Signal(signed(self.llr_width), name="cnu{}_check_message_{}".format(k, s))
+                m.d.comb += check_message.eq(Mux(sign_product ^ signs[s], -magnitude, magnitude))
+                new_check_messages.append(check_message)
+            cnu_bit_messages.append(bit_messages)
+            cnu_check_messages.append(new_check_messages)
+
+        #Reset the relevant registers/wires and load the input LLRs into the posterior LLRs
+        with m.If(self.start):
+            m.d.sync += [
+                self.data_output.eq(0),
+                self.done.eq(0),
+                self.success.eq(0),
+                self.iterations.eq(0),
+                layer.eq(0),
+                running.eq(1)
+            ]
+            for n in range(0,self.codeword_width):
+                #Sign extend each input LLR into its posterior LLR
+                llr = self.data_input[n*self.llr_width:(n+1)*self.llr_width]
+                m.d.sync += posterior[n].eq(Cat(llr, Repl(llr[-1], self.posterior_width-self.llr_width)))
+            for i in range(0,self.ParityCheckMatrixRows):
+                for message in check_messages[i]:
+                    m.d.sync += message.eq(0)
+        #Stop as soon as every parity check passes (checked at the start of every iteration)
+        with m.Elif(running & (layer==0) & (syndrome==0)):
+            m.d.sync += [
+                self.data_output.eq(hard_decision[self.codeword_width-self.data_output_width:]),
+                self.success.eq(1),
+                self.done.eq(1),
+                running.eq(0)
+            ]
+        #Give up once the iteration budget has been used
+        with m.Elif(running & (layer==0) & (self.iterations==self.max_iterations)):
+            m.d.sync += [
+                self.data_output.eq(hard_decision[self.codeword_width-self.data_output_width:]),
+                self.success.eq(0),
+                self.done.eq(1),
+                running.eq(0)
+            ]
+        #Process one layer: route its rows through the check node units and write back the updated LLRs and messages
+        with m.Elif(running):
+            with m.If(layer==len(self.layers)-1):
+                m.d.sync += [
+                    layer.eq(0),
+                    self.iterations.eq(self.iterations+1)
+                ]
+            with m.Else():
+                m.d.sync += layer.eq(layer+1)
+
+            with m.Switch(layer):
+                for l, rows in enumerate(self.layers):
+                    with m.Case(l):
+                        for k, i in enumerate(rows):
+                            for s, n in enumerate(self.row_bits[i]):
+                                bit_message = posterior[n] - check_messages[i][s]
+                                m.d.comb += cnu_bit_messages[k][s].eq(self.saturate(bit_message, self.llr_width))
+                                m.d.sync += [
+                                    posterior[n].eq(self.saturate(bit_message + cnu_check_messages[k][s], self.posterior_width)),
+                                    check_messages[i][s].eq(cnu_check_messages[k][s])
+                                ]
+
+        #done holds each result until the next start, so result_valid strobes its rising edge. ready stays at its reset
+        #value of 1, a start being accepted on every clock cycle.
+        m.d.sync += self.ready.eq(1)
+        done_previous = Signal(1, reset=0)
+        m.d.sync += done_previous.eq(self.done)
+        m.d.comb += self.result_valid.eq(self.done & ~done_previous)
+        return m
@@ -0,0 +1,262 @@
+from nmigen import Elaboratable, Module, Signal, Array, unsigned, Const, Cat
+from nmigen.build import Platform
+from nmigen.cli import main_parser, main_runner, main
+from nmigen.back.pysim import Simulator, Delay
+from nmigen.asserts import Assert, Assume, Cover
+from src.ldpc_decoder import candidate_rounds, candidate_flip_mask, candidate_exists, selected_flip_mask, zero_syndrome
+from src.ldpc_priority_encoder import LDPC_Priority_Encoder
+from src.ldpc_decoder_validator import LDPC_Decoder_Validator, REDUCTION_STRATEGY_RIPPLE
+from src.ldpc_parity_check_matrix import as_sparse
+
+#[COMPLETION] - COMPLETION_IN_ORDER: Lane results leave the completion port in lane order
+COMPLETION_IN_ORDER = "in_order"
+
+#[COMPLETION] - COMPLETION_TAGGED: Lane results leave the completion port as soon as they are ready, tagged with their lane
+COMPLETION_TAGGED = "tagged"
+
+COMPLETION_MODES = [COMPLETION_IN_ORDER, COMPLETION_TAGGED]
+
+class LDPC_Multi_Lane_Decoder(Elaboratable):
+    #Decodes 'lanes' codewords per start pulse with the time-multiplexed brute force search of LDPC_Decoder.
+    #The lanes share the control FSM and the round register driving the bit-flip candidates, so every lane validates
+    #the same candidate positions in the same round. A lane with a clean codeword finishes on the clock cycle after start
+    #(zero-syndrome fast path), the others after their first round with a passing candidate (or after the last round),
+    #and the FSM stops once every lane has finished.
+    def __init__(self, ParityCheckMatrix, codeword_width, data_width, lanes, parallelism=None,
+                 reduction_strategy=REDUCTION_STRATEGY_RIPPLE, reduction_pipeline_depth=0, completion=COMPLETION_IN_ORDER):
+
+        #[PARAMETER] - codeword_width: Width of each input Codeword
+        self.codeword_width = int(codeword_width)
+
+        #[PARAMETER] - ParityCheckMatrixPythonArray: Python Array representing the parity check matrix
+        self.ParityCheckMatrixPythonArray = ParityCheckMatrix
+
+        #[PARAMETER] - data_output_width: The length of each lane's output data
+        self.data_output_width = int(data_width)
+
+        #[PARAMETER] - lanes: Number of codewords decoded concurrently
+        if lanes < 1:
+            raise ValueError("lanes must be at least 1")
+        self.lanes = int(lanes)
+
+        #[PARAMETER] - parallelism: Validators per lane, as for LDPC_Decoder (None validates every candidate in one round)
+        if parallelism is not None and not 1 <= parallelism <= self.codeword_width+1:
+            raise ValueError("parallelism must be between 1 and codeword_width+1 ({})".format(self.codeword_width+1))
+        self.parallelism = self.codeword_width+1 if parallelism is None else int(parallelism)
+
+        #[PARAMETER] - reduction_strategy, reduction_pipeline_depth: As for LDPC_Decoder
+        self.reduction_strategy = reduction_strategy
+        self.reduction_pipeline_depth = reduction_pipeline_depth
+
+        #[PARAMETER] - completion: Order in which the completion port presents the lane results (one of COMPLETION_MODES)
+        if completion not in COMPLETION_MODES:
+            raise ValueError("Unknown completion '{}', expected one of {}".format(completion, COMPLETION_MODES))
+        self.completion = completion
+
+        #[PARAMETER] - lane_width: Width of the lane index carried by the completion port
+        self.lane_width = max(1, (self.lanes-1).bit_length())
+
+        #[INPUT] - data_input: The codewords to be decoded, lane 'l' on bits [l*codeword_width, (l+1)*codeword_width)
+        self.data_input = Signal(self.codeword_width*self.lanes)
+
+        #[INPUT] - start: The start signal to start decoding every lane
+        self.start = Signal(1)
+
+        #[OUTPUT] - data_output: The decoded data, lane 'l' on bits [l*data_width, (l+1)*data_width)
+        self.data_output = Signal(self.data_output_width*self.lanes, reset=0)
+
+        #[OUTPUT] - lane_done: Flag per lane indicating that the lane has finished
+        self.lane_done = Signal(self.lanes, reset=0)
+
+        #[OUTPUT] - success: Flag per lane indicating whether decoding the lane was successful or not
+        self.success = Signal(self.lanes, reset=0)
+
+        #[OUTPUT] - done: The done signal to indicate that every lane has finished
+        self.done = Signal(1, reset=0)
+
+        #[OUTPUT] - out_valid: Indicates that out_lane, out_data and out_success hold a finished lane's result
+        self.out_valid = Signal(1)
+
+        #[INPUT] - out_ready: Indicates that the consumer accepts the presented result on this clock cycle
+        self.out_ready = Signal(1)
+
+        #[OUTPUT] - out_lane: The lane (tag) of the presented result
+        self.out_lane = Signal(self.lane_width)
+
+        #[OUTPUT] - out_data: The decoded data of the presented result
+        self.out_data = Signal(self.data_output_width)
+
+        #[OUTPUT] - out_success: Flag indicating whether decoding the presented lane was successful or not
+        self.out_success = Signal(1)
+
+    def ports(self):
+        return [self.data_input, self.start, self.data_output, self.lane_done, self.success, self.done,
+                self.out_valid, self.out_ready, self.out_lane, self.out_data, self.out_success]
+
+    def rounds(self):
+        #Number of rounds needed to validate every bit-flip candidate
+        return candidate_rounds(self.codeword_width, self.parallelism)
+
+    def elaborate(self, platform):
+        #Instantiate the Module
+        m = Module()
+
+        rounds = self.rounds()
+
+        #round - One-hot register of the round being validated (shared by every lane)
+        round = Signal(rounds, reset=0)
+
+        #pipeline_stage - A signal for keeping track of the pipeline stage (shared by every lane)
+        pipeline_stage = Signal(3, reset=0)
+
+        #start_submodules - A signal for starting the submodules
+        start_submodules = Signal(1, reset=0)
+
+        #flip_masks - The bits flipped by each validator in the current round (shared by every lane)
+        flip_masks = [candidate_flip_mask(round, self.codeword_width, self.parallelism, j) for j in range(0,self.parallelism)]
+        exists = [candidate_exists(round, self.codeword_width, self.parallelism, j) for j in range(0,self.parallelism)]
+
+        #lane_passed - The lanes with a candidate which passed every parity check in this round
+        lane_passed = Signal(self.lanes)
+
+        #validators_done - Every validator finishes on the same clock cycle
+        validators_done = Signal(1)
+
+        #lane_clean - The lanes whose input codeword passes every parity check (zero-syndrome fast path)
+        lane_clean = Signal(self.lanes)
+        row_bits = as_sparse(self.ParityCheckMatrixPythonArray, self.codeword_width).row_bits
+
+        codewords = []
+        selected_masks = []
+        for lane in range(0,self.lanes):
+            #codeword - A register holding the lane's input codeword
+            codeword = Signal(unsigned(self.codeword_width), reset=0, name="codeword_lane{}".format(lane))
+            codewords.append(codeword)
+            m.d.comb += lane_clean[lane].eq(zero_syndrome(m, codeword, row_bits))
+
+            candidate_passed = []
+            for j in range(0,self.parallelism):
+                m.submodules["lane{}_decoder{}".format(lane, j)] = validator = LDPC_Decoder_Validator(
+                    self.ParityCheckMatrixPythonArray,self.codeword_width,self.reduction_strategy,self.reduction_pipeline_depth)
+                with m.If(pipeline_stage==1):
+                    m.d.sync += validator.data_input.eq(codeword ^ flip_masks[j])
+                m.d.comb += validator.start.eq(start_submodules)
+                candidate_passed.append((validator.data_output==0) & exists[j])
+                if lane == 0 and j == 0:
+                    m.d.comb += validators_done.eq(validator.done)
+            #Select the lane's lowest numbered passing candidate of the round
+            m.submodules["lane{}_selector".format(lane)] = selector = LDPC_Priority_Encoder(self.parallelism)
+            m.d.comb += [
+                selector.requests.eq(Cat(*candidate_passed)),
+                lane_passed[lane].eq(selector.valid)
+            ]
+            selected_masks.append(selected_flip_mask(round, self.codeword_width, self.parallelism, selector.onehot))
+
+        #Reset the relevant registers/wires, load the input codewords and start from the first round
+        with m.If(self.start):
+            m.d.sync += [
+                self.data_output.eq(0),
+                self.lane_done.eq(0),
+                self.success.eq(0),
+                self.done.eq(0),
+                round.eq(1),
+                pipeline_stage.eq(1)
+            ]
+            for lane, codeword in enumerate(codewords):
+                m.d.sync += codeword.eq(self.data_input[lane*self.codeword_width:(lane+1)*self.codeword_width])
+        #Finish the lanes with a clean input codeword straight away, and STOP if every lane is clean
+        with m.Elif((pipeline_stage==1) & round[0] & lane_clean.any()):
+            for lane, codeword in enumerate(codewords):
+                with m.If(lane_clean[lane]):
+                    m.d.sync += [
+                        self.lane_done[lane].eq(1),
+                        self.success[lane].eq(1),
+                        self.data_output[lane*self.data_output_width:(lane+1)*self.data_output_width].eq(
+                            codeword[self.codeword_width-self.data_output_width:])
+                    ]
+            with m.If(lane_clean.all()):
+                m.d.sync += [
+                    self.done.eq(1),
+                    pipeline_stage.eq(0)
+                ]
+            with m.Else():
+                m.d.sync += pipeline_stage.eq(2)
+        #Load this round's candidates into the validators (see candidate_flip_mask)
+        with m.Elif(pipeline_stage==1):
+            m.d.sync += pipeline_stage.eq(2)
+        #Start validating the candidates (Set Start Bit to 1)
+        with m.Elif(pipeline_stage==2):
+            m.d.sync += [
+                start_submodules.eq(1),
+                pipeline_stage.eq(3)
+            ]
+        #Start validating the candidates (Set Start Bit to 0)
+        with m.Elif(pipeline_stage==3):
+            m.d.sync += [
+                start_submodules.eq(0),
+                pipeline_stage.eq(4)
+            ]
+        #Once the validators are done, finish the lanes with a passing candidate (or every lane after the last round)
+        #and STOP once every lane has finished.
+        with m.Elif((pipeline_stage==4) & validators_done):
+            for lane, (codeword, selected_mask) in enumerate(zip(codewords, selected_masks)):
+                with m.If(~self.lane_done[lane] & (lane_passed[lane] | round[rounds-1])):
+                    m.d.sync += [
+                        self.lane_done[lane].eq(1),
+                        self.success[lane].eq(lane_passed[lane])
+                    ]
+                    with m.If(lane_passed[lane]):
+                        m.d.sync += self.data_output[lane*self.data_output_width:(lane+1)*self.data_output_width].eq(
+                            (codeword ^ selected_mask)[self.codeword_width-self.data_output_width:])
+            with m.If(round[rounds-1] | (self.lane_done | lane_passed).all()):
+                m.d.sync += [
+                    self.done.eq(1),
+                    pipeline_stage.eq(0)
+                ]
+            with m.Else():
+                m.d.sync += [
+                    round.eq(round << 1),
+                    pipeline_stage.eq(1)
+                ]
+
+        self.elaborate_completion(m)
+        return m
+
+    def elaborate_completion(self, m):
+        #Completion port - Presents each finished lane's result once, in lane order or tagged in order of completion
+        #pending - Finished lanes whose result has not been accepted yet
+        pending = Signal(self.lanes, reset=0)
+
+        #selected - The lane presented on the completion port
+        selected = Signal(self.lane_width)
+
+        if self.completion == COMPLETION_IN_ORDER:
+            #The next lane in order is presented once it has finished
+            m.d.comb += self.out_valid.eq(Array([pending[lane] for lane in range(0,self.lanes)])[selected])
+            with m.If(self.start):
+                m.d.sync += selected.eq(0)
+            with m.Elif(self.out_valid & self.out_ready):
+                m.d.sync += selected.eq(selected+1)
+        else:
+            #The lowest numbered pending lane is presented
+            m.d.comb += self.out_valid.eq(pending.any())
+            for lane in reversed(range(0,self.lanes)):
+                with m.If(pending[lane]):
+                    m.d.comb += selected.eq(lane)
+
+        m.d.comb += [
+            self.out_lane.eq(selected),
+            self.out_data.eq(Array([self.data_output[lane*self.data_output_width:(lane+1)*self.data_output_width]
+                                    for lane in range(0,self.lanes)])[selected]),
+            self.out_success.eq(Array([self.success[lane] for lane in range(0,self.lanes)])[selected])
+        ]
+
+        #Lanes become pending on the clock cycle after they finish, and stop being pending once accepted
+        lane_finished = Signal(self.lanes, reset=0)
+        m.d.sync += lane_finished.eq(self.lane_done)
+        with m.If(self.start):
+            m.d.sync += [pending.eq(0), lane_finished.eq(0)]
+        with m.Else():
+            accepted = Signal(self.lanes)
+            m.d.comb += accepted.eq(Cat(*[self.out_valid & self.out_ready & (selected==lane) for lane in range(0,self.lanes)]))
+            m.d.sync += pending.eq((pending | (self.lane_done & ~lane_finished)) & ~accepted)
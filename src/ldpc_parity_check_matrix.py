@@ -0,0 +1,241 @@
+#Sparse parity check matrix representation, alist file loader/writer and conversion from the packed integer form.
+#
+#The decoders take the parity check matrix 'H' as a Python Array with one packed integer per row, e.g.
+#    parityCheckMatrix = [[0b111100],
+#                         [0b001101],
+#                         [0b100110] ]
+#where bit 'n' of each row is the entry for codeword bit 'n' (the leftmost matrix column is the most significant bit).
+#SparseParityCheckMatrix stores only the nonzero entries of H as per-row and per-column index lists, and can be passed to
+#the decoders wherever the packed form is accepted.
+#QuasiCyclicParityCheckMatrix describes a quasi-cyclic (QC) code by its base matrix of circulant shift values and
+#lifting size Z, as the standard codes (802.11n/ac, 5G NR, DVB-S2) are defined. It expands into the sparse form wherever
+#a parity check matrix is accepted, and drives the circulant based datapath of LDPC_QC_Bit_Flipping_Decoder.
+import json
+
+#Example codes, as used by the ldpc_decoder_6_3_* and ldpc_decoder_9_4_* top levels: (parity check matrix, codeword width, data width)
+EXAMPLE_CODES = {
+    "6_3": ([[0b111100],
+             [0b001101],
+             [0b100110]], 6, 3),
+    "9_4": ([[0b000011100],
+             [0b110000010],
+             [0b001100001],
+             [0b100001010],
+             [0b001000101],
+             [0b010110000]], 9, 4),
+}
+
+class SparseParityCheckMatrix:
+    def __init__(self, codeword_width, row_bits):
+
+        #[PARAMETER] - codeword_width: Width of the Codeword (number of columns of H)
+        self.codeword_width = int(codeword_width)
+
+        #[PARAMETER] - row_bits: The codeword bits connected to each parity check row (sorted, no duplicates)
+        self.row_bits = [sorted(set(int(n) for n in bits)) for bits in row_bits]
+        for bits in self.row_bits:
+            if bits and (bits[0] < 0 or bits[-1] >= self.codeword_width):
+                raise ValueError("Parity check row connects to a bit outside of a {} bit codeword".format(self.codeword_width))
+
+        #[PARAMETER] - bit_checks: The parity check rows connected to each codeword bit
+        self.bit_checks = [[] for _ in range(self.codeword_width)]
+        for i, bits in enumerate(self.row_bits):
+            for n in bits:
+                self.bit_checks[n].append(i)
+
+        #packed - Lazily built packed integer form ([[row], [row], ...]), shared by every row access
+        self._packed = None
+
+    @classmethod
+    def from_packed(cls, ParityCheckMatrix, codeword_width):
+        #Convert the packed integer form ([[row], [row], ...]) into a sparse matrix
+        row_bits = []
+        for row in ParityCheckMatrix:
+            bits = bin(row[0])[2:][::-1]
+            row_bits.append([n for n in range(0,min(len(bits), int(codeword_width))) if bits[n] == "1"])
+        return cls(codeword_width, row_bits)
+
+    def _packed_form(self):
+        #The packed integer form, built once
+        if self._packed is None:
+            self._packed = [[sum(1 << n for n in bits)] for bits in self.row_bits]
+        return self._packed
+
+    def to_packed(self):
+        #Convert the sparse matrix into the packed integer form ([[row], [row], ...])
+        return [list(row) for row in self._packed_form()]
+
+    def __len__(self):
+        return len(self.row_bits)
+
+    def __getitem__(self, i):
+        #Behave like the packed integer form so that H[i][0] is the packed integer of row 'i'
+        return self._packed_form()[i]
+
+    def __iter__(self):
+        return iter(self._packed_form())
+
+    def __eq__(self, other):
+        if not isinstance(other, SparseParityCheckMatrix):
+            return NotImplemented
+        return self.codeword_width == other.codeword_width and self.row_bits == other.row_bits
+
+    def __repr__(self):
+        return "SparseParityCheckMatrix(codeword_width={}, rows={}, nonzeros={})".format(
+            self.codeword_width, len(self.row_bits), sum(len(bits) for bits in self.row_bits))
+
+class QuasiCyclicParityCheckMatrix:
+    def __init__(self, base_matrix, lifting_size):
+
+        #[PARAMETER] - lifting_size: Size Z of the circulant (cyclically shifted identity) blocks
+        self.lifting_size = int(lifting_size)
+        if self.lifting_size < 1:
+            raise ValueError("lifting_size must be at least 1")
+
+        #[PARAMETER] - base_matrix: Shift value of each Z x Z block (-1 for an all-zero block). Block (r, c) with shift 's'
+        #              connects row r*Z+i to matrix column c*Z+(i+s)%Z.
+        self.base_matrix = [[int(shift) for shift in row] for row in base_matrix]
+        if not self.base_matrix or any(len(row) != len(self.base_matrix[0]) for row in self.base_matrix):
+            raise ValueError("base_matrix must be a non-empty list of equal length rows")
+        for row in self.base_matrix:
+            for shift in row:
+                if not -1 <= shift < self.lifting_size:
+                    raise ValueError("Shift value {} outside of -1..{}".format(shift, self.lifting_size-1))
+
+        #[PARAMETER] - base_rows, base_columns: Dimensions of the base matrix
+        self.base_rows = len(self.base_matrix)
+        self.base_columns = len(self.base_matrix[0])
+
+        #[PARAMETER] - codeword_width: Width of the Codeword (base_columns*Z). As for alist files, matrix column 'j'
+        #              (counted from the left) is codeword bit codeword_width-1-j.
+        self.codeword_width = self.base_columns*self.lifting_size
+
+        #[PARAMETER] - circulants: (base row, base column, shift) of every nonzero block, in row-major order
+        self.circulants = [(r, c, shift) for r, row in enumerate(self.base_matrix) for c, shift in enumerate(row) if shift >= 0]
+
+        #sparse - Lazily expanded SparseParityCheckMatrix
+        self._sparse = None
+
+    def to_sparse(self):
+        #Expand the circulants into a SparseParityCheckMatrix
+        if self._sparse is None:
+            Z = self.lifting_size
+            row_bits = [[] for _ in range(self.base_rows*Z)]
+            for r, c, shift in self.circulants:
+                for i in range(0,Z):
+                    row_bits[r*Z+i].append(self.codeword_width-1-(c*Z+(i+shift) % Z))
+            self._sparse = SparseParityCheckMatrix(self.codeword_width, row_bits)
+        return self._sparse
+
+    def to_blocks(self, codeword):
+        #Split a codeword into one Z bit word per base column, bit 'z' of word 'c' holding matrix column c*Z+z
+        return [sum(((int(codeword) >> (self.codeword_width-1-(c*self.lifting_size+z))) & 1) << z for z in range(0,self.lifting_size))
+                for c in range(0,self.base_columns)]
+
+    def from_blocks(self, blocks):
+        #Join one Z bit word per base column (see to_blocks) back into a codeword
+        return sum(((int(word) >> z) & 1) << (self.codeword_width-1-(c*self.lifting_size+z))
+                   for c, word in enumerate(blocks) for z in range(0,self.lifting_size))
+
+    def __len__(self):
+        return self.base_rows*self.lifting_size
+
+    def __getitem__(self, i):
+        #Behave like the packed integer form so that H[i][0] is the packed integer of row 'i'
+        return self.to_sparse()[i]
+
+    def __iter__(self):
+        return iter(self.to_sparse())
+
+    def __repr__(self):
+        return "QuasiCyclicParityCheckMatrix(base_rows={}, base_columns={}, lifting_size={}, circulants={})".format(
+            self.base_rows, self.base_columns, self.lifting_size, len(self.circulants))
+
+def as_sparse(ParityCheckMatrix, codeword_width):
+    #Return the parity check matrix as a SparseParityCheckMatrix, converting from the packed integer or quasi-cyclic form
+    #if required
+    if isinstance(ParityCheckMatrix, QuasiCyclicParityCheckMatrix):
+        ParityCheckMatrix = ParityCheckMatrix.to_sparse()
+    if isinstance(ParityCheckMatrix, SparseParityCheckMatrix):
+        if ParityCheckMatrix.codeword_width != int(codeword_width):
+            raise ValueError("Parity check matrix has {} columns, expected {}".format(ParityCheckMatrix.codeword_width, codeword_width))
+        return ParityCheckMatrix
+    return SparseParityCheckMatrix.from_packed(ParityCheckMatrix, codeword_width)
+
+def load_alist(path):
+    #Load a parity check matrix from a file in the standard alist format (MacKay), with or without zero padding.
+    #Alist column 'c' (1-based) is mapped to codeword bit codeword_width-c, so that the first alist column is the
+    #leftmost (most significant) column of the packed integer form.
+    with open(path) as alist_file:
+        values = [int(value) for value in alist_file.read().split()]
+    if len(values) < 4:
+        raise ValueError("Truncated alist file '{}'".format(path))
+    codeword_width, rows, max_column_degree, max_row_degree = values[0:4]
+    column_degrees = values[4:4+codeword_width]
+    row_degrees = values[4+codeword_width:4+codeword_width+rows]
+    position = 4+codeword_width+rows
+
+    #Zero padded files store every column/row list at the maximum degree, unpadded files at the actual degree
+    padded = len(values) >= position+codeword_width*max_column_degree+rows*max_row_degree
+    position += codeword_width*max_column_degree if padded else sum(column_degrees)
+    row_bits = []
+    for i in range(0,rows):
+        length = max_row_degree if padded else row_degrees[i]
+        row_bits.append([codeword_width-c for c in values[position:position+length] if c != 0])
+        position += length
+    if position > len(values) or len(row_degrees) != rows:
+        raise ValueError("Truncated alist file '{}'".format(path))
+
+    H = SparseParityCheckMatrix(codeword_width, row_bits)
+    if [len(bits) for bits in H.row_bits] != row_degrees or [len(checks) for checks in reversed(H.bit_checks)] != column_degrees:
+        raise ValueError("Degrees in alist file '{}' do not match its row lists".format(path))
+    return H
+
+def save_alist(ParityCheckMatrix, codeword_width, path):
+    #Write a parity check matrix (sparse or packed integer form) to a file in the standard alist format
+    H = as_sparse(ParityCheckMatrix, codeword_width)
+    max_column_degree = max([len(checks) for checks in H.bit_checks] + [0])
+    max_row_degree = max([len(bits) for bits in H.row_bits] + [0])
+    #Alist columns run from the most significant codeword bit to the least significant one
+    columns = [H.bit_checks[H.codeword_width-1-c] for c in range(H.codeword_width)]
+    rows = [sorted(H.codeword_width-n for n in bits) for bits in H.row_bits]
+    lines = [
+        "{} {}".format(H.codeword_width, len(H.row_bits)),
+        "{} {}".format(max_column_degree, max_row_degree),
+        " ".join(str(len(checks)) for checks in columns),
+        " ".join(str(len(bits)) for bits in rows)
+    ]
+    lines += [" ".join(str(i+1) for i in checks) + " 0"*(max_column_degree-len(checks)) for checks in columns]
+    lines += [" ".join(str(c) for c in bits) + " 0"*(max_row_degree-len(bits)) for bits in rows]
+    with open(path, "w") as alist_file:
+        alist_file.write("\n".join(line.strip() for line in lines) + "\n")
+
+def load_json(path):
+    #Load a parity check matrix from a JSON object holding its codeword_width and either
+    #  "rows"     - the codeword bits connected to each parity check row (sparse form), or
+    #  "H"        - each row as a string of 0/1 matrix entries, leftmost column first (as the packed integers are written),
+    #               or as a packed integer
+    #Any other keys (e.g. a data_width) are ignored, so a code can be described by a single file.
+    with open(path) as json_file:
+        description = json.load(json_file)
+    try:
+        codeword_width = int(description["codeword_width"])
+        if "rows" in description:
+            return SparseParityCheckMatrix(codeword_width, description["rows"])
+        packed = []
+        for row in description["H"]:
+            if isinstance(row, str):
+                if len(row) != codeword_width or set(row) - {"0", "1"}:
+                    raise ValueError("Row '{}' is not a string of {} matrix entries".format(row, codeword_width))
+                row = int(row, 2)
+            packed.append([int(row)])
+        return SparseParityCheckMatrix.from_packed(packed, codeword_width)
+    except (KeyError, TypeError) as error:
+        raise ValueError("Invalid parity check matrix in JSON file '{}': {}".format(path, error))
+
+def save_json(ParityCheckMatrix, codeword_width, path, **extra):
+    #Write a parity check matrix (sparse or packed integer form) to a JSON file in the sparse "rows" form, together with
+    #any 'extra' keys (e.g. data_width=4)
+    H = as_sparse(ParityCheckMatrix, codeword_width)
+    with open(path, "w") as json_file:
+        json.dump(dict(extra, codeword_width=H.codeword_width, rows=H.row_bits), json_file)
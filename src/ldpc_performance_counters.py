@@ -0,0 +1,157 @@
+from nmigen import Elaboratable, Module, Signal, Array, unsigned, Const, Cat
+from nmigen.build import Platform
+from nmigen.cli import main_parser, main_runner, main
+from nmigen.back.pysim import Simulator, Delay
+from nmigen.asserts import Assert, Assume, Cover
+
+#[CSR] - Register map of LDPC_Performance_Counters (one counter_width register per address)
+#CSR_FRAMES: Frames decoded (done events)
+CSR_FRAMES = 0
+#CSR_CORRECTED: Frames decoded successfully after flipping at least one bit
+CSR_CORRECTED = 1
+#CSR_FAILED: Frames which failed to decode (no bit-flip candidate or error pattern passed)
+CSR_FAILED = 2
+#CSR_BUSY_CYCLES: Clock cycles with a frame being decoded
+CSR_BUSY_CYCLES = 3
+#CSR_IDLE_CYCLES: Clock cycles without a frame being decoded
+CSR_IDLE_CYCLES = 4
+#CSR_CONTROL: Reads the histogram configuration (bin width << 8 | bins), writing 1 to bit 0 clears every counter
+CSR_CONTROL = 5
+#CSR_HISTOGRAM: Latency histogram, bin 'b' at CSR_HISTOGRAM+b counting frames with a latency of
+#               [b*bin_width, (b+1)*bin_width) clock cycles (the last bin also counts every longer latency)
+CSR_HISTOGRAM = 8
+
+class LDPC_Performance_Counters(Elaboratable):
+    #Performance counters and latency histogram of a start/done decoder, read and cleared through a plain CSR bus.
+    #A frame starts on the clock cycle its start is accepted (start & ready) and finishes on its result_valid strobe, its
+    #latency counted as in the testbench (see LDPC_Decoder_Model.latencies). Up to 4 frames can be in flight (e.g. in a
+    #double buffered decoder).
+    #Counters saturate instead of wrapping around.
+    #
+    #CSR bus: csr_read_data holds the register at csr_address on the clock cycle after the address is presented, and
+    #csr_write writes csr_write_data to the register at csr_address. Writing a counter clears it.
+    def __init__(self, decoder, histogram_bins=8, histogram_bin_width=4, counter_width=32):
+
+        #[PARAMETER] - decoder: The monitored decoder (start, ready, result_valid and success ports, and max_in_flight).
+        #              Frames are corrected when corrected_bit is not codeword_width or, for the iterative decoders,
+        #              when at least one iteration was needed.
+        if decoder.max_in_flight > 4:
+            raise ValueError("at most 4 frames can be in flight")
+        self.decoder = decoder
+
+        #[PARAMETER] - histogram_bins: Number of latency histogram bins
+        if histogram_bins < 1:
+            raise ValueError("histogram_bins must be at least 1")
+        self.histogram_bins = int(histogram_bins)
+
+        #[PARAMETER] - histogram_bin_width: Clock cycles covered by each histogram bin (a power of two)
+        if histogram_bin_width < 1 or histogram_bin_width & (histogram_bin_width-1):
+            raise ValueError("histogram_bin_width must be a power of two")
+        self.histogram_bin_width = int(histogram_bin_width)
+
+        #[PARAMETER] - counter_width: Width of each counter
+        self.counter_width = int(counter_width)
+
+        #[PARAMETER] - address_width: Width of the CSR address
+        self.address_width = (CSR_HISTOGRAM+self.histogram_bins-1).bit_length()
+
+        #[INPUT] - csr_address: The register being read or written
+        self.csr_address = Signal(self.address_width)
+
+        #[OUTPUT] - csr_read_data: The register read on the previous clock cycle
+        self.csr_read_data = Signal(self.counter_width, reset=0)
+
+        #[INPUT] - csr_write: Write csr_write_data to the register at csr_address on this clock cycle
+        self.csr_write = Signal(1)
+
+        #[INPUT] - csr_write_data: The data written
+        self.csr_write_data = Signal(self.counter_width)
+
+    def ports(self):
+        return [self.csr_address, self.csr_read_data, self.csr_write, self.csr_write_data]
+
+    def elaborate(self, platform):
+        #Instantiate the Module
+        m = Module()
+        decoder = self.decoder
+
+        #accepted - A frame is started on this clock cycle
+        accepted = Signal(1)
+        m.d.comb += accepted.eq(decoder.start & decoder.ready)
+
+        #finished - A result is presented on this clock cycle
+        finished = Signal(1)
+        m.d.comb += finished.eq(decoder.result_valid)
+
+        #corrected - The finished frame flipped at least one bit
+        corrected = Signal(1)
+        if hasattr(decoder, "corrected_bit"):
+            m.d.comb += corrected.eq(decoder.success & (decoder.corrected_bit != decoder.codeword_width))
+        elif hasattr(decoder, "iterations"):
+            m.d.comb += corrected.eq(decoder.success & (decoder.iterations != 0))
+
+        #timestamp - Free running clock cycle counter
+        timestamp = Signal(self.counter_width, reset=0)
+        m.d.sync += timestamp.eq(timestamp+1)
+
+        #start_times - Clock cycle after each frame in flight was accepted, written at write_pointer and read at read_pointer
+        start_times = Array([Signal(self.counter_width, reset=0, name="start_time{}".format(i)) for i in range(0,4)])
+        write_pointer = Signal(2, reset=0)
+        read_pointer = Signal(2, reset=0)
+        with m.If(accepted):
+            m.d.sync += [
+                start_times[write_pointer].eq(timestamp+1),
+                write_pointer.eq(write_pointer+1)
+            ]
+            if decoder.max_in_flight == 1:
+                #A start abandons the frame being decoded
+                m.d.sync += read_pointer.eq(write_pointer)
+        with m.If(finished):
+            m.d.sync += read_pointer.eq(read_pointer+1)
+
+        #latency - Latency of the finished frame
+        latency = Signal(self.counter_width)
+        m.d.comb += latency.eq(timestamp-start_times[read_pointer])
+
+        #busy - A frame is being decoded (the clock cycle presenting its result is not counted)
+        busy = Signal(1)
+        m.d.comb += busy.eq((write_pointer != read_pointer) & ~finished)
+
+        #histogram_bin - The latency histogram bin of the finished frame
+        shift = self.histogram_bin_width.bit_length()-1
+        histogram_bin = Signal(range(self.histogram_bins))
+        with m.If((latency >> shift) >= self.histogram_bins-1):
+            m.d.comb += histogram_bin.eq(self.histogram_bins-1)
+        with m.Else():
+            m.d.comb += histogram_bin.eq(latency >> shift)
+
+        #clear_all - Writing 1 to bit 0 of CSR_CONTROL clears every counter
+        clear_all = Signal(1)
+        m.d.comb += clear_all.eq(self.csr_write & (self.csr_address == CSR_CONTROL) & self.csr_write_data[0])
+
+        registers = {}
+        def counter(address, event):
+            register = Signal(self.counter_width, reset=0, name="csr{}".format(address))
+            with m.If(clear_all | (self.csr_write & (self.csr_address == address))):
+                m.d.sync += register.eq(0)
+            with m.Elif(event & (register != (1 << self.counter_width)-1)):
+                m.d.sync += register.eq(register+1)
+            registers[address] = register
+
+        counter(CSR_FRAMES, finished)
+        counter(CSR_CORRECTED, finished & corrected)
+        counter(CSR_FAILED, finished & ~decoder.success)
+        counter(CSR_BUSY_CYCLES, busy)
+        counter(CSR_IDLE_CYCLES, ~busy)
+        for b in range(0,self.histogram_bins):
+            counter(CSR_HISTOGRAM+b, finished & (histogram_bin == b))
+        registers[CSR_CONTROL] = Const((self.histogram_bin_width << 8) | self.histogram_bins, self.counter_width)
+
+        #Read back the addressed register (unmapped addresses read as zero)
+        with m.Switch(self.csr_address):
+            for address, register in registers.items():
+                with m.Case(address):
+                    m.d.sync += self.csr_read_data.eq(register)
+            with m.Case():
+                m.d.sync += self.csr_read_data.eq(0)
+        return m
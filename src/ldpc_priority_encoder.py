@@ -0,0 +1,77 @@
+from nmigen import Elaboratable, Module, Signal, Array, unsigned, Const, Cat, Mux
+from nmigen.build import Platform
+from nmigen.cli import main_parser, main_runner, main
+from nmigen.back.pysim import Simulator, Delay
+from nmigen.asserts import Assert, Assume, Cover
+
+class LDPC_Priority_Encoder(Elaboratable):
+    #Log-depth priority encoder selecting the lowest numbered active request, used to pick the passing bit-flip candidate.
+    #A balanced tree of ceil(log2(width)) levels merges pairs of (valid, index) nodes, the lower half taking priority.
+    #pipeline_depth register stages are spread evenly over the tree levels, every stage delaying the outputs by one
+    #clock cycle (the tree is free running, so a new set of requests can be presented on every clock cycle).
+    def __init__(self, width, pipeline_depth=0):
+
+        #[PARAMETER] - width: Number of requests
+        if width < 1:
+            raise ValueError("width must be at least 1")
+        self.width = int(width)
+
+        #[PARAMETER] - tree_levels: Number of levels of the balanced tree
+        self.tree_levels = (self.width-1).bit_length()
+
+        #[PARAMETER] - pipeline_depth: Number of register stages inserted between the tree levels (at most tree_levels)
+        if pipeline_depth < 0:
+            raise ValueError("pipeline_depth must not be negative")
+        self.pipeline_depth = min(int(pipeline_depth), self.tree_levels)
+
+        #[INPUT] - requests: One flag per request (e.g. candidate passed every parity check)
+        self.requests = Signal(self.width)
+
+        #[OUTPUT] - valid: Flag indicating that at least one request is active
+        self.valid = Signal(1)
+
+        #[OUTPUT] - index: The lowest numbered active request (only meaningful while valid is set)
+        self.index = Signal(range(self.width))
+
+        #[OUTPUT] - onehot: The lowest numbered active request as a one-hot vector (zero if no request is active)
+        self.onehot = Signal(self.width)
+
+    def ports(self):
+        return [self.requests, self.valid, self.index, self.onehot]
+
+    def elaborate(self, platform):
+        #Instantiate the Module
+        m = Module()
+
+        #register_levels - Tree levels followed by a register, spread evenly over the tree
+        register_levels = set((self.tree_levels*stage)//self.pipeline_depth for stage in range(1,self.pipeline_depth+1))
+
+        #tree_level - (valid, index bits) of the nodes at the current level of the tree, the leaves being the requests
+        tree_level = [(self.requests[n], []) for n in range(0,self.width)]
+        for level in range(1,self.tree_levels+1):
+            merged = []
+            for n in range(0,len(tree_level),2):
+                (left_valid, left_index) = tree_level[n]
+                if n+1 < len(tree_level):
+                    (right_valid, right_index) = tree_level[n+1]
+                    merged.append((left_valid | right_valid,
+                                   [Mux(left_valid, left_bit, right_bit) for left_bit, right_bit in zip(left_index, right_index)] + [~left_valid]))
+                else:
+                    merged.append((left_valid, left_index + [Const(0, 1)]))
+            tree_level = merged
+            if level in register_levels:
+                registered = []
+                for n, (valid, index) in enumerate(tree_level):
+                    tree_register = Signal(1+len(index), name="tree_level{}_node{}".format(level, n))
+                    m.d.sync += tree_register.eq(Cat(valid, *index))
+                    registered.append((tree_register[0], [tree_register[1+b] for b in range(0,len(index))]))
+                tree_level = registered
+
+        (valid, index) = tree_level[0]
+        m.d.comb += [
+            self.valid.eq(valid),
+            self.index.eq(Cat(*index) if index else 0)
+        ]
+        for n in range(0,self.width):
+            m.d.comb += self.onehot[n].eq(self.valid & (self.index == n))
+        return m
@@ -0,0 +1,262 @@
+from nmigen import Elaboratable, Module, Signal, Array, unsigned, Const, Cat, Mux, Memory
+from nmigen.build import Platform
+from nmigen.cli import main_parser, main_runner, main
+from nmigen.back.pysim import Simulator, Delay
+from nmigen.asserts import Assert, Assume, Cover
+from src.ldpc_parity_check_matrix import QuasiCyclicParityCheckMatrix
+
+def cyclic_shift(value, amount, width):
+    #Z-wide barrel shifter: bit 'z' of the result is bit (z+amount)%width of value, with one rotation stage per bit of amount
+    for k in range(0,len(amount)):
+        step = (1 << k) % width
+        if step:
+            value = Mux(amount[k], Cat(value[step:], value[:step]), value)
+    return value
+
+class LDPC_QC_Bit_Flipping_Decoder(Elaboratable):
+    #Hard-decision bit-flipping decoder for quasi-cyclic codes with a Z-way parallel datapath.
+    #
+    #The codeword is held in a memory of one Z bit word per base column and the syndrome in a memory of one Z bit word
+    #per base row, so both map onto block RAM. Every iteration walks the circulants of the base matrix twice through
+    #a single Z-wide cyclic shifter, one circulant per clock cycle:
+    #    syndrome phase - row by row, XOR each codeword word shifted by its circulant into the row's syndrome word
+    #    flip phase     - column by column, count the failing checks of each bit from the syndrome words shifted back,
+    #                     then flip the bits of the column which fail too many of their checks
+    #The circulant schedule (base row, base column, shift amount) is read from a ROM. Decoding gives the same result
+    #and iteration count as LDPC_Bit_Flipping_Decoder on the expanded matrix.
+    #
+    #The codeword is written into, and the decoded codeword read back from, the codeword memory one Z bit word (see
+    #QuasiCyclicParityCheckMatrix.to_blocks) per clock cycle while the decoder is not running.
+    def __init__(self, ParityCheckMatrix, codeword_width, data_width, max_iterations=20, flip_threshold=None):
+
+        #[PARAMETER] - ParityCheckMatrix: The QuasiCyclicParityCheckMatrix of the code
+        if not isinstance(ParityCheckMatrix, QuasiCyclicParityCheckMatrix):
+            raise ValueError("LDPC_QC_Bit_Flipping_Decoder requires a QuasiCyclicParityCheckMatrix")
+        if ParityCheckMatrix.codeword_width != int(codeword_width):
+            raise ValueError("Parity check matrix has {} columns, expected {}".format(ParityCheckMatrix.codeword_width, codeword_width))
+        if not ParityCheckMatrix.circulants:
+            raise ValueError("Parity check matrix has no nonzero circulants")
+        self.ParityCheckMatrixPythonArray = ParityCheckMatrix
+
+        #[PARAMETER] - codeword_width: Width of the input Codeword
+        self.codeword_width = int(codeword_width)
+
+        #[PARAMETER] - data_output_width: The length of the data (the leftmost data_width matrix columns)
+        self.data_output_width = int(data_width)
+
+        #[PARAMETER] - lifting_size: Width Z of the datapath and of each memory word
+        self.lifting_size = ParityCheckMatrix.lifting_size
+
+        #[PARAMETER] - max_iterations, flip_threshold: As for LDPC_Bit_Flipping_Decoder
+        if max_iterations < 1:
+            raise ValueError("max_iterations must be at least 1")
+        self.max_iterations = int(max_iterations)
+        self.flip_threshold = flip_threshold
+
+        #[PARAMETER] - column_weights: Number of circulants in each base column (the column weight of each of its bits)
+        self.column_weights = [sum(1 for r, c, shift in ParityCheckMatrix.circulants if c == column)
+                               for column in range(0,ParityCheckMatrix.base_columns)]
+
+        #[INPUT] - data_input: A Z bit word of the codeword to be decoded
+        self.data_input = Signal(self.lifting_size)
+
+        #[INPUT] - data_input_address: The base column of data_input
+        self.data_input_address = Signal(range(ParityCheckMatrix.base_columns))
+
+        #[INPUT] - data_input_valid: Writes data_input into the codeword memory (ignored while running)
+        self.data_input_valid = Signal(1)
+
+        #[INPUT] - start: The start signal to start decoding the codeword memory
+        self.start = Signal(1)
+
+        #[INPUT] - data_output_address: The base column read back on data_output on the next clock cycle
+        self.data_output_address = Signal(range(ParityCheckMatrix.base_columns))
+
+        #[OUTPUT] - data_output: A Z bit word of the decoded codeword (only valid while not running)
+        self.data_output = Signal(self.lifting_size)
+
+        #[OUTPUT] - success : Flag indicating whether decoding was successful or not
+        self.success = Signal(1, reset=0)
+
+        #[OUTPUT] - done: The done signal to indicate that the decoding process has stopped.
+        self.done = Signal(1, reset=0)
+
+        #[OUTPUT] - iterations: The number of bit-flipping iterations used to decode the codeword
+        self.iterations = Signal(range(self.max_iterations+1), reset=0)
+
+    def ports(self):
+        return [self.data_input, self.data_input_address, self.data_input_valid, self.start, self.data_output_address,
+                self.data_output, self.done, self.success, self.iterations]
+
+    def bit_flip_threshold(self, column):
+        #Number of failing parity checks on each bit of base column 'column' which must be exceeded for the bit to be flipped
+        if self.flip_threshold is None:
+            return self.column_weights[column]//2
+        return int(self.flip_threshold)
+
+    def schedule(self):
+        #Circulant schedule of one iteration: (base row, base column, shift amount, last, flip threshold) entries.
+        #The syndrome phase visits the circulants row by row ('last' ends a row), the flip phase column by column ('last'
+        #ends a column) with the inverse shift.
+        H = self.ParityCheckMatrixPythonArray
+        Z = self.lifting_size
+        rows = H.circulants
+        columns = sorted(H.circulants, key=lambda circulant: (circulant[1], circulant[0]))
+        syndrome_phase = [(r, c, shift, e+1 == len(rows) or rows[e+1][0] != r, 0) for e, (r, c, shift) in enumerate(rows)]
+        flip_phase = [(r, c, (Z-shift) % Z, e+1 == len(columns) or columns[e+1][1] != c, self.bit_flip_threshold(c))
+                      for e, (r, c, shift) in enumerate(columns)]
+        return syndrome_phase + flip_phase
+
+    def elaborate(self, platform):
+        #Instantiate the Module
+        m = Module()
+
+        H = self.ParityCheckMatrixPythonArray
+        Z = self.lifting_size
+        schedule = self.schedule()
+        circulants = len(H.circulants)
+
+        #Field widths of the schedule ROM entries
+        row_width = max(1, (H.base_rows-1).bit_length())
+        column_width = max(1, (H.base_columns-1).bit_length())
+        shift_width = max(1, (Z-1).bit_length())
+        count_width = max(self.column_weights).bit_length()
+        threshold_width = max([threshold for r, c, shift, last, threshold in schedule] + [1]).bit_length()
+
+        #[MEMORY] - schedule_rom - One entry per circulant per phase: Cat(shift, row, column, last, threshold)
+        schedule_rom = Memory(width=shift_width+row_width+column_width+1+threshold_width, depth=len(schedule),
+                              init=[shift | (r << shift_width) | (c << (shift_width+row_width)) |
+                                    (int(last) << (shift_width+row_width+column_width)) |
+                                    (threshold << (shift_width+row_width+column_width+1))
+                                    for r, c, shift, last, threshold in schedule], name="schedule_rom")
+        #[MEMORY] - codeword_memory - The working copy of the codeword, one Z bit word per base column
+        codeword_memory = Memory(width=Z, depth=H.base_columns, name="codeword_memory")
+        #[MEMORY] - syndrome_memory - The result of each parity check row (1=Fail, 0=Pass), one Z bit word per base row
+        syndrome_memory = Memory(width=Z, depth=H.base_rows, name="syndrome_memory")
+
+        m.submodules.schedule_read = schedule_read = schedule_rom.read_port()
+        m.submodules.codeword_read = codeword_read = codeword_memory.read_port()
+        m.submodules.codeword_write = codeword_write = codeword_memory.write_port()
+        m.submodules.syndrome_read = syndrome_read = syndrome_memory.read_port()
+        m.submodules.syndrome_write = syndrome_write = syndrome_memory.write_port()
+
+        #running - Signal to indicate that we are currently running
+        running = Signal(1, reset=0)
+
+        #pointer - The schedule entry being fetched
+        pointer = Signal(range(len(schedule)), reset=0)
+
+        #Stage 1 - The schedule entry read from the ROM, addressing the codeword and syndrome words
+        stage_1_valid = Signal(1, reset=0)
+        stage_1_pointer = Signal(range(len(schedule)), reset=0)
+        stage_1_shift = schedule_read.data[0:shift_width]
+        stage_1_row = schedule_read.data[shift_width:shift_width+row_width]
+        stage_1_column = schedule_read.data[shift_width+row_width:shift_width+row_width+column_width]
+
+        #Stage 2 - The codeword and syndrome words read from the memories, shifted and accumulated
+        stage_2_valid = Signal(1, reset=0)
+        stage_2_pointer = Signal(range(len(schedule)), reset=0)
+        stage_2_flip_phase = Signal(1)
+        m.d.comb += stage_2_flip_phase.eq(stage_2_pointer >= circulants)
+        stage_2_entry = Signal(len(schedule_read.data))
+        stage_2_shift = stage_2_entry[0:shift_width]
+        stage_2_row = stage_2_entry[shift_width:shift_width+row_width]
+        stage_2_column = stage_2_entry[shift_width+row_width:shift_width+row_width+column_width]
+        stage_2_last = stage_2_entry[shift_width+row_width+column_width]
+        stage_2_threshold = stage_2_entry[shift_width+row_width+column_width+1:]
+
+        #shifted - The codeword word (syndrome phase) or syndrome word (flip phase) through the shared cyclic shifter
+        shifted = Signal(Z)
+        m.d.comb += shifted.eq(cyclic_shift(Mux(stage_2_flip_phase, syndrome_read.data, codeword_read.data), stage_2_shift, Z))
+
+        #syndrome_word - The syndrome of the row being accumulated, including this circulant
+        syndrome_accumulator = Signal(Z, reset=0)
+        syndrome_word = Signal(Z)
+        m.d.comb += syndrome_word.eq(syndrome_accumulator ^ shifted)
+
+        #syndrome_failed - A syndrome word of this iteration was nonzero
+        syndrome_failed = Signal(1, reset=0)
+
+        #failing_checks - The failing checks of each bit of the column being counted, including this circulant
+        check_counters = [Signal(count_width, reset=0, name="check_counter_{}".format(z)) for z in range(0,Z)]
+        failing_checks = [check_counters[z] + shifted[z] for z in range(0,Z)]
+        flip_mask = Signal(Z)
+        m.d.comb += flip_mask.eq(Cat(*[failing_checks[z] > stage_2_threshold for z in range(0,Z)]))
+
+        #Fetch - The ROM is read every clock cycle, the memories are addressed by the fetched entry
+        m.d.comb += [
+            schedule_read.addr.eq(pointer),
+            codeword_read.addr.eq(Mux(running, stage_1_column, self.data_output_address)),
+            syndrome_read.addr.eq(stage_1_row),
+            self.data_output.eq(codeword_read.data)
+        ]
+        with m.If(running):
+            m.d.sync += [
+                pointer.eq(Mux(pointer==len(schedule)-1, 0, pointer+1)),
+                stage_1_valid.eq(1),
+                stage_1_pointer.eq(pointer),
+                stage_2_valid.eq(stage_1_valid),
+                stage_2_pointer.eq(stage_1_pointer),
+                stage_2_entry.eq(schedule_read.data)
+            ]
+
+        #Load the codeword while not running
+        with m.If(~running):
+            m.d.comb += [
+                codeword_write.addr.eq(self.data_input_address),
+                codeword_write.data.eq(self.data_input),
+                codeword_write.en.eq(self.data_input_valid)
+            ]
+
+        #Syndrome phase - Accumulate each row's syndrome word and store it once the row is complete
+        with m.If(running & stage_2_valid & ~stage_2_flip_phase):
+            m.d.sync += syndrome_accumulator.eq(Mux(stage_2_last, 0, syndrome_word))
+            with m.If(stage_2_last):
+                m.d.comb += [
+                    syndrome_write.addr.eq(stage_2_row),
+                    syndrome_write.data.eq(syndrome_word),
+                    syndrome_write.en.eq(1)
+                ]
+                m.d.sync += syndrome_failed.eq(syndrome_failed | syndrome_word.any())
+
+        #Flip phase - Count the failing checks of each bit and flip the column's bits once the column is complete
+        with m.If(running & stage_2_valid & stage_2_flip_phase):
+            for z in range(0,Z):
+                m.d.sync += check_counters[z].eq(Mux(stage_2_last, 0, failing_checks[z]))
+            with m.If(stage_2_last):
+                m.d.comb += [
+                    codeword_write.addr.eq(stage_2_column),
+                    codeword_write.data.eq(codeword_read.data ^ flip_mask),
+                    codeword_write.en.eq(1)
+                ]
+
+        #Reset the relevant registers and start from the first schedule entry
+        with m.If(self.start):
+            m.d.sync += [
+                self.done.eq(0),
+                self.success.eq(0),
+                self.iterations.eq(0),
+                running.eq(1),
+                pointer.eq(0),
+                stage_1_valid.eq(0),
+                stage_2_valid.eq(0),
+                syndrome_accumulator.eq(0),
+                syndrome_failed.eq(0)
+            ]
+        #End of the syndrome phase: stop as soon as every parity check passes, or once the iteration budget has been used
+        with m.Elif(running & stage_2_valid & (stage_2_pointer==circulants-1)):
+            with m.If(~(syndrome_failed | syndrome_word.any()) | (self.iterations==self.max_iterations)):
+                m.d.sync += [
+                    self.success.eq(~(syndrome_failed | syndrome_word.any())),
+                    self.done.eq(1),
+                    running.eq(0),
+                    stage_1_valid.eq(0),
+                    stage_2_valid.eq(0)
+                ]
+        #End of the flip phase: start the next iteration
+        with m.Elif(running & stage_2_valid & (stage_2_pointer==len(schedule)-1)):
+            m.d.sync += [
+                self.iterations.eq(self.iterations+1),
+                syndrome_failed.eq(0)
+            ]
+        return m
@@ -0,0 +1,224 @@
+#Content-hashed on-disk cache of the RTLIL and Verilog generated from the designs.
+#
+#Designs are keyed on a description of their constructor parameters (every public attribute which is not a signal, including
+#the parity check matrix and nested submodule parameters), the ports brought out, the conversion options and a hash of
+#the source of the cores in src/ together with the nMigen version. A design whose key is found in the cache is not
+#elaborated at all: the generators, the formal flow and the compiled simulation backend read the cached RTL instead.
+#
+#The cache directory is bounded in size: every hit refreshes the modification time of the entry, and the least recently
+#used entries are removed once the total size exceeds max_bytes. A cache which cannot be written only means the RTL is
+#converted again next time.
+import hashlib
+import os
+import re
+import tempfile
+import warnings
+from collections import deque
+import numpy as np
+import nmigen
+from nmigen import Signal
+from nmigen.hdl.ast import Value
+from nmigen.hdl.ir import UnusedElaboratable
+from nmigen.cli import main_runner
+from src.ldpc_decoder_rtl import convert_rtlil, run_yosys, signal_names_traced
+
+#source_digest - Hash of the core sources, computed once per process
+source_digest = None
+
+def source_version():
+    #Hash of every Python source file in src/ and of the nMigen version: any change to the cores invalidates the cache
+    global source_digest
+    if source_digest is None:
+        digest = hashlib.sha256(str(getattr(nmigen, "__version__", "")).encode())
+        directory = os.path.dirname(os.path.abspath(__file__))
+        for file_name in sorted(os.listdir(directory)):
+            if file_name.endswith(".py"):
+                with open(os.path.join(directory, file_name), "rb") as source_file:
+                    digest.update(file_name.encode() + b"\0" + source_file.read())
+        source_digest = digest.hexdigest()
+    return source_digest
+
+def attribute_children(value):
+    #The (path suffix, child) pairs of the attributes, items or elements of 'value' walked by describe_design
+    if isinstance(value, Value):
+        return []
+    if isinstance(value, (list, tuple)):
+        return [("[{}]".format(i), item) for i, item in enumerate(value)]
+    if isinstance(value, dict):
+        return [("[{!r}]".format(key), value[key]) for key in sorted(value, key=repr)]
+    if hasattr(value, "__dict__") and not isinstance(value, type):
+        #Private attributes (e.g. nMigen's UnusedElaboratable bookkeeping) are not parameters of the design
+        return [("." + name, item) for name, item in sorted(vars(value).items()) if not name.startswith("_")]
+    return []
+
+def signal_paths(design):
+    #Shortest attribute path of every signal and object reachable from 'design' (breadth first)
+    paths = {}
+    queue = deque([(design, "")])
+    while queue:
+        value, path = queue.popleft()
+        if id(value) in paths or isinstance(value, (int, float, str, bytes, bool, type(None))):
+            continue
+        paths[id(value)] = path
+        for suffix, child in attribute_children(value):
+            queue.append((child, path + suffix))
+    return paths
+
+def describe_design(design, values=()):
+    #Deterministic text description of a design's parameters, and of 'values' (e.g. ports) in terms of the design.
+    #Signals are described by their shortest attribute path, width and reset value, objects seen before by a reference to their path.
+    paths = signal_paths(design)
+    described = set()
+    def describe(value):
+        if isinstance(value, (int, float, str, bytes, bool, type(None))):
+            return repr(value)
+        if isinstance(value, Signal):
+            return "signal({},{},{})".format(paths.get(id(value), "?"), len(value), value.reset)
+        if isinstance(value, Value):
+            return "value({!r})".format(value)
+        if isinstance(value, np.ndarray):
+            return "array({},{},{})".format(value.dtype, value.shape, hashlib.sha256(np.ascontiguousarray(value).tobytes()).hexdigest())
+        if id(value) in described:
+            return "ref({})".format(paths.get(id(value), "?"))
+        described.add(id(value))
+        if isinstance(value, (list, tuple)):
+            return "[" + ",".join(describe(item) for item in value) + "]"
+        if isinstance(value, dict):
+            return "{" + ",".join("{}:{}".format(suffix, describe(item)) for suffix, item in attribute_children(value)) + "}"
+        if hasattr(value, "__dict__") and not isinstance(value, type):
+            return type(value).__name__ + "(" + ",".join("{}={}".format(suffix[1:], describe(item))
+                                                         for suffix, item in attribute_children(value)) + ")"
+        return repr(value)
+    return describe(design) + "|" + ",".join(describe(value) for value in values)
+
+def ignore_unused(*designs):
+    #The designs of a cache hit (and the submodules they hold) are never elaborated: ignore nMigen's UnusedElaboratable
+    #warning for these objects only, as it is raised when they are garbage collected
+    for design in designs:
+        for value in [design] + [child for suffix, child in attribute_children(design)]:
+            if isinstance(value, nmigen.Elaboratable):
+                warnings.filterwarnings("ignore", re.escape("{!r} created but never used".format(value)), UnusedElaboratable)
+
+def design_key(design, ports, *extra):
+    #Cache key of a design, the ports brought out and any extra text (e.g. the source of added formal statements)
+    description = "\n".join([source_version(), describe_design(design, ports)] + [str(text) for text in extra])
+    return hashlib.sha256(description.encode()).hexdigest()[:32]
+
+def default_cache_dir():
+    #Per-user cache directory ($XDG_CACHE_HOME/ldpc_decoder/rtl, default ~/.cache)
+    return os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+                        "ldpc_decoder", "rtl")
+
+class LDPC_RTL_Cache:
+    def __init__(self, cache_dir=None, max_bytes=256 << 20):
+
+        #[PARAMETER] - cache_dir: Directory holding the cached files (default: LDPC_RTL_CACHE_DIR, or the per-user cache
+        #              directory)
+        self.cache_dir = cache_dir or os.environ.get("LDPC_RTL_CACHE_DIR") or default_cache_dir()
+
+        #[PARAMETER] - max_bytes: Total size of the cached files above which the least recently used ones are removed
+        self.max_bytes = int(max_bytes)
+
+    def path(self, key, suffix):
+        return os.path.join(self.cache_dir, key + suffix)
+
+    def get(self, key, suffix):
+        #The cached text of 'key' (None on a miss). A hit marks the entry as most recently used.
+        path = self.path(key, suffix)
+        try:
+            with open(path) as cached_file:
+                text = cached_file.read()
+            os.utime(path)
+        except OSError:
+            return None
+        return text
+
+    def put(self, key, suffix, text):
+        #Store the text of 'key' atomically, then evict the least recently used entries over max_bytes.
+        #Returns False if the cache could not be written.
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with tempfile.NamedTemporaryFile("w", dir=self.cache_dir, suffix=".tmp", delete=False) as cached_file:
+                cached_file.write(text)
+            os.replace(cached_file.name, self.path(key, suffix))
+            self.evict()
+        except OSError:
+            return False
+        return True
+
+    def entries(self):
+        #(modification time, size, path) of every cached file, least recently used first
+        entries = []
+        for file_name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, file_name)
+            if file_name.endswith(".tmp"):
+                continue
+            try:
+                status = os.stat(path)
+            except OSError:
+                continue
+            entries.append((status.st_mtime, status.st_size, path))
+        return sorted(entries)
+
+    def evict(self):
+        entries = self.entries()
+        total = sum(size for mtime, size, path in entries)
+        for mtime, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+def cached_rtlil(elaboratable, ports, name="top", platform=None, flatten=None, key_design=None, key_extra=(), cache=None):
+    #convert_rtlil through the cache. The key is taken from 'key_design' (default: the elaboratable itself), which must
+    #hold every parameter of the design: pass the decoder when 'elaboratable' is a Module wrapping it, together with
+    #the source of anything else the Module adds in 'key_extra'.
+    cache = cache or LDPC_RTL_Cache()
+    flatten = flatten or (flatten is None and not signal_names_traced())
+    key = design_key(key_design if key_design is not None else elaboratable, ports, "rtlil", name, flatten, *key_extra)
+    il_text = cache.get(key, ".il")
+    if il_text is None:
+        il_text = convert_rtlil(elaboratable, ports, name, platform, flatten)
+        cache.put(key, ".il", il_text)
+    else:
+        ignore_unused(elaboratable, key_design)
+    return il_text
+
+def cached_verilog(elaboratable, ports, name="top", platform=None, key_design=None, key_extra=(), cache=None):
+    #Verilog written by Yosys from the cached RTLIL, and cached in turn
+    cache = cache or LDPC_RTL_Cache()
+    key = design_key(key_design if key_design is not None else elaboratable, ports, "verilog", name, *key_extra)
+    verilog_text = cache.get(key, ".v")
+    if verilog_text is None:
+        il_text = cached_rtlil(elaboratable, ports, name, platform, True, key_design, key_extra, cache)
+        with tempfile.TemporaryDirectory() as work:
+            with open(os.path.join(work, "design.il"), "w") as il_file:
+                il_file.write(il_text)
+            run_yosys("read_rtlil design.il; proc; opt_clean; write_verilog -norename design.v", work)
+            with open(os.path.join(work, "design.v")) as verilog_file:
+                verilog_text = verilog_file.read()
+        cache.put(key, ".v", verilog_text)
+    else:
+        ignore_unused(elaboratable, key_design)
+    return verilog_text
+
+def cached_main_runner(parser, args, design, platform=None, name="top", ports=(), key_design=None, key_extra=()):
+    #nmigen.cli.main_runner with the 'generate' action served from the cache (other actions are passed through)
+    if args.action != "generate":
+        return main_runner(parser, args, design, platform, name, ports)
+    generate_type = args.generate_type
+    if generate_type is None and args.generate_file:
+        generate_type = {".v": "v", ".il": "il"}.get(os.path.splitext(args.generate_file.name)[1])
+    if generate_type is None:
+        parser.error("specify file type explicitly with -t")
+    if generate_type == "il":
+        output = cached_rtlil(design, ports, name, platform, key_design=key_design, key_extra=key_extra)
+    else:
+        output = cached_verilog(design, ports, name, platform, key_design=key_design, key_extra=key_extra)
+    if args.generate_file:
+        args.generate_file.write(output)
+    else:
+        print(output)
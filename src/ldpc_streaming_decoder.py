@@ -0,0 +1,120 @@
+from nmigen import Elaboratable, Module, Signal, Array, unsigned, Const, Cat
+from nmigen.build import Platform
+from nmigen.cli import main_parser, main_runner, main
+from nmigen.back.pysim import Simulator, Delay
+from nmigen.asserts import Assert, Assume, Cover
+from src.ldpc_decoder import build_syndrome_lookup_table
+from src.ldpc_parity_check_matrix import as_sparse
+
+class LDPC_Streaming_Decoder(Elaboratable):
+    def __init__(self, ParityCheckMatrix, codeword_width, data_width, tag_width=1):
+
+        #[PARAMETER] - codeword_width: Width of the input Codeword
+        self.codeword_width = int(codeword_width)
+
+        #[PARAMETER] - ParityCheckMatrixPythonArray: Python Array representing the parity check matrix
+        self.ParityCheckMatrixPythonArray = ParityCheckMatrix
+
+        #[PARAMETER] - ParityCheckMatrixRows: Number of rows in the parity check matrix
+        self.ParityCheckMatrixRows = int(len(ParityCheckMatrix))
+
+        #[PARAMETER] - data_output_width: The length of the output data
+        self.data_output_width = int(data_width)
+
+        #[PARAMETER] - tag_width: Width of the user tag/sideband carried through with each codeword
+        self.tag_width = int(tag_width)
+
+        #[PARAMETER] - latency: Number of clock cycles between a codeword being accepted and its result being presented
+        self.latency = 3
+
+        #[INPUT] - in_valid: Indicates that data_input and tag_input hold a codeword to be decoded
+        self.in_valid = Signal(1)
+
+        #[OUTPUT] - in_ready: Indicates that the decoder accepts a codeword on this clock cycle
+        self.in_ready = Signal(1)
+
+        #[INPUT] - data_input: The codeword to be decoded
+        self.data_input = Signal(self.codeword_width)
+
+        #[INPUT] - tag_input: The user tag/sideband accompanying the codeword
+        self.tag_input = Signal(self.tag_width)
+
+        #[OUTPUT] - out_valid: Indicates that data_output, success and tag_output hold a decoded codeword
+        self.out_valid = Signal(1, reset=0)
+
+        #[INPUT] - out_ready: Indicates that the consumer accepts the decoded codeword on this clock cycle
+        self.out_ready = Signal(1)
+
+        #[OUTPUT] - data_output: The decoded data
+        self.data_output = Signal(self.data_output_width, reset=0)
+
+        #[OUTPUT] - success : Flag indicating whether decoding was successful or not
+        self.success = Signal(1, reset=0)
+
+        #[OUTPUT] - tag_output: The user tag/sideband which accompanied the decoded codeword
+        self.tag_output = Signal(self.tag_width, reset=0)
+
+    def ports(self):
+        return [self.in_valid, self.in_ready, self.data_input, self.tag_input,
+                self.out_valid, self.out_ready, self.data_output, self.success, self.tag_output]
+
+    def elaborate(self, platform):
+        #Instantiate the Module
+        m = Module()
+
+        #[PARAMETER] - row_bits: The codeword bits connected to each parity check row (only these are elaborated)
+        row_bits = as_sparse(self.ParityCheckMatrixPythonArray, self.codeword_width).row_bits
+
+        #advance - The whole pipeline moves forward unless the output holds a result which has not been accepted
+        advance = Signal(1)
+        m.d.comb += [
+            advance.eq((~self.out_valid) | self.out_ready),
+            self.in_ready.eq(advance)
+        ]
+
+        #Stage 1 registers - The accepted codeword and its tag
+        stage_1_valid = Signal(1, reset=0)
+        stage_1_codeword = Signal(unsigned(self.codeword_width), reset=0)
+        stage_1_tag = Signal(unsigned(self.tag_width), reset=0)
+
+        #Stage 2 registers - The codeword, its tag and its syndrome (1=Fail, 0=Pass for each parity check row)
+        stage_2_valid = Signal(1, reset=0)
+        stage_2_codeword = Signal(unsigned(self.codeword_width), reset=0)
+        stage_2_tag = Signal(unsigned(self.tag_width), reset=0)
+        stage_2_syndrome = Signal(unsigned(self.ParityCheckMatrixRows), reset=0)
+
+        with m.If(advance):
+            #Stage 1 - Accept a new codeword every clock cycle
+            m.d.sync += [
+                stage_1_valid.eq(self.in_valid),
+                stage_1_codeword.eq(self.data_input),
+                stage_1_tag.eq(self.tag_input)
+            ]
+
+            #Stage 2 - Compute the syndrome (H.c) of the codeword
+            m.d.sync += [
+                stage_2_valid.eq(stage_1_valid),
+                stage_2_codeword.eq(stage_1_codeword),
+                stage_2_tag.eq(stage_1_tag)
+            ]
+            for i in range(0,self.ParityCheckMatrixRows):
+                m.d.sync += stage_2_syndrome[(self.ParityCheckMatrixRows-1)-i].eq(Cat(*[stage_1_codeword[n] for n in row_bits[i]]).xor() if row_bits[i] else 0)
+
+            #Stage 3 - Map the syndrome to the erroneous bit, flip it and present the result
+            m.d.sync += [
+                self.out_valid.eq(stage_2_valid),
+                self.tag_output.eq(stage_2_tag)
+            ]
+            with m.Switch(stage_2_syndrome):
+                with m.Case(0):
+                    m.d.sync += [self.data_output.eq(stage_2_codeword[self.codeword_width-self.data_output_width:]),
+                                 self.success.eq(1)]
+                for syndrome_value, bit in build_syndrome_lookup_table(self.ParityCheckMatrixPythonArray, self.codeword_width).items():
+                    with m.Case(syndrome_value):
+                        corrected = stage_2_codeword ^ Const(1 << bit, unsigned(self.codeword_width))
+                        m.d.sync += [self.data_output.eq(corrected[self.codeword_width-self.data_output_width:]),
+                                     self.success.eq(1)]
+                with m.Case():
+                    m.d.sync += [self.data_output.eq(0),
+                                 self.success.eq(0)]
+        return m
@@ -0,0 +1,115 @@
+#Syndrome -> error pattern tables for the syndrome ROM decoder (DECODER_MODE_SYNDROME_ROM).
+#
+#Every error pattern of up to 'max_errors' bits is enumerated at elaboration time, lowest weight first and in
+#lexicographic order within each weight, and its syndrome is computed as the XOR of the syndromes of its columns of H
+#(one NumPy reduction per batch of patterns). Each syndrome keeps the first pattern which produces it, so the table
+#decodes to a minimum weight error pattern, preferring the lowest numbered bits on ties.
+#Syndromes are numbered as in LDPC_Decoder_Validator, with parity check row 'i' reported on syndrome bit (rows-1)-i.
+#
+#Tables are cached on disk, keyed on the parity check matrix and max_errors, so repeated elaborations of the same
+#design do not enumerate the patterns again. A cached table which can not be read back with the expected dtype and
+#shape is enumerated again, and a cache directory which can not be written is skipped.
+import hashlib
+import os
+import tempfile
+import zipfile
+from itertools import combinations, islice, chain
+import numpy as np
+from src.ldpc_parity_check_matrix import as_sparse
+
+#Version of the table format, part of the cache key
+TABLE_FORMAT_VERSION = 1
+
+#[PARAMETER] - MAX_SYNDROME_ROWS: Largest number of parity check rows accepted (the table has 2**rows entries)
+MAX_SYNDROME_ROWS = 20
+
+def column_syndromes(ParityCheckMatrix, codeword_width):
+    #Syndrome of a single error on each codeword bit (column 'n' of H)
+    H = as_sparse(ParityCheckMatrix, codeword_width)
+    rows = len(H)
+    return np.array([sum(1 << ((rows-1)-i) for i in H.bit_checks[n]) for n in range(0,H.codeword_width)], dtype=np.int64)
+
+def error_pattern_table_key(ParityCheckMatrix, codeword_width, max_errors):
+    #Cache key of a table: a hash of the rows of H, the codeword width, max_errors and the table format
+    H = as_sparse(ParityCheckMatrix, codeword_width)
+    description = "{}:{}:{}:{}".format(TABLE_FORMAT_VERSION, H.codeword_width, int(max_errors), H.row_bits)
+    return hashlib.sha256(description.encode()).hexdigest()[:16]
+
+def enumerate_error_patterns(ParityCheckMatrix, codeword_width, max_errors, batch_size=1 << 18):
+    #Build the table without the cache. Returns (correctable, patterns):
+    #correctable - (2**rows) bool array, set for the syndromes of a pattern of at most max_errors bits (and syndrome 0)
+    #patterns    - (2**rows, max_errors) int32 array of the erroneous bit positions of each syndrome in ascending order,
+    #              padded with codeword_width
+    rows = len(ParityCheckMatrix)
+    if rows > MAX_SYNDROME_ROWS:
+        raise ValueError("A syndrome table needs 2**rows entries: at most {} parity check rows are supported".format(MAX_SYNDROME_ROWS))
+    syndromes = column_syndromes(ParityCheckMatrix, codeword_width)
+    correctable = np.zeros(1 << rows, dtype=bool)
+    patterns = np.full((1 << rows, int(max_errors)), int(codeword_width), dtype=np.int32)
+    correctable[0] = True
+    for weight in range(1,int(max_errors)+1):
+        positions = chain.from_iterable(combinations(range(0,int(codeword_width)), weight))
+        while True:
+            batch = np.fromiter(islice(positions, batch_size*weight), dtype=np.int32).reshape(-1, weight)
+            if len(batch) == 0:
+                break
+            batch_syndromes = np.bitwise_xor.reduce(syndromes[batch], axis=1)
+            #np.unique returns the index of the first occurrence of each syndrome, i.e. its lexicographically first pattern
+            unique, first = np.unique(batch_syndromes, return_index=True)
+            new = ~correctable[unique]
+            patterns[unique[new], :weight] = batch[first[new]]
+            correctable[unique[new]] = True
+    return correctable, patterns
+
+def default_cache_dir():
+    #Per-user cache directory of the tables ($XDG_CACHE_HOME/ldpc_decoder/syndrome_tables, default ~/.cache)
+    return os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+                        "ldpc_decoder", "syndrome_tables")
+
+def load_error_pattern_table(path, rows, codeword_width, max_errors):
+    #Read a cached table back, or return None if it is missing or does not hold a table of the expected dtype, shape
+    #and range
+    try:
+        with np.load(path, allow_pickle=False) as cached:
+            correctable, patterns = cached["correctable"], cached["patterns"]
+    except (OSError, EOFError, KeyError, ValueError, zipfile.BadZipFile):
+        return None
+    if correctable.dtype != np.bool_ or correctable.shape != (1 << rows,):
+        return None
+    if patterns.dtype != np.int32 or patterns.shape != (1 << rows, int(max_errors)):
+        return None
+    if patterns.size and (patterns.min() < 0 or patterns.max() > int(codeword_width)):
+        return None
+    return correctable, patterns
+
+def build_error_pattern_table(ParityCheckMatrix, codeword_width, max_errors, cache_dir=None):
+    #enumerate_error_patterns, cached in 'cache_dir' (default: default_cache_dir())
+    cache_dir = cache_dir or default_cache_dir()
+    path = os.path.join(cache_dir, error_pattern_table_key(ParityCheckMatrix, codeword_width, max_errors) + ".npz")
+    cached = load_error_pattern_table(path, len(ParityCheckMatrix), codeword_width, max_errors)
+    if cached is not None:
+        return cached
+    correctable, patterns = enumerate_error_patterns(ParityCheckMatrix, codeword_width, max_errors)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        #Publish the table atomically so that concurrent elaborations of the same design do not see a partial file
+        with tempfile.NamedTemporaryFile(dir=cache_dir, suffix=".npz", delete=False) as table_file:
+            np.savez(table_file, correctable=correctable, patterns=patterns)
+        os.replace(table_file.name, path)
+    except OSError:
+        #An unwritable cache directory only means the table is enumerated again next time
+        pass
+    return correctable, patterns
+
+def encode_error_pattern_table(correctable, patterns, codeword_width):
+    #Pack each table entry into a memory word: bit 0 is the correctable flag, followed by each position of the pattern
+    #in position_width(codeword_width) bit fields
+    width = position_width(codeword_width)
+    words = correctable.astype(object)
+    for j in range(0,patterns.shape[1]):
+        words = words | (patterns[:, j].astype(object) << (1+j*width))
+    return [int(word) for word in words]
+
+def position_width(codeword_width):
+    #Width of a position field, holding 0 to codeword_width (codeword_width marks an unused field)
+    return int(codeword_width).bit_length()